@@ -1,6 +1,14 @@
 """
 应用模块
+
+app 按需导入：导入、重建的解析子进程只导入 note_markdown，不应连带初始化数据库。
 """
-from .main import app
 
 __all__ = ["app"]
+
+
+def __getattr__(name):
+    if name == "app":
+        from .main import app
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -3,36 +3,23 @@
 """
 from typing import Optional, Dict, Any
 from fastapi import Request, HTTPException
-from ..services.ai_service import ai_service
-from ..core import AIConfigurationError
+from ..services.ai_service import AIService, ai_client_cache
+from ..core import AIConfigurationError, parse_api_config
 
 
-def get_ai_service(request: Request):
-    """获取AI服务"""
-    # 尝试从Cookie重建AI客户端
+def get_ai_service(request: Request) -> AIService:
+    """获取当前请求 API 配置对应的AI服务（按配置缓存复用客户端）"""
+    # Cookie 格式：url|key|model
     cookie = request.cookies.get("api_config")
     if not cookie:
         raise HTTPException(status_code=400, detail="未配置 AI API")
     
+    config = parse_api_config(cookie)
+    if not config:
+        raise HTTPException(status_code=400, detail="AI API配置格式错误")
+    
     try:
-        # 解析Cookie，支持新的格式：url|key|model
-        parts = cookie.split("|")
-        if len(parts) < 2:
-            raise HTTPException(status_code=400, detail="AI API配置格式错误")
-        
-        url = parts[0].strip()
-        key = parts[1].strip()
-        # 如果提供了模型名称，使用它；否则使用默认模型
-        model = parts[2].strip() if len(parts) > 2 and parts[2].strip() else "gpt-3.5-turbo"
-        
-        if not url or not key:
-            raise HTTPException(status_code=400, detail="未配置 AI API")
-        
-        # 初始化AI客户端
-        ai_service.initialize_client(url, key, model)
-        return ai_service
-    except HTTPException:
-        raise
+        return ai_client_cache.get(*config)
     except Exception as e:
         if isinstance(e, AIConfigurationError):
             raise HTTPException(status_code=400, detail=str(e))
@@ -1,11 +1,14 @@
 """
 AI相关API路由
 """
+import json
 from fastapi import APIRouter, Request, HTTPException, Depends
+from fastapi.responses import StreamingResponse
 from ..deps import get_ai_service
-from ...schemas import OptimizeRequest, OptimizeResponse
-from ...services.ai_service import ai_service
-from ...core import AIConfigurationError, AIConnectionError, create_http_exception
+from ...schemas import OptimizeRequest, OptimizeResponse, ClassifyJobRequest, ClassifyJobResponse
+from ...services import classify_service, local_classifier, ai_client_cache
+from ...repositories.ai_cache_repository import ai_cache_repository
+from ...core import AIConfigurationError, AIConnectionError, ai_executor, db_read_executor, io_executor, create_http_exception
 
 router = APIRouter()
 
@@ -17,11 +20,111 @@ async def optimize_text(optimize_data: OptimizeRequest, request: Request):
         # 获取AI服务
         ai_svc = get_ai_service(request)
         
-        # 执行优化
-        result = ai_svc.optimize_text(optimize_data.content, optimize_data.prompt)
+        # 在AI线程池中执行优化，不阻塞事件循环
+        result = await ai_executor.run(ai_svc.optimize_text, optimize_data.content, optimize_data.prompt)
         
         return OptimizeResponse(**result)
     except (AIConfigurationError, AIConnectionError) as e:
         raise create_http_exception(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"优化失败: {str(e)}")
+
+
+@router.post("/optimize/stream")
+async def optimize_text_stream(optimize_data: OptimizeRequest, request: Request):
+    """AI优化文本（SSE 流式）
+    
+    事件：delta（增量文本 {"text": ...}）、result（与 /optimize 相同的结果）、error（{"detail": ...}）。
+    """
+    ai_svc = get_ai_service(request)
+    
+    async def events():
+        try:
+            async for item in ai_executor.iterate(
+                ai_svc.stream_optimize_text, optimize_data.content, optimize_data.prompt
+            ):
+                data = item["data"]
+                if item["event"] == "result":
+                    data = OptimizeResponse(**data).model_dump()
+                yield _sse(item["event"], data)
+        except (AIConfigurationError, AIConnectionError) as e:
+            yield _sse("error", {"detail": e.message})
+        except Exception as e:
+            yield _sse("error", {"detail": f"优化失败: {str(e)}"})
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _sse(event: str, data: dict) -> str:
+    """格式化一条 SSE 事件"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.get("/ai/cache")
+async def get_ai_cache_stats():
+    """获取AI分类缓存统计"""
+    try:
+        return await db_read_executor.run(ai_cache_repository.get_stats)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取缓存统计失败: {str(e)}")
+
+
+@router.delete("/ai/cache")
+async def clear_ai_cache():
+    """清空AI分类缓存"""
+    try:
+        deleted = await io_executor.run(ai_cache_repository.clear)
+        return {"message": "缓存已清空", "deleted": deleted}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"清空缓存失败: {str(e)}")
+
+
+@router.get("/ai/health")
+async def get_ai_health():
+    """获取各AI配置的熔断状态与调用计数"""
+    return {"clients": ai_client_cache.health(), "cache": ai_client_cache.stats()}
+
+
+@router.get("/ai/classifier")
+async def get_local_classifier_stats():
+    """获取本地分类器状态"""
+    return local_classifier.get_stats()
+
+
+@router.post("/ai/classify", response_model=ClassifyJobResponse)
+async def start_classify_job(job_data: ClassifyJobRequest, request: Request):
+    """启动批量自动分类任务，立即返回任务ID"""
+    ai_svc = get_ai_service(request)
+    try:
+        job = await io_executor.run(classify_service.start_job, ai_svc, **job_data.model_dump())
+        return ClassifyJobResponse(**job)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"启动分类任务失败: {str(e)}")
+
+
+@router.get("/ai/classify/{job_id}", response_model=ClassifyJobResponse)
+async def get_classify_job(job_id: str):
+    """查询批量自动分类任务进度"""
+    return _classify_job_or_404(classify_service.get_job(job_id))
+
+
+@router.post("/ai/classify/{job_id}/pause", response_model=ClassifyJobResponse)
+async def pause_classify_job(job_id: str):
+    """暂停批量自动分类任务"""
+    return _classify_job_or_404(classify_service.pause_job(job_id))
+
+
+@router.post("/ai/classify/{job_id}/resume", response_model=ClassifyJobResponse)
+async def resume_classify_job(job_id: str):
+    """继续批量自动分类任务"""
+    return _classify_job_or_404(classify_service.resume_job(job_id))
+
+
+def _classify_job_or_404(job) -> ClassifyJobResponse:
+    if not job:
+        raise HTTPException(status_code=404, detail="分类任务不存在")
+    return ClassifyJobResponse(**job)
@@ -4,8 +4,9 @@
 from fastapi import APIRouter, Request, Response, HTTPException, Depends
 from ..deps import get_ai_service
 from ...schemas import LoginRequest, LoginResponse, LogoutResponse, ConfigResponse
-from ...services.ai_service import ai_service
-from ...core import AIConfigurationError, AIConnectionError, create_http_exception
+from ...services.ai_service import ai_client_cache
+from ...config import settings
+from ...core import AIConfigurationError, AIConnectionError, create_http_exception, parse_api_config
 
 router = APIRouter()
 
@@ -14,8 +15,8 @@ router = APIRouter()
 async def login(login_data: LoginRequest, response: Response):
     """用户登录"""
     try:
-        # 初始化AI客户端
-        ai_service.initialize_client(login_data.api_url, login_data.api_key, login_data.model)
+        # 初始化AI客户端（放入缓存，后续请求复用）
+        ai_client_cache.get(login_data.api_url, login_data.api_key, login_data.model)
         
         # 保存到Cookie，包含模型名称
         response.set_cookie(
@@ -35,10 +36,12 @@ async def login(login_data: LoginRequest, response: Response):
 
 
 @router.post("/logout", response_model=LogoutResponse)
-async def logout(response: Response):
+async def logout(request: Request, response: Response):
     """用户退出登录"""
-    # 清理AI客户端
-    ai_service.client = None
+    # 清理该配置缓存的AI客户端
+    config = parse_api_config(request.cookies.get("api_config"))
+    if config:
+        ai_client_cache.discard(config[0], config[1])
     
     # 删除Cookie
     for secure_flag in (False, True):
@@ -65,52 +68,32 @@ async def get_config(request: Request):
             api_url="", 
             api_key="", 
             logged_in=False, 
-            default_model="Qwen3-Next-80B-A3B-Instruct"
+            default_model=settings.default_model
         )
     
-    try:
-        # 解析Cookie格式：url|key|model
-        parts = cookie.split("|")
-        if len(parts) < 2:
-            return ConfigResponse(
-                api_url="", 
-                api_key="", 
-                logged_in=False, 
-                default_model="Qwen3-Next-80B-A3B-Instruct"
-            )
-        
-        url = parts[0].strip()
-        key = parts[1].strip()
-        model = parts[2].strip() if len(parts) > 2 and parts[2].strip() else "Qwen3-Next-80B-A3B-Instruct"
-        
-        if not url or not key:
-            return ConfigResponse(
-                api_url="", 
-                api_key="", 
-                logged_in=False, 
-                default_model=model
-            )
-        
-        # 验证API配置是否有效
-        try:
-            ai_service.initialize_client(url, key, model)
-            return ConfigResponse(
-                api_url=url, 
-                api_key=key, 
-                logged_in=True, 
-                default_model=model
-            )
-        except Exception:
-            return ConfigResponse(
-                api_url=url, 
-                api_key=key, 
-                logged_in=False, 
-                default_model=model
-            )
-    except Exception:
+    config = parse_api_config(cookie)
+    if not config:
         return ConfigResponse(
             api_url="", 
             api_key="", 
             logged_in=False, 
-            default_model="Qwen3-Next-80B-A3B-Instruct"
+            default_model=settings.default_model
+        )
+    
+    url, key, model = config
+    # 验证API配置是否有效
+    try:
+        ai_client_cache.get(url, key, model)
+        return ConfigResponse(
+            api_url=url, 
+            api_key=key, 
+            logged_in=True, 
+            default_model=model
+        )
+    except Exception:
+        return ConfigResponse(
+            api_url=url, 
+            api_key=key, 
+            logged_in=False, 
+            default_model=model
         )
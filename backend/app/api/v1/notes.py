@@ -1,15 +1,16 @@
 """
 笔记相关API路由
 """
-from typing import Optional
+from typing import Optional, Union
 from fastapi import APIRouter, Request, HTTPException, Query, Depends
 from ..deps import get_optional_ai_service
 from ...schemas import (
-    NoteCreate, NoteUpdate, NoteResponse, NoteListResponse, 
+    NoteCreate, NoteUpdate, NoteResponse, NoteListResponse, NotePageResponse,
     NoteSearchRequest, NoteFilterRequest
 )
-from ...services.note_service import note_service
-from ...core import NoteNotFoundError, create_http_exception
+from ...config import settings
+from ...services.note_service import async_note_service
+from ...core import NoteNotFoundError, InvalidCursorError, create_http_exception
 
 router = APIRouter()
 
@@ -18,7 +19,7 @@ router = APIRouter()
 async def create_note(note_data: NoteCreate, request: Request):
     """创建笔记"""
     try:
-        return note_service.create_note(note_data, dict(request.cookies))
+        return await async_note_service.create_note(note_data, dict(request.cookies))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"创建笔记失败: {str(e)}")
 
@@ -27,7 +28,7 @@ async def create_note(note_data: NoteCreate, request: Request):
 async def get_note(id: int = Query(..., description="笔记ID")):
     """获取笔记详情"""
     try:
-        return note_service.get_note(id)
+        return await async_note_service.get_note(id)
     except NoteNotFoundError as e:
         raise create_http_exception(e)
     except Exception as e:
@@ -38,18 +39,29 @@ async def get_note(id: int = Query(..., description="笔记ID")):
 async def update_note(note_data: NoteUpdate, request: Request):
     """更新笔记"""
     try:
-        return note_service.update_note(note_data.id, note_data, dict(request.cookies))
+        return await async_note_service.update_note(note_data.id, note_data, dict(request.cookies))
     except NoteNotFoundError as e:
         raise create_http_exception(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"更新笔记失败: {str(e)}")
 
 
+@router.get("/note/classification")
+async def get_note_classification(id: int = Query(..., description="笔记ID")):
+    """获取笔记的后台 AI 分类状态（pending / failed / done）"""
+    try:
+        return await async_note_service.get_classification_status(id)
+    except NoteNotFoundError as e:
+        raise create_http_exception(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"获取分类状态失败: {str(e)}")
+
+
 @router.delete("/note")
 async def delete_note(id: int = Query(..., description="笔记ID")):
     """删除笔记"""
     try:
-        success = note_service.delete_note(id)
+        success = await async_note_service.delete_note(id)
         if not success:
             raise NoteNotFoundError(id)
         return {"message": "已删除", "id": id}
@@ -59,38 +71,62 @@ async def delete_note(id: int = Query(..., description="笔记ID")):
         raise HTTPException(status_code=500, detail=f"删除笔记失败: {str(e)}")
 
 
-@router.get("/notes", response_model=list[NoteListResponse])
-async def get_all_notes():
+@router.get("/notes", response_model=Union[list[NoteListResponse], NotePageResponse])
+async def get_all_notes(
+    limit: Optional[int] = Query(None, ge=1, le=settings.max_page_size, description="每页数量，不传则返回全部"),
+    cursor: Optional[str] = Query(None, description="分页游标，取自上一页的 next_cursor")
+):
     """获取所有笔记"""
     try:
-        return note_service.get_all_notes()
+        return await async_note_service.get_all_notes(limit, cursor)
+    except InvalidCursorError as e:
+        raise create_http_exception(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取笔记列表失败: {str(e)}")
 
 
-@router.get("/search", response_model=list[NoteListResponse])
-async def search_notes(query: str = Query(..., description="搜索关键词")):
+@router.get("/search", response_model=Union[list[NoteListResponse], NotePageResponse])
+async def search_notes(
+    query: str = Query(..., description="搜索关键词"),
+    order_by: str = Query("created_at", pattern="^(created_at|relevance)$", description="排序方式：created_at 或 relevance"),
+    limit: Optional[int] = Query(None, ge=1, le=settings.max_page_size, description="每页数量，不传则返回全部"),
+    cursor: Optional[str] = Query(None, description="分页游标，取自上一页的 next_cursor")
+):
     """搜索笔记"""
     try:
-        return note_service.search_notes(query)
+        return await async_note_service.search_notes(query, order_by, limit, cursor)
+    except InvalidCursorError as e:
+        raise create_http_exception(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"搜索失败: {str(e)}")
 
 
-@router.get("/notes/by_category", response_model=list[NoteListResponse])
-async def get_notes_by_category(category: str = Query(..., description="分类名称")):
+@router.get("/notes/by_category", response_model=Union[list[NoteListResponse], NotePageResponse])
+async def get_notes_by_category(
+    category: str = Query(..., description="分类名称"),
+    limit: Optional[int] = Query(None, ge=1, le=settings.max_page_size, description="每页数量，不传则返回全部"),
+    cursor: Optional[str] = Query(None, description="分页游标，取自上一页的 next_cursor")
+):
     """根据分类获取笔记"""
     try:
-        return note_service.get_notes_by_category(category)
+        return await async_note_service.get_notes_by_category(category, limit, cursor)
+    except InvalidCursorError as e:
+        raise create_http_exception(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"按分类获取笔记失败: {str(e)}")
 
 
-@router.get("/notes/by_tag", response_model=list[NoteListResponse])
-async def get_notes_by_tag(tag: str = Query(..., description="标签名称")):
+@router.get("/notes/by_tag", response_model=Union[list[NoteListResponse], NotePageResponse])
+async def get_notes_by_tag(
+    tag: str = Query(..., description="标签名称"),
+    limit: Optional[int] = Query(None, ge=1, le=settings.max_page_size, description="每页数量，不传则返回全部"),
+    cursor: Optional[str] = Query(None, description="分页游标，取自上一页的 next_cursor")
+):
     """根据标签获取笔记"""
     try:
-        return note_service.get_notes_by_tag(tag)
+        return await async_note_service.get_notes_by_tag(tag, limit, cursor)
+    except InvalidCursorError as e:
+        raise create_http_exception(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"按标签获取笔记失败: {str(e)}")
 
@@ -99,16 +135,28 @@ async def get_notes_by_tag(tag: str = Query(..., description="标签名称")):
 async def get_stats():
     """获取统计数据"""
     try:
-        return note_service.get_stats()
+        return await async_note_service.get_stats()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取统计数据失败: {str(e)}")
 
 
+@router.get("/files/queue")
+async def get_file_queue_status():
+    """获取笔记文件后写队列状态"""
+    return await async_note_service.get_file_queue_status()
+
+
+@router.get("/notes/classification")
+async def get_deferred_classification_status():
+    """获取后台 AI 分类队列状态"""
+    return await async_note_service.get_deferred_classification_status()
+
+
 @router.get("/categories")
 async def get_categories():
     """获取分类列表"""
     try:
-        return note_service.get_categories()
+        return await async_note_service.get_categories()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取分类列表失败: {str(e)}")
 
@@ -117,6 +165,6 @@ async def get_categories():
 async def get_tags():
     """获取标签列表"""
     try:
-        return note_service.get_tags()
+        return await async_note_service.get_tags()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"获取标签列表失败: {str(e)}")
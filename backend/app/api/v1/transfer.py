@@ -0,0 +1,91 @@
+"""
+导入导出相关API路由
+"""
+from datetime import datetime, timezone
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from ...schemas import ImportRequest, ImportJobResponse
+from ...services.export_service import export_service
+from ...services.import_service import import_service
+from ...services.watch_service import notes_watcher
+from ...core import FileOperationError, io_executor
+
+router = APIRouter()
+
+
+@router.post("/import", response_model=ImportJobResponse)
+async def start_import(import_data: ImportRequest):
+    """从服务器目录批量导入 Markdown 笔记（后台执行）"""
+    try:
+        return import_service.start_import(import_data.path, import_data.batch_size)
+    except FileOperationError as e:
+        # 目录不存在属于请求参数错误
+        raise HTTPException(status_code=400, detail=e.message)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"启动导入失败: {str(e)}")
+
+
+@router.get("/import/{job_id}", response_model=ImportJobResponse)
+async def get_import_job(job_id: str):
+    """获取导入任务进度"""
+    job = import_service.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="导入任务不存在")
+    return job
+
+
+@router.get("/export")
+async def export_notes(
+    format: str = Query(default="ndjson", pattern="^(ndjson|zip)$", description="导出格式：ndjson / zip"),
+    category: Optional[str] = Query(default=None, description="按分类过滤"),
+    tag: Optional[str] = Query(default=None, description="按标签过滤"),
+    since: Optional[datetime] = Query(default=None, description="创建时间下限（含），无时区按UTC"),
+    until: Optional[datetime] = Query(default=None, description="创建时间上限（不含），无时区按UTC")
+):
+    """流式导出笔记（NDJSON 或 notes/ 目录结构的 ZIP）"""
+    filters = {
+        "category": category,
+        "tag": tag,
+        "since_ts": _to_timestamp_ms(since),
+        "until_ts": _to_timestamp_ms(until)
+    }
+    stamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    if format == "zip":
+        body = export_service.iter_zip(**filters)
+        media_type = "application/zip"
+        filename = f"notes-{stamp}.zip"
+    else:
+        body = export_service.iter_ndjson(**filters)
+        media_type = "application/x-ndjson"
+        filename = f"notes-{stamp}.ndjson"
+    
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.get("/files/watch")
+async def get_watch_status():
+    """获取 notes 目录监视状态"""
+    return notes_watcher.status()
+
+
+@router.post("/files/rescan")
+async def rescan_notes_dir():
+    """立即扫描 notes 目录并同步外部修改"""
+    try:
+        return await io_executor.run(notes_watcher.scan)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"扫描笔记目录失败: {str(e)}")
+
+
+def _to_timestamp_ms(value: Optional[datetime]) -> Optional[int]:
+    """datetime 转为与 created_at_ts 一致的 UTC 毫秒时间戳"""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp() * 1000)
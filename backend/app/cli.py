@@ -0,0 +1,119 @@
+"""
+命令行工具
+
+用法（在项目根目录执行）：
+    python -m backend.app.cli import <目录> [--batch-size 500] [--workers N]
+    python -m backend.app.cli rebuild {db,files} [--batch-size 500] [--workers N] [--resume] [--prune]
+    python -m backend.app.cli compact [--batch-size 500]
+"""
+import argparse
+import sys
+from typing import Any, Dict, List, Optional
+
+
+def _print_progress(report: Dict[str, Any]) -> None:
+    """单行刷新打印进度"""
+    total = report["total"] or 1
+    percent = report["processed"] * 100 / total
+    sys.stdout.write(
+        f"\r[{report['status']}] {report['processed']}/{report['total']} ({percent:.1f}%) "
+        f"导入 {report['imported']} 跳过 {report['skipped']} 失败 {report['failed']} "
+        f"{report['rate']:.1f} 文件/秒"
+    )
+    sys.stdout.flush()
+
+
+def cmd_import(args: argparse.Namespace) -> int:
+    """批量导入 Markdown 目录"""
+    from .services.import_service import import_service
+    
+    report = import_service.import_directory(
+        args.directory, batch_size=args.batch_size, workers=args.workers, progress=_print_progress
+    )
+    print()
+    for error in report["errors"]:
+        print(f"  失败: {error['path']}: {error['error']}")
+    print(f"完成：共 {report['total']} 个文件，耗时 {report['elapsed']} 秒")
+    return 1 if report["failed"] else 0
+
+
+def _print_rebuild_progress(report: Dict[str, Any]) -> None:
+    """单行刷新打印重建进度"""
+    total = report["total"] or 1
+    percent = report["processed"] * 100 / total
+    if report["mode"] == "database":
+        detail = f"新建 {report['created']} 更新 {report['updated']} 冲突 {report['conflicts']}"
+    else:
+        detail = f"写出 {report['written']}"
+    sys.stdout.write(
+        f"\r[{report['status']}] {report['processed']}/{report['total']} ({percent:.1f}%) "
+        f"{detail} 删除 {report['deleted']} 失败 {report['failed']} {report['rate']:.1f} 条/秒"
+    )
+    sys.stdout.flush()
+
+
+def cmd_rebuild(args: argparse.Namespace) -> int:
+    """在数据库与 notes 目录之间重建"""
+    from .services.rebuild_service import rebuild_service
+    
+    rebuild = rebuild_service.rebuild_database if args.target == "db" else rebuild_service.rebuild_files
+    report = rebuild(
+        batch_size=args.batch_size, workers=args.workers, resume=args.resume,
+        prune=args.prune, progress=_print_rebuild_progress
+    )
+    print()
+    if report["resumed_from"] is not None:
+        print(f"从断点 {report['resumed_from']} 继续")
+    for error in report["errors"]:
+        print(f"  失败: {error['path']}: {error['error']}")
+    print(f"完成：共 {report['total']} 条，耗时 {report['elapsed']} 秒，{report['rate']:.1f} 条/秒")
+    return 1 if report["failed"] else 0
+
+
+def cmd_compact(args: argparse.Namespace) -> int:
+    """按当前压缩配置重新编码已有的大正文"""
+    from .config.settings import settings
+    from .repositories.note_repository import note_repository
+    
+    if not settings.content_compression:
+        print("未启用正文压缩（CONTENT_COMPRESSION=false），无需处理")
+        return 0
+    rewritten = note_repository.compact_contents(batch_size=args.batch_size)
+    print(f"完成：压缩 {rewritten} 条笔记正文")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m backend.app.cli", description="智能笔记管理器命令行工具")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    
+    p_import = subparsers.add_parser("import", help="批量导入 Markdown 目录")
+    p_import.add_argument("directory", help="要导入的目录")
+    p_import.add_argument("--batch-size", type=int, default=500, help="每个事务写入的笔记数")
+    p_import.add_argument("--workers", type=int, default=None, help="解析进程数，默认 CPU 核数")
+    p_import.set_defaults(func=cmd_import)
+    
+    p_rebuild = subparsers.add_parser("rebuild", help="在数据库与 notes 目录之间重建")
+    p_rebuild.add_argument("target", choices=["db", "files"],
+                           help="db：由 notes 目录重建数据库；files：由数据库重建 notes 目录")
+    p_rebuild.add_argument("--batch-size", type=int, default=500, help="每批处理的笔记数（断点粒度）")
+    p_rebuild.add_argument("--workers", type=int, default=None, help="解析进程数或写线程数")
+    p_rebuild.add_argument("--resume", action="store_true", help="从上次中断的断点继续")
+    p_rebuild.add_argument("--prune", action="store_true",
+                           help="删除另一侧已不存在的笔记（db）或多余的文件（files）")
+    p_rebuild.set_defaults(func=cmd_rebuild)
+    
+    p_compact = subparsers.add_parser("compact", help="按当前压缩配置重新编码已有的大正文")
+    p_compact.add_argument("--batch-size", type=int, default=500, help="每个事务改写的笔记数")
+    p_compact.set_defaults(func=cmd_compact)
+    
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
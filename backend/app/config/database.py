@@ -1,18 +1,33 @@
 """
 数据库配置和连接管理
 """
+import queue
 import sqlite3
+import threading
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, List
 from .settings import settings
+from .migrations import apply_migrations
+from ..core.compression import decompress_content
 
 
 class DatabaseManager:
-    """数据库管理器"""
+    """数据库管理器
+    
+    维护一个 SQLite 连接池（WAL 模式）：读操作各自取用连接并行执行，
+    写操作通过写锁与 ``BEGIN IMMEDIATE`` 串行化。同一线程内的嵌套调用
+    复用同一个连接。
+    """
     
     def __init__(self):
-        self.connection: Optional[sqlite3.Connection] = None
-        self.cursor: Optional[sqlite3.Cursor] = None
+        self.db_path: Path = settings.data_dir / "notes.db"
+        self.fts_enabled: bool = False
+        self._pool: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._connections: List[sqlite3.Connection] = []
+        self._pool_lock = threading.Lock()
+        self._write_lock = threading.RLock()
+        self._local = threading.local()
         self._init_database()
     
     def _init_database(self):
@@ -20,8 +35,7 @@ class DatabaseManager:
         # 确保数据目录存在
         settings.data_dir.mkdir(exist_ok=True)
         
-        # 连接数据库
-        db_path = settings.data_dir / "notes.db"
+        db_path = self.db_path
         
         try:
             # 检查数据库文件权限
@@ -34,11 +48,16 @@ class DatabaseManager:
             if not os.access(str(settings.data_dir), os.W_OK):
                 raise PermissionError(f"数据目录 {settings.data_dir} 没有写权限")
             
-            self.connection = sqlite3.connect(str(db_path), check_same_thread=False)
-            self.cursor = self.connection.cursor()
+            # journal_mode 是持久化设置，只需在初始化时设置一次
+            with self.connection() as conn:
+                conn.execute(f"PRAGMA journal_mode = {settings.db_journal_mode}")
             
-            # 创建表
-            self._create_tables()
+            # 执行结构迁移
+            apply_migrations(self)
+            with self.read() as cursor:
+                self.fts_enabled = cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'notes_fts'"
+                ).fetchone() is not None
             
         except sqlite3.OperationalError as e:
             if "readonly database" in str(e).lower():
@@ -50,33 +69,114 @@ class DatabaseManager:
         except Exception as e:
             raise Exception(f"数据库初始化失败: {e}")
     
-    def _create_tables(self):
-        """创建数据库表"""
-        self.cursor.execute("""
-            CREATE TABLE IF NOT EXISTS notes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                content TEXT,
-                category TEXT,
-                tags TEXT,
-                filename TEXT UNIQUE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        self.connection.commit()
+    def _connect(self) -> sqlite3.Connection:
+        """创建新连接并应用连接级 PRAGMA"""
+        conn = sqlite3.connect(
+            str(self.db_path),
+            timeout=settings.db_busy_timeout,
+            check_same_thread=False,
+            isolation_level=None  # 事务由 transaction() 显式管理
+        )
+        # 供应用内的 LIKE 检索解码压缩正文（触发器不依赖该函数）
+        conn.create_function("note_text", 1, decompress_content, deterministic=True)
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute(f"PRAGMA synchronous = {settings.db_synchronous}")
+        conn.execute(f"PRAGMA cache_size = {int(settings.db_cache_size)}")
+        conn.execute(f"PRAGMA mmap_size = {int(settings.db_mmap_size)}")
+        conn.execute(f"PRAGMA busy_timeout = {int(settings.db_busy_timeout * 1000)}")
+        return conn
+    
+    def _acquire(self) -> sqlite3.Connection:
+        """从连接池取出连接，池空且未达上限时新建"""
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            pass
+        
+        with self._pool_lock:
+            if len(self._connections) < settings.db_pool_size:
+                conn = self._connect()
+                self._connections.append(conn)
+                return conn
+        
+        try:
+            return self._pool.get(timeout=settings.db_busy_timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError("数据库连接池已耗尽") from None
+    
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """借出一个连接，同一线程内嵌套调用复用同一连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+        
+        conn = self._acquire()
+        self._local.conn = conn
+        self._local.depth = 1
+        try:
+            yield conn
+        finally:
+            self._local.conn = None
+            self._local.depth = 0
+            if conn.in_transaction:
+                conn.rollback()
+            self._pool.put(conn)
     
-    def get_connection(self) -> sqlite3.Connection:
-        """获取数据库连接"""
-        return self.connection
+    @contextmanager
+    def read(self) -> Iterator[sqlite3.Cursor]:
+        """只读游标，WAL 模式下读操作可并行"""
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                yield cursor
+            finally:
+                cursor.close()
     
-    def get_cursor(self) -> sqlite3.Cursor:
-        """获取数据库游标"""
-        return self.cursor
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Cursor]:
+        """写事务游标，写操作串行执行，退出时提交，异常时回滚"""
+        with self.connection() as conn:
+            if conn.in_transaction:
+                # 嵌套在外层事务中，由外层负责提交
+                cursor = conn.cursor()
+                try:
+                    yield cursor
+                finally:
+                    cursor.close()
+                return
+            
+            with self._write_lock:
+                conn.execute("BEGIN IMMEDIATE")
+                cursor = conn.cursor()
+                try:
+                    yield cursor
+                    conn.execute("COMMIT")
+                except BaseException:
+                    conn.execute("ROLLBACK")
+                    raise
+                finally:
+                    cursor.close()
     
     def close(self):
-        """关闭数据库连接"""
-        if self.connection:
-            self.connection.close()
+        """关闭连接池中的所有连接"""
+        with self._pool_lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            self._connections.clear()
+        while not self._pool.empty():
+            try:
+                self._pool.get_nowait()
+            except queue.Empty:
+                break
 
 
 # 全局数据库管理器实例
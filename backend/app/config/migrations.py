@@ -0,0 +1,460 @@
+"""
+数据库结构版本迁移
+
+迁移按版本号顺序执行，每个迁移在独立的写事务中运行，并与版本记录一同提交。
+已执行的版本记录在 schema_migrations 表中，启动时只执行尚未应用的迁移。
+
+新增迁移：编写 ``_mNNN_xxx(cursor)`` 函数并追加到 MIGRATIONS 末尾，
+已发布的迁移不要修改。迁移应尽量幂等（IF NOT EXISTS / OR IGNORE），
+以兼容在引入版本记录之前已经建好部分表的数据库。
+"""
+import sqlite3
+import time
+from typing import TYPE_CHECKING, Callable, List, NamedTuple
+from ..core.compression import content_hash, decompress_content
+
+if TYPE_CHECKING:
+    from .database import DatabaseManager
+
+
+class Migration(NamedTuple):
+    """单个迁移"""
+    version: int
+    description: str
+    apply: Callable[[sqlite3.Cursor], None]
+
+
+def _m001_create_notes(cursor: sqlite3.Cursor):
+    """创建笔记表"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS notes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            content TEXT,
+            category TEXT,
+            tags TEXT,
+            filename TEXT UNIQUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+
+def _m002_create_tag_tables(cursor: sqlite3.Cursor):
+    """创建标签表与笔记-标签关联表，并从逗号分隔的 tags 列迁移"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS tags (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS note_tags (
+            note_id INTEGER NOT NULL REFERENCES notes(id) ON DELETE CASCADE,
+            tag_id INTEGER NOT NULL REFERENCES tags(id) ON DELETE CASCADE,
+            PRIMARY KEY (note_id, tag_id)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_note_tags_tag_id ON note_tags(tag_id, note_id)")
+    
+    rows = cursor.execute(
+        "SELECT id, tags FROM notes WHERE tags IS NOT NULL AND tags != ''"
+    ).fetchall()
+    
+    for note_id, tags_str in rows:
+        names = list(dict.fromkeys(t.strip() for t in tags_str.split(',') if t.strip()))
+        if not names:
+            continue
+        cursor.executemany(
+            "INSERT OR IGNORE INTO tags (name) VALUES (?)", [(n,) for n in names]
+        )
+        cursor.executemany("""
+            INSERT OR IGNORE INTO note_tags (note_id, tag_id)
+            SELECT ?, id FROM tags WHERE name = ?
+        """, [(note_id, n) for n in names])
+
+
+def _m003_create_stats_tables(cursor: sqlite3.Cursor):
+    """创建分类/标签统计物化表，由触发器增量维护"""
+    # 分类统计，NULL 分类以空字符串计
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS category_stats (
+            name TEXT PRIMARY KEY,
+            count INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_category_stats_count ON category_stats(count DESC, name)")
+    
+    # 标签统计
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS tag_stats (
+            tag_id INTEGER PRIMARY KEY REFERENCES tags(id) ON DELETE CASCADE,
+            count INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_tag_stats_count ON tag_stats(count DESC, tag_id)")
+    
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS category_stats_ai AFTER INSERT ON notes BEGIN
+            INSERT INTO category_stats (name, count) VALUES (COALESCE(new.category, ''), 1)
+            ON CONFLICT(name) DO UPDATE SET count = count + 1;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS category_stats_ad AFTER DELETE ON notes BEGIN
+            UPDATE category_stats SET count = count - 1 WHERE name = COALESCE(old.category, '');
+            DELETE FROM category_stats WHERE name = COALESCE(old.category, '') AND count <= 0;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS category_stats_au AFTER UPDATE OF category ON notes
+        WHEN COALESCE(old.category, '') != COALESCE(new.category, '') BEGIN
+            UPDATE category_stats SET count = count - 1 WHERE name = COALESCE(old.category, '');
+            DELETE FROM category_stats WHERE name = COALESCE(old.category, '') AND count <= 0;
+            INSERT INTO category_stats (name, count) VALUES (COALESCE(new.category, ''), 1)
+            ON CONFLICT(name) DO UPDATE SET count = count + 1;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS tag_stats_ai AFTER INSERT ON note_tags BEGIN
+            INSERT INTO tag_stats (tag_id, count) VALUES (new.tag_id, 1)
+            ON CONFLICT(tag_id) DO UPDATE SET count = count + 1;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS tag_stats_ad AFTER DELETE ON note_tags BEGIN
+            UPDATE tag_stats SET count = count - 1 WHERE tag_id = old.tag_id;
+            DELETE FROM tag_stats WHERE tag_id = old.tag_id AND count <= 0;
+        END
+    """)
+    
+    # 全量重算，兼容统计表已存在的数据库
+    cursor.execute("DELETE FROM category_stats")
+    cursor.execute("""
+        INSERT INTO category_stats (name, count)
+        SELECT COALESCE(category, ''), COUNT(1) FROM notes GROUP BY COALESCE(category, '')
+    """)
+    cursor.execute("DELETE FROM tag_stats")
+    cursor.execute("""
+        INSERT INTO tag_stats (tag_id, count)
+        SELECT tag_id, COUNT(1) FROM note_tags GROUP BY tag_id
+    """)
+
+
+def _m004_create_fts_index(cursor: sqlite3.Cursor):
+    """创建全文检索索引（FTS5 + trigram 分词，兼容中文子串检索）"""
+    try:
+        # trigram 分词器按3字符滑动切分，对中文无需分词词典即可做子串匹配
+        cursor.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+                title, content, tags, category,
+                content='notes', content_rowid='id',
+                tokenize='trigram'
+            )
+        """)
+    except sqlite3.OperationalError as e:
+        # SQLite 版本过低（<3.34）或未编译 FTS5 时退回 LIKE 检索
+        print(f"全文索引不可用，使用 LIKE 检索: {e}")
+        return
+    
+    # 触发器保持索引与 notes 表同步
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS notes_fts_ai AFTER INSERT ON notes BEGIN
+            INSERT INTO notes_fts(rowid, title, content, tags, category)
+            VALUES (new.id, new.title, new.content, new.tags, new.category);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS notes_fts_ad AFTER DELETE ON notes BEGIN
+            INSERT INTO notes_fts(notes_fts, rowid, title, content, tags, category)
+            VALUES ('delete', old.id, old.title, old.content, old.tags, old.category);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS notes_fts_au AFTER UPDATE ON notes BEGIN
+            INSERT INTO notes_fts(notes_fts, rowid, title, content, tags, category)
+            VALUES ('delete', old.id, old.title, old.content, old.tags, old.category);
+            INSERT INTO notes_fts(rowid, title, content, tags, category)
+            VALUES (new.id, new.title, new.content, new.tags, new.category);
+        END
+    """)
+    
+    # 回填已有数据
+    cursor.execute("INSERT INTO notes_fts(notes_fts) VALUES ('rebuild')")
+
+
+def _m005_timestamps_and_indexes(cursor: sqlite3.Cursor):
+    """增加整数时间戳列与 updated_at，重建列表排序索引"""
+    columns = {r[1] for r in cursor.execute("PRAGMA table_info(notes)").fetchall()}
+    
+    # Unix 毫秒时间戳，可直接按整数排序；created_at 文本列保留用于接口展示
+    if "created_at_ts" not in columns:
+        cursor.execute("ALTER TABLE notes ADD COLUMN created_at_ts INTEGER")
+    if "updated_at" not in columns:
+        cursor.execute("ALTER TABLE notes ADD COLUMN updated_at INTEGER")
+    
+    cursor.execute("""
+        UPDATE notes
+        SET created_at_ts = CAST(strftime('%s', COALESCE(created_at, 'now')) AS INTEGER) * 1000
+        WHERE created_at_ts IS NULL
+    """)
+    cursor.execute("UPDATE notes SET updated_at = created_at_ts WHERE updated_at IS NULL")
+    
+    # 替换按文本 created_at 排序的分页索引
+    cursor.execute("DROP INDEX IF EXISTS idx_notes_created_at_id")
+    cursor.execute("DROP INDEX IF EXISTS idx_notes_category_created_at_id")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_notes_created_at_ts_id ON notes(created_at_ts, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_notes_category_created_at_ts_id ON notes(category, created_at_ts, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_notes_updated_at ON notes(updated_at)")
+    # filename 已由 UNIQUE 约束自动建立索引，无需重复创建
+    
+    # 全文索引只在被索引列变化时更新，避免 updated_at 等列的写入触发重建
+    if cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'notes_fts'"
+    ).fetchone():
+        cursor.execute("DROP TRIGGER IF EXISTS notes_fts_au")
+        cursor.execute("""
+            CREATE TRIGGER notes_fts_au AFTER UPDATE OF title, content, tags, category ON notes BEGIN
+                INSERT INTO notes_fts(notes_fts, rowid, title, content, tags, category)
+                VALUES ('delete', old.id, old.title, old.content, old.tags, old.category);
+                INSERT INTO notes_fts(rowid, title, content, tags, category)
+                VALUES (new.id, new.title, new.content, new.tags, new.category);
+            END
+        """)
+
+
+def _m006_fts_over_decoded_content(cursor: sqlite3.Cursor):
+    """全文索引改为基于解码后的正文（兼容压缩存储）
+    
+    note_text() 为连接上注册的解码函数；全文索引的外部内容表改为
+    notes_fts_source 视图，rebuild 时同样读取解码后的正文。
+    """
+    cursor.execute("""
+        CREATE VIEW IF NOT EXISTS notes_fts_source AS
+        SELECT id, title, note_text(content) AS content, tags, category FROM notes
+    """)
+    
+    cursor.execute("DROP TRIGGER IF EXISTS notes_fts_ai")
+    cursor.execute("DROP TRIGGER IF EXISTS notes_fts_ad")
+    cursor.execute("DROP TRIGGER IF EXISTS notes_fts_au")
+    cursor.execute("DROP TABLE IF EXISTS notes_fts")
+    
+    try:
+        cursor.execute("""
+            CREATE VIRTUAL TABLE notes_fts USING fts5(
+                title, content, tags, category,
+                content='notes_fts_source', content_rowid='id',
+                tokenize='trigram'
+            )
+        """)
+    except sqlite3.OperationalError as e:
+        print(f"全文索引不可用，使用 LIKE 检索: {e}")
+        return
+    
+    cursor.execute("""
+        CREATE TRIGGER notes_fts_ai AFTER INSERT ON notes BEGIN
+            INSERT INTO notes_fts(rowid, title, content, tags, category)
+            VALUES (new.id, new.title, note_text(new.content), new.tags, new.category);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER notes_fts_ad AFTER DELETE ON notes BEGIN
+            INSERT INTO notes_fts(notes_fts, rowid, title, content, tags, category)
+            VALUES ('delete', old.id, old.title, note_text(old.content), old.tags, old.category);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER notes_fts_au AFTER UPDATE OF title, content, tags, category ON notes BEGIN
+            INSERT INTO notes_fts(notes_fts, rowid, title, content, tags, category)
+            VALUES ('delete', old.id, old.title, note_text(old.content), old.tags, old.category);
+            INSERT INTO notes_fts(rowid, title, content, tags, category)
+            VALUES (new.id, new.title, note_text(new.content), new.tags, new.category);
+        END
+    """)
+    cursor.execute("INSERT INTO notes_fts(notes_fts) VALUES ('rebuild')")
+
+
+def _m007_content_hash(cursor: sqlite3.Cursor):
+    """增加正文摘要列，用于跳过未变化正文的文件重写与 AI 分析"""
+    columns = {r[1] for r in cursor.execute("PRAGMA table_info(notes)").fetchall()}
+    if "content_hash" not in columns:
+        cursor.execute("ALTER TABLE notes ADD COLUMN content_hash TEXT")
+    
+    # 分批回填，避免一次性读入全部正文
+    last_id = 0
+    while True:
+        rows = cursor.execute("""
+            SELECT id, content FROM notes
+            WHERE id > ? AND content_hash IS NULL
+            ORDER BY id LIMIT 500
+        """, (last_id,)).fetchall()
+        if not rows:
+            break
+        cursor.executemany(
+            "UPDATE notes SET content_hash = ? WHERE id = ?",
+            [(content_hash(decompress_content(content)), note_id) for note_id, content in rows]
+        )
+        last_id = rows[-1][0]
+
+
+def _m008_file_snapshots(cursor: sqlite3.Cursor):
+    """notes 目录文件快照，供目录监视增量同步使用"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS file_snapshots (
+            path TEXT PRIMARY KEY,
+            mtime_ns INTEGER NOT NULL,
+            size INTEGER NOT NULL
+        ) WITHOUT ROWID
+    """)
+
+
+def _m009_ai_classification_cache(cursor: sqlite3.Cursor):
+    """AI 分类结果缓存"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ai_classification_cache (
+            key TEXT PRIMARY KEY,
+            category TEXT NOT NULL,
+            tags TEXT NOT NULL,
+            created_at INTEGER NOT NULL,
+            last_used_at INTEGER NOT NULL,
+            hits INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_ai_classification_cache_last_used
+        ON ai_classification_cache(last_used_at)
+    """)
+
+
+def _m010_classify_status(cursor: sqlite3.Cursor):
+    """后台 AI 分类状态：NULL 表示无需分类或已完成，pending 等待分类，failed 分类失败"""
+    columns = {r[1] for r in cursor.execute("PRAGMA table_info(notes)").fetchall()}
+    if "classify_status" not in columns:
+        cursor.execute("ALTER TABLE notes ADD COLUMN classify_status TEXT")
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_notes_classify_status
+        ON notes(classify_status) WHERE classify_status IS NOT NULL
+    """)
+
+
+def _m011_fts_stored_text(cursor: sqlite3.Cursor):
+    """全文索引改为自存文本，触发器不再依赖 note_text()
+    
+    _m006 的视图与触发器调用应用连接上注册的 note_text()，sqlite3 命令行、
+    备份工具等外部连接写入 notes 时会报 "no such function"。
+    现在 notes_fts 自行保存解码后的文本：触发器只同步标题、标签、分类与
+    未压缩的正文，压缩正文由 NoteRepository 在同一事务内写入。
+    """
+    cursor.execute("DROP TRIGGER IF EXISTS notes_fts_ai")
+    cursor.execute("DROP TRIGGER IF EXISTS notes_fts_ad")
+    cursor.execute("DROP TRIGGER IF EXISTS notes_fts_au")
+    cursor.execute("DROP TRIGGER IF EXISTS notes_fts_au_content")
+    cursor.execute("DROP TABLE IF EXISTS notes_fts")
+    cursor.execute("DROP VIEW IF EXISTS notes_fts_source")
+    
+    try:
+        cursor.execute("""
+            CREATE VIRTUAL TABLE notes_fts USING fts5(
+                title, content, tags, category,
+                tokenize='trigram'
+            )
+        """)
+    except sqlite3.OperationalError as e:
+        print(f"全文索引不可用，使用 LIKE 检索: {e}")
+        return
+    
+    # 压缩正文（BLOB）先以空串占位，由仓库层补写解码后的文本
+    cursor.execute("""
+        CREATE TRIGGER notes_fts_ai AFTER INSERT ON notes BEGIN
+            INSERT INTO notes_fts(rowid, title, content, tags, category)
+            VALUES (new.id, new.title, CASE WHEN typeof(new.content) = 'text' THEN new.content ELSE '' END,
+                    new.tags, new.category);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER notes_fts_ad AFTER DELETE ON notes BEGIN
+            DELETE FROM notes_fts WHERE rowid = old.id;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER notes_fts_au AFTER UPDATE OF title, tags, category ON notes BEGIN
+            UPDATE notes_fts SET title = new.title, tags = new.tags, category = new.category
+            WHERE rowid = new.id;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER notes_fts_au_content AFTER UPDATE OF content ON notes
+        WHEN typeof(new.content) = 'text' BEGIN
+            UPDATE notes_fts SET content = new.content WHERE rowid = new.id;
+        END
+    """)
+    
+    # 分批回填，正文在 Python 中解码
+    last_id = 0
+    while True:
+        rows = cursor.execute("""
+            SELECT id, title, content, tags, category FROM notes
+            WHERE id > ? ORDER BY id LIMIT 500
+        """, (last_id,)).fetchall()
+        if not rows:
+            break
+        cursor.executemany(
+            "INSERT INTO notes_fts(rowid, title, content, tags, category) VALUES (?, ?, ?, ?, ?)",
+            [(note_id, title, decompress_content(content), tags, category)
+             for note_id, title, content, tags, category in rows]
+        )
+        last_id = rows[-1][0]
+
+
+def _m012_content_hash_index(cursor: sqlite3.Cursor):
+    """content_hash 索引，供导入时按正文查重"""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_notes_content_hash ON notes(content_hash)")
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "创建笔记表", _m001_create_notes),
+    Migration(2, "标签规范化为 tags/note_tags", _m002_create_tag_tables),
+    Migration(3, "分类/标签统计物化表", _m003_create_stats_tables),
+    Migration(4, "FTS5 全文索引", _m004_create_fts_index),
+    Migration(5, "整数时间戳、updated_at 与排序索引", _m005_timestamps_and_indexes),
+    Migration(6, "全文索引基于解码后的正文", _m006_fts_over_decoded_content),
+    Migration(7, "正文摘要 content_hash", _m007_content_hash),
+    Migration(8, "notes 目录文件快照", _m008_file_snapshots),
+    Migration(9, "AI 分类结果缓存", _m009_ai_classification_cache),
+    Migration(10, "后台 AI 分类状态", _m010_classify_status),
+    Migration(11, "全文索引自存文本，不依赖 note_text()", _m011_fts_stored_text),
+    Migration(12, "content_hash 索引", _m012_content_hash_index),
+]
+
+
+def get_schema_version(cursor: sqlite3.Cursor) -> int:
+    """获取当前数据库结构版本"""
+    row = cursor.execute("SELECT MAX(version) FROM schema_migrations").fetchone()
+    return row[0] or 0
+
+
+def apply_migrations(db: "DatabaseManager") -> List[int]:
+    """按顺序执行尚未应用的迁移，返回本次执行的版本号列表"""
+    with db.transaction() as cursor:
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at INTEGER NOT NULL
+            )
+        """)
+    
+    applied = []
+    for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+        with db.transaction() as cursor:
+            # 在写事务内复查版本，避免多进程同时启动时重复执行
+            if migration.version <= get_schema_version(cursor):
+                continue
+            migration.apply(cursor)
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, description, applied_at) VALUES (?, ?, ?)",
+                (migration.version, migration.description, int(time.time() * 1000))
+            )
+        applied.append(migration.version)
+        print(f"数据库迁移 {migration.version:03d} 已应用: {migration.description}")
+    
+    return applied
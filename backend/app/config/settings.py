@@ -21,16 +21,86 @@ class Settings(BaseModel):
     
     # 数据库配置
     database_url: str = Field(default="sqlite:///./data/notes.db", env="DATABASE_URL")
+    db_pool_size: int = Field(default=8, env="DB_POOL_SIZE")
+    db_busy_timeout: float = Field(default=5.0, env="DB_BUSY_TIMEOUT")  # 秒
+    db_journal_mode: str = Field(default="WAL", env="DB_JOURNAL_MODE")
+    db_synchronous: str = Field(default="NORMAL", env="DB_SYNCHRONOUS")
+    db_cache_size: int = Field(default=-20000, env="DB_CACHE_SIZE")  # 负数表示 KiB
+    db_mmap_size: int = Field(default=256 * 1024 * 1024, env="DB_MMAP_SIZE")
+    db_executor_workers: int = Field(default=8, env="DB_EXECUTOR_WORKERS")
+    # 笔记只读查询的线程池大小；有读查询进行时笔记写入最多等待的秒数
+    db_read_executor_workers: int = Field(default=8, env="DB_READ_EXECUTOR_WORKERS")
+    db_write_max_wait: float = Field(default=0.2, env="DB_WRITE_MAX_WAIT")
+    
+    # 正文压缩配置：超过阈值（字节）的正文压缩存储，codec 可选 zlib / zstd
+    content_compression: bool = Field(default=True, env="CONTENT_COMPRESSION")
+    content_compression_threshold: int = Field(default=4096, env="CONTENT_COMPRESSION_THRESHOLD")
+    content_compression_codec: str = Field(default="zlib", env="CONTENT_COMPRESSION_CODEC")
+    content_compression_level: int = Field(default=6, env="CONTENT_COMPRESSION_LEVEL")
+    
+    # 分页配置
+    default_page_size: int = Field(default=50, env="DEFAULT_PAGE_SIZE")
+    max_page_size: int = Field(default=500, env="MAX_PAGE_SIZE")
+    export_chunk_size: int = Field(default=200, env="EXPORT_CHUNK_SIZE")
     
     # AI配置
     default_model: str = Field(default="Qwen3-Next-80B-A3B-Instruct", env="DEFAULT_MODEL")
     openai_api_key: Optional[str] = Field(default=None, env="OPENAI_API_KEY")
     openai_base_url: Optional[str] = Field(default=None, env="OPENAI_BASE_URL")
+    # 按 API 配置缓存的客户端数量上限与空闲回收时间（秒）
+    ai_client_cache_size: int = Field(default=32, env="AI_CLIENT_CACHE_SIZE")
+    ai_client_idle_ttl: float = Field(default=600.0, env="AI_CLIENT_IDLE_TTL")
+    # AI 调用线程池大小与单次调用超时（秒）
+    ai_executor_workers: int = Field(default=4, env="AI_EXECUTOR_WORKERS")
+    ai_extract_timeout: float = Field(default=30.0, env="AI_EXTRACT_TIMEOUT")
+    ai_optimize_timeout: float = Field(default=60.0, env="AI_OPTIMIZE_TIMEOUT")
+    ai_rewrite_timeout: float = Field(default=180.0, env="AI_REWRITE_TIMEOUT")
+    # 以上超时为整个操作（含重试）的截止时间；429/5xx/超时按带抖动的指数退避重试
+    ai_max_retries: int = Field(default=2, env="AI_MAX_RETRIES")
+    ai_retry_base_delay: float = Field(default=0.5, env="AI_RETRY_BASE_DELAY")
+    ai_retry_max_delay: float = Field(default=8.0, env="AI_RETRY_MAX_DELAY")
+    # 长文本分块优化：按标题和段落边界切分，每块字符数上限、单次优化的最多块数与全局并发块数
+    ai_analyze_chunk_size: int = Field(default=3000, env="AI_ANALYZE_CHUNK_SIZE")
+    ai_rewrite_chunk_size: int = Field(default=8000, env="AI_REWRITE_CHUNK_SIZE")
+    ai_max_chunks: int = Field(default=32, env="AI_MAX_CHUNKS")
+    ai_chunk_concurrency: int = Field(default=4, env="AI_CHUNK_CONCURRENCY")
+    # 熔断：连续失败次数达到阈值后快速失败，冷却时间（秒）后放行一次探测
+    ai_breaker_failure_threshold: int = Field(default=5, env="AI_BREAKER_FAILURE_THRESHOLD")
+    ai_breaker_reset_timeout: float = Field(default=30.0, env="AI_BREAKER_RESET_TIMEOUT")
+    # 分类结果缓存：按截断后的正文、模型与分类体系版本缓存，过期时间（秒）与条数上限
+    ai_cache_enabled: bool = Field(default=True, env="AI_CACHE_ENABLED")
+    ai_cache_ttl: int = Field(default=30 * 24 * 3600, env="AI_CACHE_TTL")
+    ai_cache_max_entries: int = Field(default=10000, env="AI_CACHE_MAX_ENTRIES")
+    # 提示词中的候选分类/标签：按与正文的字符 n-gram 相似度取前 K 个（<= 0 表示全部），
+    # 每个分类/标签取最近若干篇笔记标题参与相似度计算，索引刷新间隔（秒）
+    ai_prompt_top_categories: int = Field(default=20, env="AI_PROMPT_TOP_CATEGORIES")
+    ai_prompt_top_tags: int = Field(default=40, env="AI_PROMPT_TOP_TAGS")
+    ai_taxonomy_samples: int = Field(default=20, env="AI_TAXONOMY_SAMPLES")
+    ai_taxonomy_refresh: float = Field(default=300.0, env="AI_TAXONOMY_REFRESH")
+    # 本地分类器：置信度达到 threshold 时不再请求 AI；未配置 AI 时达到 min_confidence 即采用。
+    # 笔记数少于 min_samples 的分类/标签不参与预测，重训间隔（秒）
+    local_classifier_enabled: bool = Field(default=True, env="LOCAL_CLASSIFIER_ENABLED")
+    local_classifier_threshold: float = Field(default=0.8, env="LOCAL_CLASSIFIER_THRESHOLD")
+    local_classifier_min_confidence: float = Field(default=0.5, env="LOCAL_CLASSIFIER_MIN_CONFIDENCE")
+    local_classifier_min_samples: int = Field(default=3, env="LOCAL_CLASSIFIER_MIN_SAMPLES")
+    local_classifier_retrain_interval: float = Field(default=3600.0, env="LOCAL_CLASSIFIER_RETRAIN_INTERVAL")
+    # 延迟分类：新建笔记先以默认分类保存并标记为 pending，由后台 AI 填写分类和标签
+    ai_deferred_classification: bool = Field(default=False, env="AI_DEFERRED_CLASSIFICATION")
     
     # 文件存储配置
     data_dir: Path = Field(default=Path("data"), env="DATA_DIR")
     notes_dir: Path = Field(default=Path("notes"), env="NOTES_DIR")
     prompt_file: Path = Field(default=Path("data/prompts.txt"), env="PROMPT_FILE")
+    # 笔记文件后写：请求中只预留路径，由后台线程延迟写入并合并同一笔记的多次修改
+    file_write_behind: bool = Field(default=True, env="FILE_WRITE_BEHIND")
+    file_write_delay: float = Field(default=0.5, env="FILE_WRITE_DELAY")  # 秒
+    file_fsync: bool = Field(default=True, env="FILE_FSYNC")
+    # notes 目录监视：按 mtime/size 快照轮询，把外部编辑同步到数据库
+    notes_watch: bool = Field(default=False, env="NOTES_WATCH")
+    notes_watch_interval: float = Field(default=2.0, env="NOTES_WATCH_INTERVAL")  # 秒
+    notes_watch_batch_size: int = Field(default=200, env="NOTES_WATCH_BATCH_SIZE")
+    # 单次扫描最多删除的笔记数，超过时本轮不删除（大批删除请用 rebuild db --prune）
+    notes_watch_max_deletes: int = Field(default=50, env="NOTES_WATCH_MAX_DELETES")
     
     # 服务器配置
     host: str = Field(default="0.0.0.0", env="HOST")
@@ -3,18 +3,28 @@
 """
 from .exceptions import (
     NoteAIManagerException, AIConfigurationError, 
-    AIConnectionError, NoteNotFoundError, FileOperationError,
-    create_http_exception
+    AIConnectionError, AIUnavailableError, NoteNotFoundError, FileOperationError,
+    InvalidCursorError, create_http_exception
 )
 from .security import (
     verify_password, get_password_hash, create_access_token,
-    verify_token, hash_api_config
+    verify_token, hash_api_config, parse_api_config
 )
+from .pagination import encode_cursor, decode_cursor
+from .concurrency import (
+    BlockingExecutor, ReadPriorityGate, AsyncProxy, io_executor, db_read_executor, db_write_executor, db_gate,
+    ai_executor, ai_chunk_executor
+)
+from .resilience import CircuitBreaker, call_with_retry
 
 __all__ = [
     "NoteAIManagerException", "AIConfigurationError", 
-    "AIConnectionError", "NoteNotFoundError", "FileOperationError",
-    "create_http_exception",
+    "AIConnectionError", "AIUnavailableError", "NoteNotFoundError", "FileOperationError",
+    "InvalidCursorError", "create_http_exception",
     "verify_password", "get_password_hash", "create_access_token",
-    "verify_token", "hash_api_config"
+    "verify_token", "hash_api_config", "parse_api_config",
+    "encode_cursor", "decode_cursor",
+    "BlockingExecutor", "ReadPriorityGate", "AsyncProxy", "io_executor", "db_read_executor", "db_write_executor",
+    "db_gate", "ai_executor", "ai_chunk_executor",
+    "CircuitBreaker", "call_with_retry"
 ]
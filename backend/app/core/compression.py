@@ -0,0 +1,62 @@
+"""
+笔记正文压缩编码
+
+超过阈值的正文以 BLOB 形式压缩存储，并带有格式标记前缀：
+
+- ``NZ\\x01`` + zlib 数据
+- ``NS\\x01`` + zstd 数据（需安装可选依赖 zstandard）
+
+未压缩的正文仍以 TEXT 存储，因此新旧数据可以共存，读取时按类型与前缀解码。
+content_hash 基于解码后的文本计算，与存储编码无关。
+"""
+import hashlib
+import zlib
+from typing import Optional, Union
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖
+    zstandard = None
+
+ZLIB_MAGIC = b"NZ\x01"
+ZSTD_MAGIC = b"NS\x01"
+
+
+def compress_content(text: Optional[str], threshold: int, codec: str = "zlib",
+                     level: int = 6) -> Union[str, bytes, None]:
+    """按阈值压缩正文，未达到阈值或压缩无收益时原样返回文本"""
+    if text is None:
+        return None
+    
+    raw = text.encode("utf-8")
+    if len(raw) < threshold:
+        return text
+    
+    if codec == "zstd" and zstandard is not None:
+        packed = ZSTD_MAGIC + zstandard.ZstdCompressor(level=level).compress(raw)
+    else:
+        packed = ZLIB_MAGIC + zlib.compress(raw, level)
+    
+    return packed if len(packed) < len(raw) else text
+
+
+def decompress_content(value: Union[str, bytes, None]) -> Optional[str]:
+    """解码数据库中的正文，兼容未压缩的文本"""
+    if value is None or isinstance(value, str):
+        return value
+    
+    data = bytes(value)
+    if data.startswith(ZLIB_MAGIC):
+        return zlib.decompress(data[len(ZLIB_MAGIC):]).decode("utf-8")
+    if data.startswith(ZSTD_MAGIC):
+        if zstandard is None:
+            raise RuntimeError("正文使用 zstd 压缩，但未安装 zstandard")
+        return zstandard.ZstdDecompressor().decompress(data[len(ZSTD_MAGIC):]).decode("utf-8")
+    
+    # 未知的 BLOB 按 UTF-8 文本处理
+    return data.decode("utf-8", errors="replace")
+
+
+def content_hash(text: Optional[str]) -> str:
+    """正文摘要（SHA-256 十六进制），用于判断正文是否变化"""
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
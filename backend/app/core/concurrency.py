@@ -0,0 +1,175 @@
+"""
+并发执行工具
+
+将同步的数据库/文件操作放到专用线程池中执行，避免阻塞事件循环。
+笔记的只读查询与写入分开：读查询使用单独的线程池，写入在单线程池中排队串行执行，
+在数据库写锁上等待的写入不会占满读查询的线程。
+耗时很长的 AI 调用使用单独的线程池，占满时不影响笔记读写。
+"""
+import asyncio
+import functools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Iterator, Tuple, TypeVar
+from ..config.settings import settings
+
+T = TypeVar("T")
+
+
+class BlockingExecutor:
+    """阻塞操作专用线程池"""
+    
+    def __init__(self, max_workers: int, thread_name_prefix: str):
+        self._max_workers = max_workers
+        self._thread_name_prefix = thread_name_prefix
+        self._executor: ThreadPoolExecutor = self._create_executor()
+    
+    def _create_executor(self) -> ThreadPoolExecutor:
+        return ThreadPoolExecutor(
+            max_workers=self._max_workers,
+            thread_name_prefix=self._thread_name_prefix
+        )
+    
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """在线程池中执行同步函数并等待结果"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+    
+    def submit(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> Future:
+        """提交同步函数到线程池执行，不等待结果（用于后台任务）"""
+        return self._executor.submit(func, *args, **kwargs)
+    
+    async def iterate(self, func: Callable[..., Iterator[T]], *args: Any, **kwargs: Any) -> AsyncIterator[T]:
+        """在线程池的一个线程中消费同步迭代器，逐项异步产出
+        
+        整个迭代占用一个工作线程，因此并发迭代数同样受线程池大小限制。
+        消费方提前结束（例如客户端断开）时通知生产线程停止并关闭迭代器。
+        """
+        loop = asyncio.get_running_loop()
+        items: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        
+        def put(entry) -> None:
+            try:
+                loop.call_soon_threadsafe(items.put_nowait, entry)
+            except RuntimeError:
+                # 事件循环已关闭
+                stop.set()
+        
+        def produce() -> None:
+            iterator = func(*args, **kwargs)
+            try:
+                for item in iterator:
+                    if stop.is_set():
+                        break
+                    put((False, item))
+                put((True, None))
+            except BaseException as e:
+                put((True, e))
+            finally:
+                close = getattr(iterator, "close", None)
+                if close:
+                    close()
+        
+        loop.run_in_executor(self._executor, produce)
+        try:
+            while True:
+                finished, value = await items.get()
+                if finished:
+                    if value is not None:
+                        raise value
+                    return
+                yield value
+        finally:
+            stop.set()
+    
+    def shutdown(self, wait: bool = True) -> None:
+        """关闭线程池，之后的调用会使用新的线程池"""
+        executor, self._executor = self._executor, self._create_executor()
+        executor.shutdown(wait=wait)
+
+
+class ReadPriorityGate:
+    """读优先闸门：写操作开始前等待进行中的读操作结束，最多等待 max_wait 秒
+    
+    sqlite3 逐行取结果时都会释放 GIL，读查询与写线程同时运行时大部分时间花在重新获取
+    GIL 上，列表查询延迟成倍增加。写操作让开读操作后读查询基本独占解释器；
+    等待有上限，持续的读请求不会让写操作一直等待。
+    """
+    
+    def __init__(self, max_wait: float):
+        self._max_wait = max_wait
+        self._cond = threading.Condition()
+        self._readers = 0
+    
+    def read(self, func: Callable[..., T]) -> Callable[..., T]:
+        """包装读操作，执行期间计入进行中的读操作"""
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> T:
+            with self._cond:
+                self._readers += 1
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with self._cond:
+                    self._readers -= 1
+                    if not self._readers:
+                        self._cond.notify_all()
+        
+        return wrapper
+    
+    def write(self, func: Callable[..., T]) -> Callable[..., T]:
+        """包装写操作，开始前等待读操作结束"""
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> T:
+            with self._cond:
+                self._cond.wait_for(lambda: not self._readers, timeout=self._max_wait)
+            return func(*args, **kwargs)
+        
+        return wrapper
+
+
+class AsyncProxy:
+    """异步代理：将同步服务对象的方法包装为在线程池中执行的协程
+    
+    用法：``await AsyncProxy(note_service, executor).get_note(1)``
+    """
+    
+    def __init__(self, target: Any, executor: BlockingExecutor):
+        self._target = target
+        self._executor = executor
+    
+    def _bind(self, name: str, func: Callable[..., T]) -> Tuple[BlockingExecutor, Callable[..., T]]:
+        """返回方法使用的线程池与实际执行的函数，子类可按方法区分"""
+        return self._executor, func
+    
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+        executor, func = self._bind(name, attr)
+        
+        @functools.wraps(attr)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            return await executor.run(func, *args, **kwargs)
+        
+        return wrapper
+
+
+# 全局数据库/文件操作线程池
+io_executor = BlockingExecutor(settings.db_executor_workers, "note-io")
+
+# 全局笔记只读查询线程池
+db_read_executor = BlockingExecutor(settings.db_read_executor_workers, "note-db-read")
+
+# 全局笔记写入线程池：单线程，写入在队列中串行等待，不占用其他线程池的线程
+db_write_executor = BlockingExecutor(1, "note-db-write")
+
+# 全局笔记读写闸门
+db_gate = ReadPriorityGate(settings.db_write_max_wait)
+
+# 全局AI调用线程池，限制同时进行的 AI 请求数
+ai_executor = BlockingExecutor(settings.ai_executor_workers, "note-ai")
+
+# 全局长文本分块请求线程池，所有分块优化共用，避免并发数随请求数成倍增加
+ai_chunk_executor = BlockingExecutor(settings.ai_chunk_concurrency, "note-ai-chunk")
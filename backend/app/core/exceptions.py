@@ -26,6 +26,13 @@ class AIConnectionError(NoteAIManagerException):
         super().__init__(message, 400)
 
 
+class AIUnavailableError(AIConnectionError):
+    """AI服务暂时不可用（熔断或超过截止时间）"""
+    def __init__(self, message: str = "AI服务暂时不可用，请稍后重试"):
+        super().__init__(message)
+        self.status_code = 503
+
+
 class NoteNotFoundError(NoteAIManagerException):
     """笔记未找到错误"""
     def __init__(self, note_id: int):
@@ -38,6 +45,12 @@ class FileOperationError(NoteAIManagerException):
         super().__init__(message, 500)
 
 
+class InvalidCursorError(NoteAIManagerException):
+    """分页游标无效"""
+    def __init__(self, message: str = "分页游标无效"):
+        super().__init__(message, 400)
+
+
 def create_http_exception(exc: NoteAIManagerException) -> HTTPException:
     """将自定义异常转换为HTTP异常"""
     return HTTPException(
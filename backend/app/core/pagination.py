@@ -0,0 +1,29 @@
+"""
+键集（游标）分页工具
+
+游标对客户端不透明：内容为排序方式与上一页最后一条记录排序键的 JSON，
+经 URL 安全的 base64 编码。
+"""
+import base64
+import json
+from typing import Any, List
+from .exceptions import InvalidCursorError
+
+
+def encode_cursor(order: str, keys: List[Any]) -> str:
+    """编码分页游标"""
+    payload = json.dumps({"o": order, "k": keys}, ensure_ascii=False, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, order: str) -> tuple:
+    """解码分页游标，游标无效或与排序方式不符时抛出 InvalidCursorError"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        obj = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+        keys = obj["k"]
+        if obj.get("o") != order or not isinstance(keys, list) or len(keys) != 2:
+            raise ValueError("cursor order mismatch")
+        return tuple(keys)
+    except Exception:
+        raise InvalidCursorError() from None
@@ -0,0 +1,133 @@
+"""
+远程调用容错工具
+
+熔断器在上游连续失败后快速失败，经过冷却时间后放行一次探测请求；
+call_with_retry 在操作截止时间内对可重试错误做带抖动的指数退避重试。
+"""
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, TypeVar
+from .exceptions import AIUnavailableError
+
+T = TypeVar("T")
+
+
+class CircuitBreaker:
+    """熔断器：closed 正常放行，open 直接拒绝，half_open 只放行一次探测"""
+    
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = "closed"
+        self._consecutive_failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._stats = {"calls": 0, "successes": 0, "failures": 0, "retries": 0, "rejected": 0, "opened": 0}
+        self._last_error: Optional[str] = None
+    
+    def allow(self) -> bool:
+        """是否放行一次调用，拒绝时计数"""
+        with self._lock:
+            if self._state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self._state = "half_open"
+                self._probing = False
+            if self._state == "closed" or (self._state == "half_open" and not self._probing):
+                if self._state == "half_open":
+                    self._probing = True
+                self._stats["calls"] += 1
+                return True
+            self._stats["rejected"] += 1
+            return False
+    
+    def record_success(self) -> None:
+        with self._lock:
+            self._stats["successes"] += 1
+            self._consecutive_failures = 0
+            self._state = "closed"
+            self._probing = False
+    
+    def record_failure(self, error: str) -> None:
+        """记录一次上游故障（超时、连接失败、429/5xx）"""
+        with self._lock:
+            self._stats["failures"] += 1
+            self._consecutive_failures += 1
+            self._last_error = error[:200]
+            if self._state == "half_open" or self._consecutive_failures >= self.failure_threshold:
+                if self._state != "open":
+                    self._stats["opened"] += 1
+                self._state = "open"
+                self._opened_at = time.monotonic()
+                self._probing = False
+    
+    def record_retry(self) -> None:
+        with self._lock:
+            self._stats["retries"] += 1
+    
+    def release(self) -> None:
+        """调用以非上游故障结束（例如 4xx），探测名额交还，状态不变"""
+        with self._lock:
+            self._probing = False
+    
+    def retry_after(self) -> float:
+        """熔断打开时距下次探测的秒数"""
+        with self._lock:
+            if self._state != "open":
+                return 0.0
+            return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """当前状态与计数"""
+        retry_after = self.retry_after()
+        with self._lock:
+            return {
+                "state": self._state,
+                "consecutive_failures": self._consecutive_failures,
+                "retry_after": round(retry_after, 1),
+                "last_error": self._last_error,
+                **self._stats
+            }
+
+
+def call_with_retry(func: Callable[[float], T], deadline: float, breaker: CircuitBreaker,
+                    is_retryable: Callable[[Exception], bool],
+                    retry_delay: Callable[[Exception], Optional[float]] = lambda e: None,
+                    max_retries: int = 2, base_delay: float = 0.5, max_delay: float = 8.0) -> T:
+    """在截止时间（time.monotonic() 时刻）内调用 func(剩余秒数)
+    
+    可重试错误按 base_delay * 2^n 的全抖动退避重试，至多 max_retries 次，
+    retry_delay 可给出上游要求的等待时间（如 Retry-After）。
+    熔断打开或剩余时间不足以再试一次时抛出 AIUnavailableError 或最后一次的错误。
+    """
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            raise AIUnavailableError(
+                f"AI服务暂时不可用，请 {max(1, round(breaker.retry_after()))} 秒后重试"
+            )
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            breaker.release()
+            raise AIUnavailableError("AI服务响应超时，请稍后重试")
+        
+        try:
+            result = func(remaining)
+        except Exception as e:
+            if not is_retryable(e):
+                breaker.release()
+                raise
+            breaker.record_failure(str(e))
+            
+            delay = retry_delay(e)
+            if delay is None:
+                delay = random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+            if attempt >= max_retries or time.monotonic() + delay >= deadline:
+                raise
+            attempt += 1
+            breaker.record_retry()
+            time.sleep(delay)
+            continue
+        
+        breaker.record_success()
+        return result
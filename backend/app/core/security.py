@@ -2,7 +2,7 @@
 安全相关功能
 """
 import hashlib
-from typing import Optional
+from typing import Optional, Tuple
 from jose import jwt
 from passlib.context import CryptContext
 from ..config import settings
@@ -41,3 +41,18 @@ def hash_api_config(api_url: str, api_key: str) -> str:
     """哈希API配置"""
     config_string = f"{api_url}|{api_key}"
     return hashlib.sha256(config_string.encode()).hexdigest()
+
+
+def parse_api_config(value: Optional[str]) -> Optional[Tuple[str, str, str]]:
+    """解析 api_config Cookie（url|key|model），缺少模型时使用默认模型，无效时返回 None"""
+    if not value:
+        return None
+    parts = value.split("|")
+    if len(parts) < 2:
+        return None
+    url = parts[0].strip()
+    key = parts[1].strip()
+    model = parts[2].strip() if len(parts) > 2 and parts[2].strip() else settings.default_model
+    if not url or not key:
+        return None
+    return url, key, model
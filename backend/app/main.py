@@ -4,21 +4,57 @@ Copyright (C) 2025 sean.su
 
 FastAPI应用主入口
 """
+from contextlib import asynccontextmanager
 from pathlib import Path
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse, FileResponse
-from .config import settings
-from .api.v1 import auth_router, notes_router, ai_router
+from .config import settings, db_manager
+from .core import ai_chunk_executor, ai_executor, db_read_executor, db_write_executor, io_executor
+from .repositories.ai_cache_repository import ai_cache_repository
+from .services.file_service import file_service
+from .services.watch_service import notes_watcher
+from .services.ai_service import ai_client_cache
+from .services.local_classifier import local_classifier
+from .services.deferred_classify_service import deferred_classifier
+from .api.v1 import auth_router, notes_router, ai_router, transfer_router
 
 # 获取项目根目录
 BASE_DIR = Path(__file__).parent.parent.parent
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期
+    
+    启动时按配置开启 notes 目录监视、在后台训练本地分类器并重新登记未完成的后台分类；
+    关闭时停止监视、等待后台线程池完成、写出待写笔记文件与AI缓存命中记录、关闭AI客户端并释放数据库连接。
+    """
+    if settings.notes_watch:
+        notes_watcher.start()
+    if settings.local_classifier_enabled:
+        local_classifier.start_training()
+    deferred_classifier.resume_pending()
+    yield
+    notes_watcher.stop()
+    # 未完成的 AI 请求随服务关闭放弃，不等待
+    ai_executor.shutdown(wait=False)
+    ai_chunk_executor.shutdown(wait=False)
+    db_write_executor.shutdown(wait=True)
+    io_executor.shutdown(wait=True)
+    db_read_executor.shutdown(wait=True)
+    file_service.shutdown()
+    ai_cache_repository.flush()
+    ai_client_cache.clear()
+    db_manager.close()
+
+
 # 创建FastAPI应用
 app = FastAPI(
     title=settings.app_name,
     version=settings.app_version,
-    description="智能笔记管理系统 - AI自动分类，自动优化，一键存储，全文搜索"
+    description="智能笔记管理系统 - AI自动分类，自动优化，一键存储，全文搜索",
+    lifespan=lifespan
 )
 
 # 挂载静态文件
@@ -39,11 +75,13 @@ app.mount("/static", StaticFiles(directory=str(root_static_dir)), name="static")
 app.include_router(auth_router, prefix="/api", tags=["认证"])
 app.include_router(notes_router, prefix="/api", tags=["笔记"])
 app.include_router(ai_router, prefix="/api", tags=["AI"])
+app.include_router(transfer_router, prefix="/api", tags=["导入导出"])
 
 # 为了兼容性，同时注册v1版本的路由
 app.include_router(auth_router, prefix="/api/v1", tags=["认证v1"])
 app.include_router(notes_router, prefix="/api/v1", tags=["笔记v1"])
 app.include_router(ai_router, prefix="/api/v1", tags=["AIv1"])
+app.include_router(transfer_router, prefix="/api/v1", tags=["导入导出v1"])
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -0,0 +1,83 @@
+"""
+笔记 Markdown 解析
+
+只依赖标准库、没有模块级副作用，可在导入、重建使用的解析子进程中直接调用。
+不放在 core 下：导入 core 会连带导入配置并初始化数据库。
+"""
+import re
+from pathlib import Path
+from typing import Any, Dict, List
+
+# save_note_to_file 写入的头部格式
+_HEADER_CATEGORY_RE = re.compile(r"^\*\*分类[：:]\*\*\s*(.*)$")
+_HEADER_TAGS_RE = re.compile(r"^\*\*标签[：:]\*\*\s*(.*)$")
+
+
+def parse_note_markdown(text: str) -> Dict[str, Any]:
+    """解析笔记 Markdown 文件
+    
+    识别 save_note_to_file 写入的头部（``# 标题``、``**分类：**``、``**标签：**``），
+    返回 title/category/tags/content，缺失的头部字段为 None。
+    """
+    lines = text.lstrip("\ufeff").split("\n")
+    title = None
+    category = None
+    tags = None
+    index = 0
+    
+    if lines and lines[0].startswith("# "):
+        title = lines[0][2:].strip() or None
+        index = 1
+        
+        while index < len(lines):
+            line = lines[index].rstrip("\r")
+            m_category = _HEADER_CATEGORY_RE.match(line)
+            m_tags = _HEADER_TAGS_RE.match(line)
+            if m_category and category is None:
+                category = m_category.group(1).strip() or None
+            elif m_tags and tags is None:
+                tags = [t.strip() for t in re.split(r"[,，]", m_tags.group(1)) if t.strip()]
+            else:
+                break
+            index += 1
+        
+        # 没有分类/标签行时，"# " 行属于正文本身
+        if category is None and tags is None:
+            title = None
+            index = 0
+        elif index < len(lines) and not lines[index].strip():
+            # 头部与正文之间的空行
+            index += 1
+    
+    return {
+        "title": title,
+        "category": category,
+        "tags": tags,
+        "content": "\n".join(lines[index:])
+    }
+
+
+def parse_note_file(path_str: str, root_str: str) -> Dict[str, Any]:
+    """读取并解析单个 Markdown 文件（可在子进程中执行），失败时返回含 error 的字典"""
+    path = Path(path_str)
+    try:
+        text = path.read_text(encoding="utf-8")
+        parsed = parse_note_markdown(text)
+        rel_parent = path.parent.relative_to(root_str)
+        stat = path.stat()
+        return {
+            "path": path_str,
+            "title": parsed["title"] or path.stem,
+            "content": parsed["content"],
+            # 没有头部时以所在目录作为分类
+            "category": parsed["category"] or (rel_parent.parts[0] if rel_parent.parts else None),
+            "tags": parsed["tags"],
+            "created_at_ts": int(stat.st_mtime * 1000)
+        }
+    except Exception as e:
+        return {"path": path_str, "error": str(e)}
+
+
+def parse_note_files(paths: List[str], root_str: str) -> List[Dict[str, Any]]:
+    """按顺序解析一组文件，作为进程池的一个任务提交以减少进程间往返"""
+    return [parse_note_file(path, root_str) for path in paths]
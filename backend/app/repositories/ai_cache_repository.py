@@ -0,0 +1,156 @@
+"""
+AI 分类结果缓存数据访问层
+"""
+import hashlib
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+from ..config.database import db_manager
+from ..config.settings import settings
+
+
+class AICacheRepository:
+    """AI 分类结果缓存仓库类
+    
+    缓存键为截断后的正文、模型与分类体系版本的摘要；命中/未命中次数为进程内计数。
+    查询只用读连接：命中时的最近使用时间与命中次数先记在内存中，攒够一批或超过
+    间隔后在一个写事务中批量写回。条数超过上限时才批量淘汰最久未使用的条目。
+    """
+    
+    # 内存中累计的命中记录达到该条数或间隔（秒）后写回
+    TOUCH_FLUSH_SIZE = 64
+    TOUCH_FLUSH_INTERVAL = 30.0
+    # 超出上限时额外多淘汰的比例，避免每次写入都触发淘汰
+    EVICT_HEADROOM = 0.1
+    
+    def __init__(self):
+        self.db = db_manager
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0}
+        # key -> (最近使用时间, 未写回的命中次数)
+        self._touched: Dict[str, Tuple[int, int]] = {}
+        self._last_flush = time.monotonic()
+        # 条数估计（写入时递增，淘汰后按实际条数校正），None 表示尚未统计
+        self._entries: Optional[int] = None
+    
+    def make_key(self, content: str, model: str, taxonomy_version: str) -> str:
+        """生成缓存键"""
+        raw = "\x00".join((model, taxonomy_version, content))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+    
+    def get(self, key: str) -> Optional[Tuple[str, List[str]]]:
+        """读取未过期的缓存结果；过期条目视为未命中，由后续写入覆盖或淘汰时删除"""
+        now_ms = int(time.time() * 1000)
+        expire_before = now_ms - settings.ai_cache_ttl * 1000
+        with self.db.read() as cursor:
+            row = cursor.execute(
+                "SELECT category, tags, created_at FROM ai_classification_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row and row[2] < expire_before:
+            row = None
+        
+        with self._lock:
+            self._stats["hits" if row else "misses"] += 1
+            if row:
+                _, hits = self._touched.get(key, (0, 0))
+                self._touched[key] = (now_ms, hits + 1)
+            flush = (len(self._touched) >= self.TOUCH_FLUSH_SIZE
+                     or time.monotonic() - self._last_flush >= self.TOUCH_FLUSH_INTERVAL)
+        if flush:
+            self.flush()
+        
+        if not row:
+            return None
+        return row[0], [t for t in row[1].split(",") if t]
+    
+    def put(self, key: str, category: str, tags: List[str]) -> None:
+        """写入缓存结果，条数超出上限时批量淘汰最久未使用的条目"""
+        now_ms = int(time.time() * 1000)
+        with self.db.transaction() as cursor:
+            cursor.execute("""
+                INSERT INTO ai_classification_cache (key, category, tags, created_at, last_used_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    category = excluded.category, tags = excluded.tags,
+                    created_at = excluded.created_at, last_used_at = excluded.last_used_at
+            """, (key, category, ",".join(tags), now_ms, now_ms))
+        
+        with self._lock:
+            self._stats["stores"] += 1
+            if self._entries is not None:
+                self._entries += 1
+            entries = self._entries
+        if entries is None:
+            entries = self._count()
+        if entries > settings.ai_cache_max_entries:
+            self._evict()
+    
+    def flush(self) -> None:
+        """把内存中累计的命中记录写回数据库"""
+        with self._lock:
+            touched, self._touched = self._touched, {}
+            self._last_flush = time.monotonic()
+        if not touched:
+            return
+        with self.db.transaction() as cursor:
+            cursor.executemany("""
+                UPDATE ai_classification_cache
+                SET last_used_at = MAX(last_used_at, ?), hits = hits + ?
+                WHERE key = ?
+            """, [(used_at, hits, key) for key, (used_at, hits) in touched.items()])
+    
+    def _count(self) -> int:
+        """统计实际条数并校正估计值"""
+        with self.db.read() as cursor:
+            entries = cursor.execute("SELECT COUNT(*) FROM ai_classification_cache").fetchone()[0]
+        with self._lock:
+            self._entries = entries
+        return entries
+    
+    def _evict(self) -> None:
+        """删除过期条目，并把条数淘汰到上限以下留出余量"""
+        self.flush()
+        max_entries = max(settings.ai_cache_max_entries, 0)
+        keep = int(max_entries * (1 - self.EVICT_HEADROOM))
+        expire_before = int(time.time() * 1000) - settings.ai_cache_ttl * 1000
+        with self.db.transaction() as cursor:
+            cursor.execute("DELETE FROM ai_classification_cache WHERE created_at < ?", (expire_before,))
+            entries = cursor.execute("SELECT COUNT(*) FROM ai_classification_cache").fetchone()[0]
+            if entries > keep:
+                cursor.execute("""
+                    DELETE FROM ai_classification_cache WHERE key IN (
+                        SELECT key FROM ai_classification_cache
+                        ORDER BY last_used_at LIMIT ?
+                    )
+                """, (entries - keep,))
+                entries = keep
+        with self._lock:
+            self._entries = entries
+    
+    def clear(self) -> int:
+        """清空缓存，返回删除的条数"""
+        with self._lock:
+            self._touched.clear()
+            self._entries = 0
+        with self.db.transaction() as cursor:
+            cursor.execute("DELETE FROM ai_classification_cache")
+            return cursor.rowcount
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """缓存条数与命中统计"""
+        entries = self._count()
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        return {
+            "enabled": settings.ai_cache_enabled,
+            "entries": entries,
+            "max_entries": settings.ai_cache_max_entries,
+            "ttl": settings.ai_cache_ttl,
+            **stats,
+            "hit_rate": round(stats["hits"] / lookups, 3) if lookups else 0.0
+        }
+
+
+# 全局AI缓存仓库实例
+ai_cache_repository = AICacheRepository()
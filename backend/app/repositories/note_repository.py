@@ -1,200 +1,764 @@
 """
 笔记数据访问层
 """
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterator, Set, Tuple
+import time
 from datetime import datetime
 from ..config.database import db_manager
+from ..config.settings import settings
+from ..core.compression import compress_content, decompress_content, content_hash
 from ..core import NoteNotFoundError
 
 
 class NoteRepository:
     """笔记数据访问类"""
     
+    # trigram 分词器的最短可索引长度
+    FTS_MIN_QUERY_LENGTH = 3
+    
     def __init__(self):
         self.db = db_manager
     
-    def create_note(self, title: str, content: str, category: str, tags: str, filename: str) -> int:
-        """创建笔记"""
-        cursor = self.db.get_cursor()
-        cursor.execute("""
-            INSERT INTO notes (title, content, category, tags, filename)
-            VALUES (?, ?, ?, ?, ?)
-        """, (title, content, category, tags, filename))
-        self.db.get_connection().commit()
-        return cursor.lastrowid
+    def create_note(self, title: str, content: str, category: str, tags: str, filename: str,
+                    classify_status: Optional[str] = None) -> int:
+        """创建笔记，classify_status 为 pending 表示分类和标签等待后台 AI 填写"""
+        now_ms = self._now_ms()
+        encoded = self._encode_content(content)
+        with self.db.transaction() as cursor:
+            cursor.execute("""
+                INSERT INTO notes
+                    (title, content, content_hash, category, tags, filename, created_at, created_at_ts, updated_at,
+                     classify_status)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (title, encoded, content_hash(content), category, tags, filename,
+                  self._format_timestamp(now_ms), now_ms, now_ms, classify_status))
+            note_id = cursor.lastrowid
+            self._sync_fts_content(cursor, note_id, content, encoded)
+            self._replace_note_tags(cursor, note_id, tags)
+            return note_id
+    
+    def bulk_create_notes(self, notes: List[Dict[str, Any]]) -> List[int]:
+        """在单个事务中批量创建笔记
+        
+        每项包含 title/content/category/tags/filename，可选 created_at_ts（毫秒）。
+        filename 已存在的笔记跳过，返回新建笔记的ID列表。
+        """
+        now_ms = self._now_ms()
+        created_ids = []
+        with self.db.transaction() as cursor:
+            for note in notes:
+                created_ms = note.get("created_at_ts") or now_ms
+                encoded = self._encode_content(note["content"])
+                cursor.execute("""
+                    INSERT OR IGNORE INTO notes
+                        (title, content, content_hash, category, tags, filename,
+                         created_at, created_at_ts, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (note["title"], encoded, content_hash(note["content"]),
+                      note["category"], note["tags"], note["filename"],
+                      self._format_timestamp(created_ms), created_ms, now_ms))
+                if cursor.rowcount == 0:
+                    continue
+                note_id = cursor.lastrowid
+                self._sync_fts_content(cursor, note_id, note["content"], encoded)
+                self._replace_note_tags(cursor, note_id, note["tags"])
+                created_ids.append(note_id)
+        return created_ids
     
     def get_note_by_id(self, note_id: int) -> Optional[Dict[str, Any]]:
         """根据ID获取笔记"""
-        cursor = self.db.get_cursor()
-        cursor.execute("""
-            SELECT id, title, content, category, tags, filename, created_at
-            FROM notes WHERE id = ?
-        """, (note_id,))
-        row = cursor.fetchone()
+        with self.db.read() as cursor:
+            cursor.execute("""
+                SELECT id, title, content, category, tags, filename, created_at, content_hash, classify_status
+                FROM notes WHERE id = ?
+            """, (note_id,))
+            row = cursor.fetchone()
+            
+            if not row:
+                return None
+            
+            content = decompress_content(row[2])
+            return {
+                "id": row[0],
+                "title": row[1],
+                "content": content,
+                "category": row[3],
+                "tags": row[4],
+                "filename": row[5],
+                "created_at": row[6],
+                "content_hash": row[7] or content_hash(content),
+                "classify_status": row[8]
+            }
+    
+    def update_note(self, note_id: int, title: str, content: str, 
+                   category: str, tags: str, filename: str, classify_status: Optional[str] = None,
+                   expected_updated_at: Optional[int] = None) -> bool:
+        """更新笔记
         
-        if not row:
-            return None
+        给出 expected_updated_at 时只在笔记此后未被修改的情况下更新（乐观并发检查）。
+        """
+        encoded = self._encode_content(content)
+        check_sql = " AND updated_at = ?" if expected_updated_at is not None else ""
+        check_params = (expected_updated_at,) if expected_updated_at is not None else ()
+        with self.db.transaction() as cursor:
+            cursor.execute(f"""
+                UPDATE notes
+                SET title = ?, content = ?, content_hash = ?, category = ?, tags = ?, filename = ?, updated_at = ?,
+                    classify_status = ?
+                WHERE id = ?{check_sql}
+            """, (title, encoded, content_hash(content), category, tags, filename,
+                  self._now_ms(), classify_status, note_id, *check_params))
+            updated = cursor.rowcount > 0
+            if updated:
+                self._sync_fts_content(cursor, note_id, content, encoded)
+                self._replace_note_tags(cursor, note_id, tags)
+            return updated
+    
+    def update_note_metadata(self, note_id: int, title: str, category: str, tags: str, filename: str,
+                             classify_status: Optional[str] = None,
+                             expected_updated_at: Optional[int] = None) -> bool:
+        """只更新标题、分类、标签与文件路径，不重写正文
         
-        return {
-            "id": row[0],
-            "title": row[1],
-            "content": row[2],
-            "category": row[3],
-            "tags": row[4],
-            "filename": row[5],
-            "created_at": row[6]
-        }
+        给出 expected_updated_at 时只在笔记此后未被修改的情况下更新（乐观并发检查）。
+        """
+        check_sql = " AND updated_at = ?" if expected_updated_at is not None else ""
+        check_params = (expected_updated_at,) if expected_updated_at is not None else ()
+        with self.db.transaction() as cursor:
+            cursor.execute(f"""
+                UPDATE notes
+                SET title = ?, category = ?, tags = ?, filename = ?, updated_at = ?, classify_status = ?
+                WHERE id = ?{check_sql}
+            """, (title, category, tags, filename, self._now_ms(), classify_status, note_id, *check_params))
+            updated = cursor.rowcount > 0
+            if updated:
+                self._replace_note_tags(cursor, note_id, tags)
+            return updated
     
-    def update_note(self, note_id: int, title: str, content: str, 
-                   category: str, tags: str, filename: str) -> bool:
-        """更新笔记"""
-        cursor = self.db.get_cursor()
-        cursor.execute("""
-            UPDATE notes
-            SET title = ?, content = ?, category = ?, tags = ?, filename = ?
-            WHERE id = ?
-        """, (title, content, category, tags, filename, note_id))
-        self.db.get_connection().commit()
-        return cursor.rowcount > 0
+    def finish_classification(self, note_id: int, expected_title: str, expected_hash: str,
+                              category: str, tags: str, filename: str) -> bool:
+        """写入后台分类结果
+        
+        只在笔记仍为 pending 且标题、正文未被修改时更新，返回是否已写入。
+        """
+        with self.db.transaction() as cursor:
+            cursor.execute("""
+                UPDATE notes
+                SET category = ?, tags = ?, filename = ?, updated_at = ?, classify_status = NULL
+                WHERE id = ? AND classify_status = 'pending' AND title = ? AND content_hash = ?
+            """, (category, tags, filename, self._now_ms(), note_id, expected_title, expected_hash))
+            updated = cursor.rowcount > 0
+            if updated:
+                self._replace_note_tags(cursor, note_id, tags)
+            return updated
+    
+    def mark_classification_failed(self, note_id: int) -> bool:
+        """把仍为 pending 的笔记标记为分类失败"""
+        with self.db.transaction() as cursor:
+            cursor.execute(
+                "UPDATE notes SET classify_status = 'failed' WHERE id = ? AND classify_status = 'pending'",
+                (note_id,)
+            )
+            return cursor.rowcount > 0
+    
+    def get_pending_classification_ids(self) -> List[int]:
+        """等待后台分类的笔记ID"""
+        with self.db.read() as cursor:
+            cursor.execute("SELECT id FROM notes WHERE classify_status = 'pending' ORDER BY id")
+            return [r[0] for r in cursor.fetchall()]
+    
+    def count_classify_status(self) -> Dict[str, int]:
+        """各后台分类状态的笔记数量"""
+        with self.db.read() as cursor:
+            cursor.execute("""
+                SELECT classify_status, COUNT(*) FROM notes
+                WHERE classify_status IS NOT NULL
+                GROUP BY classify_status
+            """)
+            return {r[0]: r[1] for r in cursor.fetchall()}
     
     def delete_note(self, note_id: int) -> bool:
         """删除笔记"""
-        cursor = self.db.get_cursor()
-        cursor.execute("DELETE FROM notes WHERE id = ?", (note_id,))
-        self.db.get_connection().commit()
-        return cursor.rowcount > 0
-    
-    def get_all_notes(self) -> List[Dict[str, Any]]:
-        """获取所有笔记"""
-        cursor = self.db.get_cursor()
-        cursor.execute("""
-            SELECT id, title, category, tags, filename, created_at
-            FROM notes ORDER BY created_at DESC
-        """)
-        return [
-            {
-                "id": row[0],
-                "title": row[1],
-                "category": row[2],
-                "tags": row[3] or "",
-                "filename": row[4],
-                "created_at": row[5]
-            }
-            for row in cursor.fetchall()
-        ]
+        with self.db.transaction() as cursor:
+            old_tag_ids = [
+                r[0] for r in cursor.execute(
+                    "SELECT tag_id FROM note_tags WHERE note_id = ?", (note_id,)
+                ).fetchall()
+            ]
+            # note_tags 通过外键级联删除
+            cursor.execute("DELETE FROM notes WHERE id = ?", (note_id,))
+            deleted = cursor.rowcount > 0
+            self._delete_orphan_tags(cursor, old_tag_ids)
+            return deleted
     
-    def search_notes(self, query: str) -> List[Dict[str, Any]]:
-        """搜索笔记"""
-        cursor = self.db.get_cursor()
-        cursor.execute("""
-            SELECT id, title, category, tags, filename, created_at
-            FROM notes
-            WHERE title LIKE ? OR content LIKE ? OR tags LIKE ? OR category LIKE ?
-        """, (f"%{query}%", f"%{query}%", f"%{query}%", f"%{query}%"))
-        
-        return [
-            {
-                "id": row[0],
-                "title": row[1],
-                "category": row[2],
-                "tags": row[3] or "",
-                "filename": row[4],
-                "created_at": row[5]
-            }
-            for row in cursor.fetchall()
-        ]
+    # 列表查询返回的列
+    LIST_COLUMNS = "id, title, category, tags, filename, created_at, created_at_ts"
+    
+    def get_all_notes(self, limit: Optional[int] = None,
+                      after: Optional[Tuple[Any, ...]] = None) -> List[Dict[str, Any]]:
+        """获取所有笔记
+        
+        limit 为空时返回全部；after 为上一页最后一条的 (created_at_ts, id)，按键集分页。
+        """
+        keyset_sql, keyset_params = self._keyset_clause(after)
+        with self.db.read() as cursor:
+            cursor.execute(f"""
+                SELECT {self.LIST_COLUMNS}
+                FROM notes
+                WHERE 1 = 1 {keyset_sql}
+                ORDER BY created_at_ts DESC, id DESC
+                LIMIT ?
+            """, (*keyset_params, self._limit_param(limit)))
+            return [self._row_to_list_item(row) for row in cursor.fetchall()]
+    
+    def search_notes(self, query: str, order_by: str = "created_at", limit: Optional[int] = None,
+                     after: Optional[Tuple[Any, ...]] = None) -> List[Dict[str, Any]]:
+        """搜索笔记
+        
+        order_by 为 "relevance" 时按 BM25 相关度排序（after 为 (rank, id)），
+        否则按创建时间倒序（after 为 (created_at_ts, id)）。
+        """
+        query = (query or "").strip()
+        if not query:
+            return []
+        
+        if self.db.fts_enabled and len(query) >= self.FTS_MIN_QUERY_LENGTH:
+            return self._search_notes_fts(query, order_by, limit, after)
+        return self._search_notes_like(query, order_by, limit, after)
+    
+    def _search_notes_fts(self, query: str, order_by: str, limit: Optional[int],
+                          after: Optional[Tuple[Any, ...]]) -> List[Dict[str, Any]]:
+        """基于 FTS5 索引搜索"""
+        # 整体作为短语匹配，与原 LIKE 子串语义一致
+        match_expr = '"' + query.replace('"', '""') + '"'
+        with self.db.read() as cursor:
+            if order_by == "relevance":
+                # 列权重：标题 > 标签 > 分类 > 正文；rank 越小越相关
+                keyset_sql = "AND (rank, id) > (?, ?)" if after else ""
+                cursor.execute(f"""
+                    SELECT * FROM (
+                        SELECT n.id, n.title, n.category, n.tags, n.filename, n.created_at, n.created_at_ts,
+                               bm25(notes_fts, 10.0, 1.0, 5.0, 3.0) AS rank
+                        FROM notes_fts
+                        JOIN notes n ON n.id = notes_fts.rowid
+                        WHERE notes_fts MATCH ?
+                    )
+                    WHERE 1 = 1 {keyset_sql}
+                    ORDER BY rank, id
+                    LIMIT ?
+                """, (match_expr, *(after or ()), self._limit_param(limit)))
+                return [
+                    {**self._row_to_list_item(row), "rank": row[7]}
+                    for row in cursor.fetchall()
+                ]
+            
+            keyset_sql, keyset_params = self._keyset_clause(after, "n.")
+            cursor.execute(f"""
+                SELECT n.id, n.title, n.category, n.tags, n.filename, n.created_at, n.created_at_ts
+                FROM notes_fts
+                JOIN notes n ON n.id = notes_fts.rowid
+                WHERE notes_fts MATCH ? {keyset_sql}
+                ORDER BY n.created_at_ts DESC, n.id DESC
+                LIMIT ?
+            """, (match_expr, *keyset_params, self._limit_param(limit)))
+            return [self._row_to_list_item(row) for row in cursor.fetchall()]
+    
+    def _search_notes_like(self, query: str, order_by: str, limit: Optional[int],
+                           after: Optional[Tuple[Any, ...]]) -> List[Dict[str, Any]]:
+        """基于 LIKE 搜索（短关键词或全文索引不可用时）
+        
+        trigram 索引无法检索 1~2 个字符的关键词，只能逐行扫描。全文索引可用时扫描
+        notes_fts 自存的解码文本，不必逐条解压正文；否则扫描 notes 并用 note_text() 解码。
+        按相关度排序时按命中字段加权计算 rank（与 FTS 列权重一致，越小越相关），
+        以便与 FTS 路径共用 (rank, id) 游标。
+        """
+        pattern = f"%{query}%"
+        if self.db.fts_enabled:
+            # CROSS JOIN 固定以 notes 为外层，按时间倒序分页时可沿索引扫描并提前结束
+            source = "notes n CROSS JOIN notes_fts f ON f.rowid = n.id"
+            title, content, tags, category = "f.title", "f.content", "f.tags", "f.category"
+        else:
+            source = "notes n"
+            title, content, tags, category = "n.title", "note_text(n.content)", "n.tags", "n.category"
+        list_columns = "n.id, n.title, n.category, n.tags, n.filename, n.created_at, n.created_at_ts"
+        
+        with self.db.read() as cursor:
+            if order_by == "relevance":
+                keyset_sql = "AND (rank, id) > (?, ?)" if after else ""
+                cursor.execute(f"""
+                    SELECT * FROM (
+                        SELECT {list_columns},
+                               -(({title} LIKE ?) * 10.0 + ({tags} LIKE ?) * 5.0 + ({category} LIKE ?) * 3.0
+                                 + ({content} LIKE ?) * 1.0) AS rank
+                        FROM {source}
+                    )
+                    WHERE rank < 0 {keyset_sql}
+                    ORDER BY rank, id
+                    LIMIT ?
+                """, (pattern, pattern, pattern, pattern, *(after or ()), self._limit_param(limit)))
+                return [
+                    {**self._row_to_list_item(row), "rank": row[7]}
+                    for row in cursor.fetchall()
+                ]
+            
+            keyset_sql, keyset_params = self._keyset_clause(after, "n.")
+            cursor.execute(f"""
+                SELECT {list_columns}
+                FROM {source}
+                WHERE ({title} LIKE ? OR {content} LIKE ? OR {tags} LIKE ? OR {category} LIKE ?) {keyset_sql}
+                ORDER BY n.created_at_ts DESC, n.id DESC
+                LIMIT ?
+            """, (pattern, pattern, pattern, pattern, *keyset_params, self._limit_param(limit)))
+            return [self._row_to_list_item(row) for row in cursor.fetchall()]
     
-    def get_notes_by_category(self, category: str) -> List[Dict[str, Any]]:
+    def get_notes_by_category(self, category: str, limit: Optional[int] = None,
+                              after: Optional[Tuple[Any, ...]] = None) -> List[Dict[str, Any]]:
         """根据分类获取笔记"""
-        cursor = self.db.get_cursor()
-        cursor.execute("""
-            SELECT id, title, category, tags, filename, created_at
-            FROM notes WHERE category = ? ORDER BY created_at DESC
-        """, (category,))
-        
-        return [
-            {
-                "id": row[0],
-                "title": row[1],
-                "category": row[2],
-                "tags": row[3] or "",
-                "filename": row[4],
-                "created_at": row[5]
-            }
-            for row in cursor.fetchall()
-        ]
+        keyset_sql, keyset_params = self._keyset_clause(after)
+        with self.db.read() as cursor:
+            cursor.execute(f"""
+                SELECT {self.LIST_COLUMNS}
+                FROM notes
+                WHERE category = ? {keyset_sql}
+                ORDER BY created_at_ts DESC, id DESC
+                LIMIT ?
+            """, (category, *keyset_params, self._limit_param(limit)))
+            return [self._row_to_list_item(row) for row in cursor.fetchall()]
     
-    def get_notes_by_tag(self, tag: str) -> List[Dict[str, Any]]:
+    def get_notes_by_tag(self, tag: str, limit: Optional[int] = None,
+                         after: Optional[Tuple[Any, ...]] = None) -> List[Dict[str, Any]]:
         """根据标签获取笔记"""
-        cursor = self.db.get_cursor()
-        like_expr = f"%{tag}%"
-        cursor.execute("""
-            SELECT id, title, category, tags, filename, created_at
-            FROM notes WHERE tags LIKE ? ORDER BY created_at DESC
-        """, (like_expr,))
-        
-        # 进一步精确匹配
-        rows = cursor.fetchall()
-        results = []
-        for row in rows:
-            raw_tags = row[3] or ""
-            split_tags = [t.strip() for t in raw_tags.split(',') if t.strip()]
-            if tag in split_tags:
-                results.append({
+        keyset_sql, keyset_params = self._keyset_clause(after, "n.")
+        with self.db.read() as cursor:
+            cursor.execute(f"""
+                SELECT n.id, n.title, n.category, n.tags, n.filename, n.created_at, n.created_at_ts
+                FROM tags t
+                JOIN note_tags nt ON nt.tag_id = t.id
+                JOIN notes n ON n.id = nt.note_id
+                WHERE t.name = ? {keyset_sql}
+                ORDER BY n.created_at_ts DESC, n.id DESC
+                LIMIT ?
+            """, (tag.strip(), *keyset_params, self._limit_param(limit)))
+            return [self._row_to_list_item(row) for row in cursor.fetchall()]
+    
+    def _keyset_clause(self, after: Optional[Tuple[Any, ...]], prefix: str = "") -> Tuple[str, tuple]:
+        """构造 (created_at_ts, id) 倒序键集分页条件"""
+        if not after:
+            return "", ()
+        return f"AND ({prefix}created_at_ts, {prefix}id) < (?, ?)", (after[0], after[1])
+    
+    def _limit_param(self, limit: Optional[int]) -> int:
+        """SQLite 中 LIMIT -1 表示不限制"""
+        return limit if limit is not None else -1
+    
+    def _row_to_list_item(self, row) -> Dict[str, Any]:
+        """将列表查询行转换为字典"""
+        return {
+            "id": row[0],
+            "title": row[1],
+            "category": row[2],
+            "tags": row[3] or "",
+            "filename": row[4],
+            "created_at": row[5],
+            "created_at_ts": row[6]
+        }
+    
+    def _encode_content(self, content: Optional[str]):
+        """按配置压缩正文"""
+        if not settings.content_compression:
+            return content
+        return compress_content(
+            content,
+            settings.content_compression_threshold,
+            settings.content_compression_codec,
+            settings.content_compression_level
+        )
+    
+    def _sync_fts_content(self, cursor, note_id: int, content: Optional[str], encoded) -> None:
+        """压缩存储的正文由触发器占位，这里写入解码后的文本"""
+        if self.db.fts_enabled and not isinstance(encoded, str):
+            cursor.execute("UPDATE notes_fts SET content = ? WHERE rowid = ?", (content or "", note_id))
+    
+    def compact_contents(self, batch_size: int = 500) -> int:
+        """将已有的未压缩大正文按当前配置重新编码，返回改写的笔记数
+        
+        文本不变，全文索引中的正文无需更新。
+        """
+        if not settings.content_compression:
+            return 0
+        
+        threshold = settings.content_compression_threshold
+        rewritten = 0
+        last_id = 0
+        while True:
+            with self.db.read() as cursor:
+                rows = cursor.execute("""
+                    SELECT id, content FROM notes
+                    WHERE id > ? AND typeof(content) = 'text' AND length(CAST(content AS BLOB)) >= ?
+                    ORDER BY id LIMIT ?
+                """, (last_id, threshold, batch_size)).fetchall()
+            if not rows:
+                return rewritten
+            
+            updates = []
+            for note_id, content in rows:
+                encoded = self._encode_content(content)
+                if not isinstance(encoded, str):
+                    updates.append((encoded, note_id))
+            with self.db.transaction() as cursor:
+                cursor.executemany("UPDATE notes SET content = ? WHERE id = ?", updates)
+            
+            rewritten += len(updates)
+            last_id = rows[-1][0]
+    
+    def get_filenames_in_directory(self, directory: str) -> List[str]:
+        """获取某个分类目录下已登记的文件路径（按 filename 唯一索引做范围查询）"""
+        # '0' 是 '/' 的下一个字符，[目录/, 目录0) 即该目录下的全部路径
+        with self.db.read() as cursor:
+            cursor.execute(
+                "SELECT filename FROM notes WHERE filename >= ? AND filename < ?",
+                (f"{directory}/", f"{directory}0")
+            )
+            return [row[0] for row in cursor.fetchall()]
+    
+    def find_existing_contents(self, hashes: List[str]) -> Set[Tuple[str, str]]:
+        """返回已存在的 (标题, content_hash) 组合，用于导入查重"""
+        if not hashes:
+            return set()
+        placeholders = ",".join("?" * len(hashes))
+        with self.db.read() as cursor:
+            cursor.execute(f"SELECT title, content_hash FROM notes WHERE content_hash IN ({placeholders})", hashes)
+            return {(row[0], row[1]) for row in cursor.fetchall()}
+    
+    def get_notes_by_filenames(self, filenames: List[str]) -> Dict[str, Dict[str, Any]]:
+        """按文件路径批量获取笔记元数据（不含正文）"""
+        if not filenames:
+            return {}
+        placeholders = ",".join("?" * len(filenames))
+        with self.db.read() as cursor:
+            cursor.execute(f"""
+                SELECT id, title, category, tags, filename, content_hash, updated_at
+                FROM notes WHERE filename IN ({placeholders})
+            """, filenames)
+            return {
+                row[4]: {
                     "id": row[0],
                     "title": row[1],
                     "category": row[2],
-                    "tags": raw_tags,
+                    "tags": row[3] or "",
                     "filename": row[4],
-                    "created_at": row[5]
-                })
+                    "content_hash": row[5],
+                    "updated_at": row[6]
+                }
+                for row in cursor.fetchall()
+            }
+    
+    # 未分类笔记：分类或标签为空，或仍是无 AI 时写入的默认值
+    UNCLASSIFIED_CONDITION = (
+        "(n.category IS NULL OR n.category IN ('', '未分类') "
+        "OR n.tags IS NULL OR n.tags IN ('', '无标签'))"
+    )
+    
+    def get_notes_for_classification(self, after_id: int = 0, limit: int = 50,
+                                     category: Optional[str] = None, tag: Optional[str] = None,
+                                     unclassified_only: bool = True) -> List[Dict[str, Any]]:
+        """按 id 顺序分块获取待分类笔记（含正文）"""
+        conditions = ["n.id > ?"]
+        params: List[Any] = [after_id]
+        joins = ""
+        if unclassified_only:
+            conditions.append(self.UNCLASSIFIED_CONDITION)
+        if category:
+            conditions.append("n.category = ?")
+            params.append(category.strip())
+        if tag:
+            joins = "JOIN note_tags nt ON nt.note_id = n.id JOIN tags t ON t.id = nt.tag_id"
+            conditions.append("t.name = ?")
+            params.append(tag.strip())
         
-        return results
+        with self.db.read() as cursor:
+            cursor.execute(f"""
+                SELECT n.id, n.title, n.content, n.category, n.tags, n.filename, n.updated_at
+                FROM notes n {joins}
+                WHERE {' AND '.join(conditions)}
+                ORDER BY n.id
+                LIMIT ?
+            """, (*params, limit))
+            return [
+                {
+                    "id": row[0],
+                    "title": row[1],
+                    "content": decompress_content(row[2]),
+                    "category": row[3],
+                    "tags": row[4] or "",
+                    "filename": row[5],
+                    "updated_at": row[6]
+                }
+                for row in cursor.fetchall()
+            ]
     
-    def get_categories_stats(self) -> List[Dict[str, Any]]:
-        """获取分类统计"""
-        cursor = self.db.get_cursor()
-        cursor.execute("""
-            SELECT category, COUNT(1) FROM notes GROUP BY category
-        """)
-        return [{"name": r[0] or "其他", "count": r[1]} for r in cursor.fetchall()]
+    def count_notes_for_classification(self, category: Optional[str] = None, tag: Optional[str] = None,
+                                       unclassified_only: bool = True) -> int:
+        """待分类笔记数量"""
+        conditions = ["1 = 1"]
+        params: List[Any] = []
+        joins = ""
+        if unclassified_only:
+            conditions.append(self.UNCLASSIFIED_CONDITION)
+        if category:
+            conditions.append("n.category = ?")
+            params.append(category.strip())
+        if tag:
+            joins = "JOIN note_tags nt ON nt.note_id = n.id JOIN tags t ON t.id = nt.tag_id"
+            conditions.append("t.name = ?")
+            params.append(tag.strip())
+        with self.db.read() as cursor:
+            return cursor.execute(
+                f"SELECT COUNT(*) FROM notes n {joins} WHERE {' AND '.join(conditions)}", params
+            ).fetchone()[0]
     
-    def get_tags_stats(self) -> List[Dict[str, Any]]:
-        """获取标签统计"""
-        cursor = self.db.get_cursor()
-        cursor.execute("SELECT tags FROM notes WHERE tags IS NOT NULL AND tags != ''")
+    def bulk_update_metadata(self, notes: List[Dict[str, Any]]) -> List[int]:
+        """在单个事务中批量更新标题、分类、标签与文件路径，返回实际更新的笔记ID
         
-        tag_counter = {}
-        for (tags_str,) in cursor.fetchall():
-            for t in [x.strip() for x in tags_str.split(',') if x.strip()]:
-                tag_counter[t] = tag_counter.get(t, 0) + 1
+        项中含 expected_updated_at 时，读取后已被修改的笔记不更新。
+        """
+        updated = []
+        with self.db.transaction():
+            for note in notes:
+                if self.update_note_metadata(note["id"], note["title"], note["category"],
+                                             note["tags"], note["filename"],
+                                             expected_updated_at=note.get("expected_updated_at")):
+                    updated.append(note["id"])
+        return updated
+    
+    def get_note_filenames(self) -> List[Tuple[int, Optional[str]]]:
+        """获取全部笔记的 (id, filename)"""
+        with self.db.read() as cursor:
+            cursor.execute("SELECT id, filename FROM notes ORDER BY id")
+            return [(row[0], row[1]) for row in cursor.fetchall()]
+    
+    def count_notes(self, max_id: Optional[int] = None) -> int:
+        """笔记总数，指定 max_id 时只统计 id 不大于它的笔记"""
+        with self.db.read() as cursor:
+            if max_id is None:
+                return cursor.execute("SELECT COUNT(*) FROM notes").fetchone()[0]
+            return cursor.execute("SELECT COUNT(*) FROM notes WHERE id <= ?", (max_id,)).fetchone()[0]
+    
+    def set_note_filename(self, note_id: int, filename: str) -> bool:
+        """只更新笔记的文件路径"""
+        with self.db.transaction() as cursor:
+            cursor.execute("UPDATE notes SET filename = ? WHERE id = ?", (filename, note_id))
+            return cursor.rowcount > 0
+    
+    def get_file_snapshots(self) -> Dict[str, Tuple[int, int]]:
+        """获取 notes 目录文件快照：路径 -> (mtime_ns, size)"""
+        with self.db.read() as cursor:
+            cursor.execute("SELECT path, mtime_ns, size FROM file_snapshots")
+            return {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+    
+    def apply_file_sync(self, created: List[Dict[str, Any]], updated: List[Dict[str, Any]],
+                        deleted_ids: List[int], snapshots: List[Tuple[str, int, int]],
+                        removed_paths: List[str]) -> Tuple[List[int], List[int]]:
+        """在单个事务中写入一批文件同步结果，返回 (新建笔记ID列表, 冲突笔记ID列表)
+        
+        updated 中 content 为 None 的项只更新元数据；含 expected_updated_at 的项只在
+        笔记读取后未被修改时更新，否则视为冲突，不写入且不记录该文件的快照，下一轮重新比较。
+        """
+        with self.db.transaction() as cursor:
+            created_ids = self.bulk_create_notes(created) if created else []
+            conflict_ids, conflict_paths = [], set()
+            for note in updated:
+                expected = note.get("expected_updated_at")
+                if note["content"] is None:
+                    applied = self.update_note_metadata(note["id"], note["title"], note["category"],
+                                                        note["tags"], note["filename"], expected_updated_at=expected)
+                else:
+                    applied = self.update_note(note["id"], note["title"], note["content"], note["category"],
+                                               note["tags"], note["filename"], expected_updated_at=expected)
+                if not applied:
+                    conflict_ids.append(note["id"])
+                    conflict_paths.add(note["filename"])
+            snapshots = [s for s in snapshots if s[0] not in conflict_paths]
+            for note_id in deleted_ids:
+                self.delete_note(note_id)
+            cursor.executemany("""
+                INSERT INTO file_snapshots (path, mtime_ns, size) VALUES (?, ?, ?)
+                ON CONFLICT(path) DO UPDATE SET mtime_ns = excluded.mtime_ns, size = excluded.size
+            """, snapshots)
+            cursor.executemany("DELETE FROM file_snapshots WHERE path = ?", [(p,) for p in removed_paths])
+            return created_ids, conflict_ids
+    
+    def iter_notes_for_export(self, category: Optional[str] = None, tag: Optional[str] = None,
+                              since_ts: Optional[int] = None, until_ts: Optional[int] = None,
+                              chunk_size: int = 200, after_id: int = 0) -> Iterator[Dict[str, Any]]:
+        """按 id 顺序分块读取完整笔记（含解压后的正文），用于流式导出
+        
+        每块单独取连接并立即归还，不在两次 yield 之间占用连接或读事务，
+        内存占用只与 chunk_size 有关。
+        """
+        conditions = ["n.id > ?"]
+        params: List[Any] = []
+        joins = ""
+        if category:
+            conditions.append("n.category = ?")
+            params.append(category.strip())
+        if tag:
+            joins = "JOIN note_tags nt ON nt.note_id = n.id JOIN tags t ON t.id = nt.tag_id"
+            conditions.append("t.name = ?")
+            params.append(tag.strip())
+        if since_ts is not None:
+            conditions.append("n.created_at_ts >= ?")
+            params.append(since_ts)
+        if until_ts is not None:
+            conditions.append("n.created_at_ts < ?")
+            params.append(until_ts)
         
-        return [{"name": k, "count": v} for k, v in tag_counter.items()]
+        sql = f"""
+            SELECT n.id, n.title, n.content, n.category, n.tags, n.filename,
+                   n.created_at, n.created_at_ts, n.updated_at
+            FROM notes n {joins}
+            WHERE {' AND '.join(conditions)}
+            ORDER BY n.id
+            LIMIT ?
+        """
+        last_id = after_id
+        while True:
+            with self.db.read() as cursor:
+                rows = cursor.execute(sql, (last_id, *params, chunk_size)).fetchall()
+            if not rows:
+                return
+            
+            for row in rows:
+                yield {
+                    "id": row[0],
+                    "title": row[1],
+                    "content": decompress_content(row[2]),
+                    "category": row[3],
+                    "tags": row[4] or "",
+                    "filename": row[5],
+                    "created_at": row[6],
+                    "created_at_ts": row[7],
+                    "updated_at": row[8]
+                }
+            last_id = rows[-1][0]
+    
+    def _now_ms(self) -> int:
+        """当前 Unix 毫秒时间戳"""
+        return int(time.time() * 1000)
+    
+    def _format_timestamp(self, ts_ms: int) -> str:
+        """毫秒时间戳转为 created_at 文本格式（UTC，与 CURRENT_TIMESTAMP 一致）"""
+        return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(ts_ms / 1000))
+    
+    def get_categories_stats(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """获取分类统计（按数量倒序）"""
+        with self.db.read() as cursor:
+            cursor.execute("""
+                SELECT name, count FROM category_stats
+                ORDER BY count DESC, name
+                LIMIT ?
+            """, (limit if limit is not None else -1,))
+            return [{"name": r[0] or "其他", "count": r[1]} for r in cursor.fetchall()]
+    
+    def get_tags_stats(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """获取标签统计（按数量倒序）"""
+        with self.db.read() as cursor:
+            cursor.execute("""
+                SELECT t.name, ts.count
+                FROM tag_stats ts
+                JOIN tags t ON t.id = ts.tag_id
+                ORDER BY ts.count DESC, ts.tag_id
+                LIMIT ?
+            """, (limit if limit is not None else -1,))
+            return [{"name": r[0], "count": r[1]} for r in cursor.fetchall()]
     
     def get_categories_list(self) -> List[str]:
-        """获取分类列表"""
-        cursor = self.db.get_cursor()
-        cursor.execute("""
-            SELECT category, COUNT(1)
-            FROM notes
-            WHERE category IS NOT NULL AND category != ''
-            GROUP BY category
-        """)
-        rows = cursor.fetchall()
-        rows.sort(key=lambda r: r[1], reverse=True)
-        return [r[0] for r in rows]
+        """获取分类列表（按笔记数量倒序）"""
+        with self.db.read() as cursor:
+            cursor.execute("""
+                SELECT name FROM category_stats
+                WHERE name != ''
+                ORDER BY count DESC, name
+            """)
+            return [r[0] for r in cursor.fetchall()]
     
     def get_tags_list(self) -> List[str]:
-        """获取标签列表"""
-        cursor = self.db.get_cursor()
-        cursor.execute("SELECT tags FROM notes WHERE tags IS NOT NULL AND tags != ''")
+        """获取标签列表（按笔记数量倒序）"""
+        with self.db.read() as cursor:
+            cursor.execute("""
+                SELECT t.name
+                FROM tag_stats ts
+                JOIN tags t ON t.id = ts.tag_id
+                ORDER BY ts.count DESC, ts.tag_id
+            """)
+            return [r[0] for r in cursor.fetchall()]
+    
+    def get_taxonomy_signature(self) -> Tuple[int, int]:
+        """分类数与标签数，用于判断分类体系是否变化"""
+        with self.db.read() as cursor:
+            return cursor.execute("""
+                SELECT (SELECT COUNT(*) FROM category_stats WHERE name != ''),
+                       (SELECT COUNT(*) FROM tag_stats)
+            """).fetchone()
+    
+    def get_taxonomy_samples(self, per_label: int) -> Tuple[Dict[str, List[str]], Dict[str, List[str]]]:
+        """每个分类、每个标签最近 per_label 篇笔记的标题"""
+        with self.db.read() as cursor:
+            category_titles: Dict[str, List[str]] = {}
+            for category, title in cursor.execute("""
+                SELECT category, title FROM (
+                    SELECT category, title,
+                           ROW_NUMBER() OVER (PARTITION BY category ORDER BY id DESC) AS rn
+                    FROM notes
+                    WHERE category != ''
+                )
+                WHERE rn <= ?
+            """, (per_label,)):
+                category_titles.setdefault(category, []).append(title or "")
+            
+            tag_titles: Dict[str, List[str]] = {}
+            for tag, title in cursor.execute("""
+                SELECT t.name, s.title FROM (
+                    SELECT nt.tag_id, n.title,
+                           ROW_NUMBER() OVER (PARTITION BY nt.tag_id ORDER BY nt.note_id DESC) AS rn
+                    FROM note_tags nt
+                    JOIN notes n ON n.id = nt.note_id
+                ) s
+                JOIN tags t ON t.id = s.tag_id
+                WHERE s.rn <= ?
+            """, (per_label,)):
+                tag_titles.setdefault(tag, []).append(title or "")
+            return category_titles, tag_titles
+    
+    def _replace_note_tags(self, cursor, note_id: int, tags: str) -> None:
+        """用逗号分隔的标签字符串重建笔记的标签关联"""
+        names = list(dict.fromkeys(t.strip() for t in (tags or "").split(',') if t.strip()))
+        
+        old_tag_ids = [
+            r[0] for r in cursor.execute(
+                "SELECT tag_id FROM note_tags WHERE note_id = ?", (note_id,)
+            ).fetchall()
+        ]
+        cursor.execute("DELETE FROM note_tags WHERE note_id = ?", (note_id,))
         
-        counter = {}
-        for (tags_str,) in cursor.fetchall():
-            for t in [x.strip() for x in tags_str.split(',') if x.strip()]:
-                counter[t] = counter.get(t, 0) + 1
+        if names:
+            cursor.executemany(
+                "INSERT OR IGNORE INTO tags (name) VALUES (?)", [(n,) for n in names]
+            )
+            cursor.executemany("""
+                INSERT OR IGNORE INTO note_tags (note_id, tag_id)
+                SELECT ?, id FROM tags WHERE name = ?
+            """, [(note_id, n) for n in names])
         
-        return [k for k, _ in sorted(counter.items(), key=lambda kv: kv[1], reverse=True)]
+        self._delete_orphan_tags(cursor, old_tag_ids)
+    
+    def _delete_orphan_tags(self, cursor, tag_ids: List[int]) -> None:
+        """删除已无笔记引用的标签"""
+        if not tag_ids:
+            return
+        cursor.executemany("""
+            DELETE FROM tags
+            WHERE id = ? AND NOT EXISTS (SELECT 1 FROM note_tags WHERE tag_id = tags.id)
+        """, [(tag_id,) for tag_id in tag_ids])
 
 
 # 全局笔记仓库实例
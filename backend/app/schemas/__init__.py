@@ -3,14 +3,16 @@
 """
 from .note import (
     NoteBase, NoteCreate, NoteUpdate, NoteResponse, 
-    NoteListResponse, NoteSearchRequest, NoteFilterRequest
+    NoteListResponse, NotePageResponse, NoteSearchRequest, NoteFilterRequest
 )
 from .auth import LoginRequest, LoginResponse, LogoutResponse, ConfigResponse
-from .ai import OptimizeRequest, OptimizeResponse, StatsResponse
+from .ai import OptimizeRequest, OptimizeResponse, StatsResponse, ClassifyJobRequest, ClassifyJobResponse
+from .transfer import ImportRequest, ImportJobResponse
 
 __all__ = [
     "NoteBase", "NoteCreate", "NoteUpdate", "NoteResponse",
-    "NoteListResponse", "NoteSearchRequest", "NoteFilterRequest",
+    "NoteListResponse", "NotePageResponse", "NoteSearchRequest", "NoteFilterRequest",
     "LoginRequest", "LoginResponse", "LogoutResponse", "ConfigResponse",
-    "OptimizeRequest", "OptimizeResponse", "StatsResponse"
+    "OptimizeRequest", "OptimizeResponse", "StatsResponse", "ClassifyJobRequest", "ClassifyJobResponse",
+    "ImportRequest", "ImportJobResponse"
 ]
@@ -20,9 +20,34 @@ class OptimizeResponse(BaseModel):
     key_points: Optional[List[str]] = Field(None, description="关键点")
     graph: Optional[Dict[str, Any]] = Field(None, description="知识图谱")
     mode: str = Field(..., description="优化模式")
+    chunks: Optional[int] = Field(None, description="长文本分块处理时的块数")
 
 
 class StatsResponse(BaseModel):
     """统计数据响应模式"""
     categories: List[Dict[str, Any]] = Field(..., description="分类统计")
     tags: List[Dict[str, Any]] = Field(..., description="标签统计")
+
+
+class ClassifyJobRequest(BaseModel):
+    """批量自动分类任务请求模式"""
+    category: Optional[str] = Field(None, description="只处理该分类下的笔记")
+    tag: Optional[str] = Field(None, description="只处理带该标签的笔记")
+    unclassified_only: bool = Field(True, description="只处理未分类笔记，并只补全缺失的分类或标签；为 False 时重新分类并覆盖")
+    concurrency: int = Field(4, ge=1, le=32, description="同时进行的 AI 请求数")
+    rate_limit: float = Field(2.0, gt=0, le=100, description="每秒最多发起的 AI 请求数")
+    batch_size: int = Field(50, ge=1, le=1000, description="每批写回数据库的笔记数")
+
+
+class ClassifyJobResponse(BaseModel):
+    """批量自动分类任务进度模式"""
+    job_id: str = Field(..., description="任务ID")
+    status: str = Field(..., description="状态：running / paused / completed / failed")
+    total: int = Field(..., description="待处理笔记数")
+    processed: int = Field(..., description="已处理笔记数")
+    updated: int = Field(..., description="已更新笔记数")
+    skipped: int = Field(0, description="分类期间被修改而跳过写回的笔记数")
+    failed: int = Field(..., description="失败笔记数")
+    elapsed: float = Field(..., description="运行耗时（秒，不含暂停时间）")
+    rate: float = Field(..., description="处理速度（条/秒）")
+    errors: List[Dict[str, Any]] = Field(default_factory=list, description="错误明细（最多100条）")
@@ -33,6 +33,9 @@ class NoteResponse(NoteBase):
     id: int = Field(..., description="笔记ID")
     filename: str = Field(..., description="文件名")
     created_at: Optional[datetime] = Field(None, description="创建时间")
+    classification_status: Optional[str] = Field(
+        None, description="后台 AI 分类状态：pending 等待分类，failed 分类失败，已完成或无需分类时为空"
+    )
     
     class Config:
         from_attributes = True
@@ -48,6 +51,12 @@ class NoteListResponse(BaseModel):
     created_at: Optional[datetime]
 
 
+class NotePageResponse(BaseModel):
+    """笔记分页响应模式"""
+    items: List[NoteListResponse] = Field(..., description="当前页笔记")
+    next_cursor: Optional[str] = Field(None, description="下一页游标，为空表示没有更多")
+
+
 class NoteSearchRequest(BaseModel):
     """笔记搜索请求模式"""
     query: str = Field(..., min_length=1, max_length=100, description="搜索关键词")
@@ -0,0 +1,26 @@
+"""
+导入导出相关的数据模式
+"""
+from typing import Dict, List
+from pydantic import BaseModel, Field
+
+
+class ImportRequest(BaseModel):
+    """批量导入请求模式"""
+    path: str = Field(..., min_length=1, description="服务器上的 Markdown 目录")
+    batch_size: int = Field(default=500, ge=1, le=10000, description="每个事务写入的笔记数")
+
+
+class ImportJobResponse(BaseModel):
+    """批量导入任务进度模式"""
+    job_id: str = Field(..., description="任务ID")
+    root: str = Field(..., description="导入目录")
+    status: str = Field(..., description="状态：running / completed / failed")
+    total: int = Field(..., description="文件总数")
+    processed: int = Field(..., description="已处理文件数")
+    imported: int = Field(..., description="新建笔记数")
+    skipped: int = Field(..., description="已存在而跳过的笔记数")
+    failed: int = Field(..., description="失败文件数")
+    elapsed: float = Field(..., description="已耗时（秒）")
+    rate: float = Field(..., description="处理速度（文件/秒）")
+    errors: List[Dict[str, str]] = Field(default_factory=list, description="错误明细（最多100条）")
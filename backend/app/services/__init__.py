@@ -1,8 +1,17 @@
 """
 服务模块
 """
-from .ai_service import ai_service
+from .ai_service import ai_service, ai_client_cache
 from .file_service import file_service
-from .note_service import note_service
+from .note_service import note_service, async_note_service
+from .import_service import import_service
+from .export_service import export_service
+from .watch_service import notes_watcher
+from .classify_service import classify_service
+from .taxonomy_service import taxonomy_index
+from .local_classifier import local_classifier
+from .deferred_classify_service import deferred_classifier
 
-__all__ = ["ai_service", "file_service", "note_service"]
+__all__ = ["ai_service", "ai_client_cache", "file_service", "note_service", "async_note_service",
+           "import_service", "export_service", "notes_watcher", "classify_service", "taxonomy_index",
+           "local_classifier", "deferred_classifier"]
@@ -1,25 +1,40 @@
 """
 AI服务模块
 """
+import hashlib
 import json
 import re
-from typing import List, Tuple, Optional, Dict, Any
-from openai import OpenAI
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import List, Tuple, Optional, Dict, Any, Iterator
+from openai import OpenAI, APIConnectionError
 from ..config.settings import settings
-from ..core import AIConfigurationError, AIConnectionError
+from ..core import (
+    AIConfigurationError, AIConnectionError, CircuitBreaker, ai_chunk_executor, call_with_retry, hash_api_config
+)
+from ..repositories.ai_cache_repository import ai_cache_repository
+from .taxonomy_service import taxonomy_index, estimate_tokens
+from .local_classifier import local_classifier
 
 
 class AIService:
-    """AI服务类"""
+    """AI服务类
     
-    def __init__(self):
-        self.client: Optional[OpenAI] = None
-        self.current_model = settings.default_model
+    每个实例绑定一个客户端与模型。请求中应使用 ai_client_cache.get() 按 API 配置取得实例，
+    不要修改全局实例，以免并发请求互相覆盖配置。
+    """
+    
+    def __init__(self, client: Optional[OpenAI] = None, model: Optional[str] = None):
+        self.client: Optional[OpenAI] = client
+        self.current_model = model or settings.default_model
+        self.breaker = CircuitBreaker(settings.ai_breaker_failure_threshold, settings.ai_breaker_reset_timeout)
     
     def initialize_client(self, api_url: str, api_key: str, model: str) -> None:
         """初始化AI客户端"""
         try:
-            self.client = OpenAI(api_key=api_key, base_url=api_url)
+            # 重试由 _create 在操作截止时间内统一处理，关闭 SDK 自带的重试
+            self.client = OpenAI(api_key=api_key, base_url=api_url, max_retries=0)
             self.current_model = model
             # 不进行连接测试，避免404错误
             # 在实际使用时再进行错误处理
@@ -34,35 +49,72 @@ class AIService:
         """检查AI是否已配置"""
         return self.client is not None
     
-    def extract_category_and_tags(self, content: str, max_length: int = 1000) -> Tuple[str, List[str]]:
-        """提取分类和标签"""
-        if not self.is_configured():
-            raise AIConfigurationError("AI未配置")
-        
+    def extract_category_and_tags(self, content: str, max_length: int = 1000,
+                                  use_cache: bool = True) -> Tuple[str, List[str]]:
+        """提取分类和标签，失败时返回默认分类"""
         try:
-            # 获取现有分类和标签
-            existing_categories, existing_tags = self._get_existing_categories_and_tags()
-            
-            response = self.client.chat.completions.create(
-                model=self.current_model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": self._build_category_extraction_prompt(existing_categories, existing_tags)
-                    },
-                    {"role": "user", "content": content[:max_length]}
-                ],
-                temperature=0.3,
-                max_tokens=200
-            )
-            
-            raw = (response.choices[0].message.content or "").strip()
-            return self._parse_category_response(raw)
-            
+            return self.classify_content(content, max_length, use_cache)
+        except AIConfigurationError:
+            raise
         except Exception as e:
             print(f"AI 分析失败: {e}")
+            # AI 不可用时退回本地分类器的预测
+            prediction = local_classifier.predict(content[:max_length])
+            if prediction and prediction["confidence"] >= settings.local_classifier_min_confidence:
+                return prediction["category"], prediction["tags"]
             return "其他", ["未分类"]
     
+    def classify_content(self, content: str, max_length: int = 1000,
+                         use_cache: bool = True) -> Tuple[str, List[str]]:
+        """提取分类和标签，失败时抛出异常
+        
+        本地分类器置信度足够时直接采用，否则请求 AI。
+        AI 结果按截断后的正文、模型与分类体系版本缓存；use_cache=False 时跳过缓存。
+        """
+        if not self.is_configured():
+            raise AIConfigurationError("AI未配置")
+        
+        text = content[:max_length]
+        prediction = local_classifier.predict(text)
+        if prediction and prediction["confidence"] >= settings.local_classifier_threshold:
+            return prediction["category"], prediction["tags"]
+        
+        # 只把与正文最相关的现有分类和标签放进提示词
+        selection = self._select_taxonomy(text)
+        existing_categories, existing_tags = selection["categories"], selection["tags"]
+        
+        cache_key = None
+        if use_cache and settings.ai_cache_enabled:
+            cache_key = ai_cache_repository.make_key(
+                text, self.current_model, self._taxonomy_version(existing_categories, existing_tags)
+            )
+            cached = self._cache_get(cache_key)
+            if cached:
+                return cached
+        
+        system_prompt = self._build_category_extraction_prompt(existing_categories, existing_tags)
+        self._log_prompt_tokens("分类", selection, system_prompt, text)
+        response = self._create({
+            "model": self.current_model,
+            "messages": [
+                {
+                    "role": "system",
+                    "content": system_prompt
+                },
+                {"role": "user", "content": text}
+            ],
+            "temperature": 0.3,
+            "max_tokens": 200,
+            "timeout": settings.ai_extract_timeout
+        })
+        
+        raw = (response.choices[0].message.content or "").strip()
+        category, tags = self._parse_category_response(raw)
+        # 只缓存成功解析的结果
+        if cache_key:
+            self._cache_put(cache_key, category, tags)
+        return category, tags
+    
     def optimize_text(self, content: str, prompt: Optional[str] = None) -> Dict[str, Any]:
         """优化文本内容"""
         if not self.is_configured():
@@ -70,34 +122,165 @@ class AIService:
         
         # 判断是否使用自定义提示词
         is_custom_prompt = prompt and prompt.strip() != ""
-        content_length = 20000 if is_custom_prompt else 1000
+        chunk_size = settings.ai_rewrite_chunk_size if is_custom_prompt else settings.ai_analyze_chunk_size
+        chunks = _split_markdown(content, chunk_size, settings.ai_max_chunks)
         
         try:
+            if len(chunks) > 1:
+                return self._optimize_chunks(content, chunks, prompt if is_custom_prompt else None)
             if is_custom_prompt:
-                return self._optimize_with_custom_prompt(content, prompt, content_length)
+                return self._optimize_with_custom_prompt(content, prompt, len(content))
             else:
-                return self._optimize_with_default_prompt(content, content_length)
+                return self._optimize_with_default_prompt(content, len(content))
         except Exception as e:
-            error_msg = str(e)
-            if "404" in error_msg or "upstream_error" in error_msg:
-                raise AIConnectionError("AI服务连接失败，请检查API地址和模型名称是否正确")
-            elif "401" in error_msg or "unauthorized" in error_msg.lower():
-                raise AIConnectionError("AI API密钥无效，请检查API密钥是否正确")
-            elif "timeout" in error_msg.lower() or "timed out" in error_msg.lower():
-                raise AIConnectionError("AI服务响应超时，请稍后重试")
-            else:
-                raise AIConnectionError(f"优化失败: {error_msg}")
+            raise self._to_connection_error(e)
+    
+    def _optimize_chunks(self, content: str, chunks: List[str], prompt: Optional[str]) -> Dict[str, Any]:
+        """长文本分块并发优化后合并（map-reduce）
+        
+        各块在全局共享的 ai_chunk_executor 中执行，同时进行的分块请求总数不超过
+        ai_chunk_concurrency，与并发的优化请求数无关。
+        分析模式下个别块失败时忽略该块；改写模式需要全部块成功，否则抛出第一个错误。
+        """
+        def run(chunk: str) -> Dict[str, Any]:
+            if prompt:
+                return self._optimize_with_custom_prompt(chunk, prompt, len(chunk))
+            return self._optimize_with_default_prompt(chunk, len(chunk))
+        
+        def attempt(chunk: str):
+            try:
+                return run(chunk), None
+            except Exception as e:
+                return None, e
+        
+        futures = [ai_chunk_executor.submit(attempt, chunk) for chunk in chunks]
+        outcomes = [future.result() for future in futures]
+        
+        errors = [e for _, e in outcomes if e is not None]
+        if errors and (prompt or len(errors) == len(chunks)):
+            raise errors[0]
+        if errors:
+            print(f"长文本分析：{len(errors)}/{len(chunks)} 块失败，已忽略: {errors[0]}")
+        
+        parts = [(result, len(chunk)) for (result, _), chunk in zip(outcomes, chunks) if result is not None]
+        merged = _merge_rewrite(parts) if prompt else _merge_analyze(parts, content)
+        merged["chunks"] = len(chunks)
+        return merged
     
-    def _get_existing_categories_and_tags(self) -> Tuple[List[str], List[str]]:
-        """获取现有分类和标签"""
+    def stream_optimize_text(self, content: str, prompt: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """流式优化文本内容
+        
+        依次产出 {"event": "delta", "data": {"text": ...}}，结束时产出
+        {"event": "result", "data": <与 optimize_text 相同的结果>}。
+        需要分块处理的长文本不产出 delta，各块完成并合并后只产出 result。
+        """
+        if not self.is_configured():
+            raise AIConfigurationError("AI未配置")
+        
+        is_custom_prompt = prompt and prompt.strip() != ""
+        chunk_size = settings.ai_rewrite_chunk_size if is_custom_prompt else settings.ai_analyze_chunk_size
+        if len(_split_markdown(content, chunk_size, settings.ai_max_chunks)) > 1:
+            yield {"event": "result", "data": self.optimize_text(content, prompt)}
+            return
+        
+        if is_custom_prompt:
+            request = self._custom_prompt_request(content, prompt, len(content))
+        else:
+            request = self._default_prompt_request(content, len(content))
+        
         try:
-            from ..repositories.note_repository import note_repository
-            categories = note_repository.get_categories_list()
-            tags = note_repository.get_tags_list()
-            return categories, tags
-        except Exception:
+            stream = self._create({**request, "stream": True})
+        except Exception as e:
+            raise self._to_connection_error(e)
+        
+        parts = []
+        try:
+            for chunk in stream:
+                if not chunk.choices:
+                    continue
+                text = chunk.choices[0].delta.content
+                if text:
+                    parts.append(text)
+                    yield {"event": "delta", "data": {"text": text}}
+        except Exception as e:
+            # 已开始输出后不再重试，只计入熔断
+            if _is_retryable(e):
+                self.breaker.record_failure(str(e))
+            raise self._to_connection_error(e)
+        finally:
+            stream.close()
+        
+        raw = "".join(parts).strip()
+        if is_custom_prompt:
+            result = self._parse_rewrite_response(raw)
+        else:
+            result = self._parse_analyze_response(raw, content)
+        yield {"event": "result", "data": result}
+    
+    def _create(self, request: Dict[str, Any]) -> Any:
+        """调用 chat.completions.create
+        
+        request["timeout"] 是整个操作（含重试）的截止时间，每次尝试只使用剩余时间；
+        429/5xx/超时/连接失败按退避重试，连续失败时由熔断器快速失败。
+        """
+        deadline = time.monotonic() + request["timeout"]
+        return call_with_retry(
+            lambda remaining: self.client.chat.completions.create(**{**request, "timeout": remaining}),
+            deadline, self.breaker, _is_retryable, _retry_after,
+            settings.ai_max_retries, settings.ai_retry_base_delay, settings.ai_retry_max_delay
+        )
+    
+    def _to_connection_error(self, e: Exception) -> AIConnectionError:
+        """将 SDK 异常转换为带中文说明的连接错误"""
+        if isinstance(e, AIConnectionError):
+            return e
+        error_msg = str(e)
+        if "404" in error_msg or "upstream_error" in error_msg:
+            return AIConnectionError("AI服务连接失败，请检查API地址和模型名称是否正确")
+        elif "401" in error_msg or "unauthorized" in error_msg.lower():
+            return AIConnectionError("AI API密钥无效，请检查API密钥是否正确")
+        elif "timeout" in error_msg.lower() or "timed out" in error_msg.lower():
+            return AIConnectionError("AI服务响应超时，请稍后重试")
+        else:
+            return AIConnectionError(f"优化失败: {error_msg}")
+    
+    def _select_taxonomy(self, text: str) -> Dict[str, Any]:
+        """挑选与文本最相关的现有分类和标签（各取前 K 个）"""
+        try:
+            return taxonomy_index.select(text)
+        except Exception as e:
             # 如果获取失败，返回空列表
-            return [], []
+            print(f"获取候选分类和标签失败: {e}")
+            return {"categories": [], "tags": [], "total_categories": 0, "total_tags": 0,
+                    "full_tokens": 0, "selected_tokens": 0}
+    
+    def _log_prompt_tokens(self, purpose: str, selection: Dict[str, Any], *messages: str) -> None:
+        """记录候选裁剪前后提示词的估算 token 数"""
+        after = sum(estimate_tokens(m) for m in messages)
+        before = after - selection["selected_tokens"] + selection["full_tokens"]
+        print(
+            f"AI {purpose}提示词：分类 {len(selection['categories'])}/{selection['total_categories']}，"
+            f"标签 {len(selection['tags'])}/{selection['total_tags']}，约 {before} → {after} tokens"
+        )
+    
+    def _taxonomy_version(self, categories: List[str], tags: List[str]) -> str:
+        """提示词中分类体系的版本摘要，分类或标签集合变化后旧缓存自然失效"""
+        raw = "\n".join(sorted(categories)) + "\x00" + "\n".join(sorted(tags))
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+    
+    def _cache_get(self, key: str) -> Optional[Tuple[str, List[str]]]:
+        """读取缓存，缓存故障不影响分类"""
+        try:
+            return ai_cache_repository.get(key)
+        except Exception as e:
+            print(f"读取分类缓存失败: {e}")
+            return None
+    
+    def _cache_put(self, key: str, category: str, tags: List[str]) -> None:
+        try:
+            ai_cache_repository.put(key, category, tags)
+        except Exception as e:
+            print(f"写入分类缓存失败: {e}")
     
     def _build_category_extraction_prompt(self, existing_categories: List[str], existing_tags: List[str]) -> str:
         """构建分类提取提示词"""
@@ -157,17 +340,23 @@ class AIService:
     
     def _optimize_with_custom_prompt(self, content: str, prompt: str, content_length: int) -> Dict[str, Any]:
         """使用自定义提示词优化"""
-        response = self.client.chat.completions.create(
-            model=self.current_model,
-            messages=[
+        response = self._create(self._custom_prompt_request(content, prompt, content_length))
+        return self._parse_rewrite_response(response.choices[0].message.content.strip())
+    
+    def _custom_prompt_request(self, content: str, prompt: str, content_length: int) -> Dict[str, Any]:
+        """自定义提示词的请求参数"""
+        return {
+            "model": self.current_model,
+            "messages": [
                 {"role": "user", "content": f"{prompt}\n\n原文：\n{content[:content_length]}"}
             ],
-            temperature=0.7,
-            max_tokens=20000
-        )
-        
-        raw = response.choices[0].message.content.strip()
-        
+            "temperature": 0.7,
+            "max_tokens": 20000,
+            "timeout": settings.ai_rewrite_timeout
+        }
+    
+    def _parse_rewrite_response(self, raw: str) -> Dict[str, Any]:
+        """解析改写模式的响应"""
         # 尝试解析JSON格式的响应
         try:
             obj = json.loads(raw)
@@ -195,36 +384,45 @@ class AIService:
     
     def _optimize_with_default_prompt(self, content: str, content_length: int) -> Dict[str, Any]:
         """使用默认提示词优化"""
-        existing_categories, existing_tags = self._get_existing_categories_and_tags()
+        response = self._create(self._default_prompt_request(content, content_length))
+        return self._parse_analyze_response(response.choices[0].message.content.strip(), content)
+    
+    def _default_prompt_request(self, content: str, content_length: int) -> Dict[str, Any]:
+        """默认提示词（分析模式）的请求参数"""
+        text = content[:content_length]
+        selection = self._select_taxonomy(text)
+        existing_categories, existing_tags = selection["categories"], selection["tags"]
         
-        response = self.client.chat.completions.create(
-            model=self.current_model,
-            messages=[
-                {
-                    "role": "system",
-                    "content": (
-                        "你是一个专业的中文知识整理助手。默认不要改写用户原文；"
-                        "请基于原文抽取'知识点总结'与'知识图谱'，并生成10-20字中文标题，同时提取合适的分类和标签。"
-                        "优先从现有分类和标签中选择，如果没有合适的再创建新的。"
-                        f"现有分类列表：{', '.join(existing_categories) if existing_categories else '（暂无）'}"
-                        f"现有标签列表：{', '.join(existing_tags) if existing_tags else '（暂无）'}"
-                    )
-                },
-                {
-                    "role": "user",
-                    "content": (
-                        "请严格输出JSON（不要解释），格式如下：\n"
-                        '{"title":"示例标题","key_points":["要点1","要点2"],"graph":{"nodes":[{"id":"概念A"},{"id":"概念B"}],"edges":[{"source":"概念A","target":"概念B","relation":"包含/因果/引用"}]},"category":"分类名称","tags":["标签1","标签2"]}\n\n'
-                        f"原文：\n{content[:content_length]}"
-                    )
-                }
-            ],
-            temperature=0.6,
-            max_tokens=4048
+        system_prompt = (
+            "你是一个专业的中文知识整理助手。默认不要改写用户原文；"
+            "请基于原文抽取'知识点总结'与'知识图谱'，并生成10-20字中文标题，同时提取合适的分类和标签。"
+            "优先从现有分类和标签中选择，如果没有合适的再创建新的。"
+            f"现有分类列表：{', '.join(existing_categories) if existing_categories else '（暂无）'}"
+            f"现有标签列表：{', '.join(existing_tags) if existing_tags else '（暂无）'}"
         )
+        user_prompt = (
+            "请严格输出JSON（不要解释），格式如下：\n"
+            '{"title":"示例标题","key_points":["要点1","要点2"],'
+            '"graph":{"nodes":[{"id":"概念A"},{"id":"概念B"}],'
+            '"edges":[{"source":"概念A","target":"概念B","relation":"包含/因果/引用"}]},'
+            '"category":"分类名称","tags":["标签1","标签2"]}\n\n'
+            f"原文：\n{text}"
+        )
+        self._log_prompt_tokens("分析", selection, system_prompt, user_prompt)
         
-        raw = response.choices[0].message.content.strip()
-        
+        return {
+            "model": self.current_model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            "temperature": 0.6,
+            "max_tokens": 4048,
+            "timeout": settings.ai_optimize_timeout
+        }
+    
+    def _parse_analyze_response(self, raw: str, content: str) -> Dict[str, Any]:
+        """解析分析模式的响应（默认模式不修改原文）"""
         try:
             obj = json.loads(raw)
             tags = obj.get("tags", ["未分类"])
@@ -253,5 +451,277 @@ class AIService:
             }
 
 
-# 全局AI服务实例
+_HEADING = re.compile(r"^#{1,6}\s")
+_FENCE = re.compile(r"^\s*(```|~~~)")
+
+
+def _split_markdown(text: str, max_chars: int, max_chunks: int) -> List[str]:
+    """按 Markdown 标题与段落边界把文本切成不超过 max_chars 的块
+    
+    代码块不切分，超过 max_chars 时整体成块；其他超长段落按行、再按字符切分。
+    块数超过 max_chunks 时先放大块大小，合并后仍超出则反复合并总长最小的相邻两块，
+    保证全文都被处理且块数不超过 max_chunks。
+    """
+    if len(text) <= max_chars:
+        return [text]
+    max_chunks = max(max_chunks, 1)
+    max_chars = max(max_chars, -(-len(text) // max_chunks))
+    
+    # 先切成段落块：标题行与空行（代码块外）是边界，代码块单独成块
+    blocks: List[Tuple[str, bool]] = []
+    current: List[str] = []
+    in_fence = False
+    for line in text.splitlines(keepends=True):
+        if _FENCE.match(line):
+            if not in_fence and current:
+                blocks.append(("".join(current), False))
+                current = []
+            current.append(line)
+            if in_fence:
+                blocks.append(("".join(current), True))
+                current = []
+            in_fence = not in_fence
+            continue
+        if not in_fence and (_HEADING.match(line) or not line.strip()):
+            if current:
+                blocks.append(("".join(current), False))
+                current = []
+            if not line.strip():
+                continue
+        current.append(line)
+    if current:
+        # 未闭合的代码块同样不切分
+        blocks.append(("".join(current), in_fence))
+    
+    # 超长段落按行、再按字符切分
+    pieces: List[str] = []
+    for block, is_fence in blocks:
+        if is_fence or len(block) <= max_chars:
+            pieces.append(block)
+            continue
+        buffer = ""
+        for line in block.splitlines(keepends=True):
+            while len(line) > max_chars:
+                if buffer:
+                    pieces.append(buffer)
+                    buffer = ""
+                pieces.append(line[:max_chars])
+                line = line[max_chars:]
+            if len(buffer) + len(line) > max_chars:
+                pieces.append(buffer)
+                buffer = ""
+            buffer += line
+        if buffer:
+            pieces.append(buffer)
+    
+    # 贪心合并相邻段落；当前块已过半且下一段是标题时提前换块，尽量让一节落在同一块
+    chunks: List[str] = []
+    buffer = ""
+    for piece in pieces:
+        joined = len(buffer) + 2 + len(piece)
+        if buffer and (joined > max_chars or (_HEADING.match(piece) and len(buffer) >= max_chars // 2)):
+            chunks.append(buffer)
+            buffer = ""
+        buffer = f"{buffer}\n\n{piece}" if buffer else piece
+    if buffer:
+        chunks.append(buffer)
+    chunks = [chunk.strip("\n") for chunk in chunks if chunk.strip()]
+    
+    # 贪心合并留下的空隙（以及整体成块的代码块）可能使块数超出上限
+    while len(chunks) > max_chunks:
+        i = min(range(len(chunks) - 1), key=lambda k: len(chunks[k]) + len(chunks[k + 1]))
+        chunks[i:i + 2] = [f"{chunks[i]}\n\n{chunks[i + 1]}"]
+    return chunks
+
+
+def _vote(parts: List[Tuple[Dict[str, Any], int]], limit: int) -> Tuple[str, List[str]]:
+    """按块长度加权投票选出分类与标签"""
+    categories: Counter = Counter()
+    tags: Counter = Counter()
+    for result, weight in parts:
+        categories[result["category"]] += weight
+        for tag in result["tags"].split(","):
+            if tag.strip():
+                tags[tag.strip()] += weight
+    # 有其他候选时不选默认值
+    if len(categories) > 1:
+        categories.pop("其他", None)
+    if len(tags) > 1:
+        tags.pop("未分类", None)
+    category = categories.most_common(1)[0][0] if categories else "其他"
+    return category, [tag for tag, _ in tags.most_common(limit)] or ["未分类"]
+
+
+def _merge_analyze(parts: List[Tuple[Dict[str, Any], int]], content: str) -> Dict[str, Any]:
+    """合并各块的分析结果：要点与图谱去重合并，标题取首块，分类和标签加权投票"""
+    key_points: List[str] = []
+    seen_points = set()
+    nodes: List[Dict[str, Any]] = []
+    seen_nodes = set()
+    edges: List[Dict[str, Any]] = []
+    seen_edges = set()
+    for result, _ in parts:
+        for point in result.get("key_points") or []:
+            key = re.sub(r"\s+", "", str(point)).casefold()
+            if key and key not in seen_points:
+                seen_points.add(key)
+                key_points.append(point)
+        graph = result.get("graph") or {}
+        for node in graph.get("nodes") or []:
+            node_id = node.get("id") if isinstance(node, dict) else None
+            if node_id and node_id not in seen_nodes:
+                seen_nodes.add(node_id)
+                nodes.append(node)
+        for edge in graph.get("edges") or []:
+            if not isinstance(edge, dict):
+                continue
+            key = (edge.get("source"), edge.get("target"), edge.get("relation"))
+            if key not in seen_edges:
+                seen_edges.add(key)
+                edges.append(edge)
+    
+    category, tags = _vote(parts, 5)
+    title = next((result["title"] for result, _ in parts if result["title"]), "")
+    return {
+        "title": title,
+        "optimized": content.strip(),
+        "category": category,
+        "tags": ",".join(tags),
+        "key_points": key_points,
+        "graph": {"nodes": nodes, "edges": edges},
+        "mode": "analyze"
+    }
+
+
+def _merge_rewrite(parts: List[Tuple[Dict[str, Any], int]]) -> Dict[str, Any]:
+    """按原顺序拼接各块的改写结果，标题取首块，分类和标签加权投票"""
+    category, tags = _vote(parts, 5)
+    title = next((result["title"] for result, _ in parts if result["title"]), "")
+    return {
+        "title": title,
+        "optimized": "\n\n".join(result["optimized"].strip() for result, _ in parts),
+        "category": category,
+        "tags": ",".join(tags),
+        "mode": "rewrite"
+    }
+
+
+def _is_retryable(e: Exception) -> bool:
+    """上游故障（超时、连接失败、408/429/5xx）可重试并计入熔断，其余错误直接抛出"""
+    if isinstance(e, (APIConnectionError, TimeoutError, ConnectionError)):
+        return True
+    status = getattr(e, "status_code", None)
+    return isinstance(status, int) and (status in (408, 429) or status >= 500)
+
+
+def _retry_after(e: Exception) -> Optional[float]:
+    """上游在 Retry-After 头中要求的等待秒数"""
+    headers = getattr(getattr(e, "response", None), "headers", None)
+    try:
+        value = headers.get("retry-after") if headers is not None else None
+        return min(float(value), settings.ai_retry_max_delay) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class AIClientCache:
+    """按 API 配置缓存的 AI 服务实例（LRU + 空闲回收）
+    
+    键为 hash_api_config(url, key) 与模型名，同一配置的请求复用同一个 OpenAI 客户端
+    及其 HTTP 连接池。实例创建后不再修改，可被并发请求共享。
+    """
+    
+    def __init__(self, max_size: int = 32, idle_ttl: float = 600.0):
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        # (配置哈希, 模型) -> (AIService, 最近使用时间)
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[AIService, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0}
+    
+    def get(self, api_url: str, api_key: str, model: str) -> AIService:
+        """获取（必要时创建）指定配置的 AI 服务实例"""
+        key = (hash_api_config(api_url, api_key), model)
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._entries.get(key)
+            if entry:
+                self._stats["hits"] += 1
+                self._entries[key] = (entry[0], now)
+                self._entries.move_to_end(key)
+                return entry[0]
+            self._stats["misses"] += 1
+        
+        service = AIService()
+        service.initialize_client(api_url, api_key, model)
+        
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                # 并发创建时保留先放入的实例
+                self._close(service)
+                return entry[0]
+            self._entries[key] = (service, now)
+            while len(self._entries) > self.max_size:
+                self._evict_oldest()
+            return service
+    
+    def discard(self, api_url: str, api_key: str) -> None:
+        """移除某个 API 配置的全部实例（退出登录时使用）"""
+        config_hash = hash_api_config(api_url, api_key)
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == config_hash]:
+                self._entries.pop(key)
+    
+    def clear(self) -> None:
+        """关闭并清空全部客户端"""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for service, _ in entries:
+            self._close(service)
+    
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"size": len(self._entries), **self._stats}
+    
+    def health(self) -> List[Dict[str, Any]]:
+        """各缓存实例的熔断状态（只显示配置哈希前缀，不含密钥）"""
+        with self._lock:
+            entries = [(key, service) for key, (service, _) in self._entries.items()]
+        return [
+            {"config": config_hash[:12], "model": model, "breaker": service.breaker.snapshot()}
+            for (config_hash, model), service in entries
+        ]
+    
+    def _evict_idle(self, now: float) -> None:
+        """回收空闲超时的客户端（需持有锁）"""
+        while self._entries:
+            _, last_used = next(iter(self._entries.values()))
+            if now - last_used < self.idle_ttl:
+                break
+            self._evict_oldest()
+    
+    def _evict_oldest(self) -> None:
+        """移出最久未用的实例（需持有锁）
+        
+        批量分类任务、后台分类等长期持有者可能仍在使用该实例，
+        因此只移出缓存而不关闭，由垃圾回收在无人引用后释放连接。
+        """
+        self._entries.popitem(last=False)
+        self._stats["evictions"] += 1
+    
+    def _close(self, service: AIService) -> None:
+        try:
+            if service.client is not None:
+                service.client.close()
+        except Exception:
+            pass
+
+
+# 全局AI服务实例（未配置客户端，仅作兼容保留）
 ai_service = AIService()
+
+# 全局AI客户端缓存实例
+ai_client_cache = AIClientCache(settings.ai_client_cache_size, settings.ai_client_idle_ttl)
@@ -0,0 +1,221 @@
+"""
+批量自动分类服务
+
+在后台线程中为未分类（或符合过滤条件）的笔记调用 AI 提取分类和标签，
+按并发数与每秒请求数限制调用，结果分批写回数据库并把笔记文件移动到新分类目录。
+"""
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+from ..repositories.note_repository import note_repository
+from .ai_service import AIService
+from .file_service import file_service
+
+# 无 AI 时写入的默认值，补全模式下视为缺失
+PLACEHOLDER_CATEGORIES = ("", "未分类")
+PLACEHOLDER_TAGS = ("", "无标签")
+
+
+class _RateLimiter:
+    """按固定间隔发放请求许可，多线程共享"""
+    
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+class ClassifyService:
+    """批量自动分类服务类"""
+    
+    def __init__(self):
+        self.repository = note_repository
+        self.file_service = file_service
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+    
+    def start_job(self, ai_service: AIService, category: Optional[str] = None, tag: Optional[str] = None,
+                  unclassified_only: bool = True, concurrency: int = 4, rate_limit: float = 2.0,
+                  batch_size: int = 50) -> Dict[str, Any]:
+        """在后台线程中启动分类任务，返回任务进度"""
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "status": "running",
+            "total": self.repository.count_notes_for_classification(category, tag, unclassified_only),
+            "processed": 0,
+            "updated": 0,
+            "skipped": 0,
+            "failed": 0,
+            "elapsed": 0.0,
+            "rate": 0.0,
+            "errors": [],
+            "_filters": {"category": category, "tag": tag, "unclassified_only": unclassified_only},
+            "_concurrency": concurrency,
+            "_batch_size": batch_size,
+            "_limiter": _RateLimiter(rate_limit),
+            # 置位表示运行，清除表示暂停
+            "_running": threading.Event(),
+            "_started": time.monotonic(),
+            "_paused_at": None,
+            "_paused_total": 0.0
+        }
+        job["_running"].set()
+        with self._lock:
+            self._jobs[job_id] = job
+        
+        threading.Thread(
+            target=self._run, args=(job, ai_service), name=f"note-classify-{job_id[:8]}", daemon=True
+        ).start()
+        return self.get_job(job_id)
+    
+    def pause_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """暂停任务：已发出的 AI 请求完成后不再发起新请求"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job and job["status"] == "running":
+                job["_running"].clear()
+                job["_paused_at"] = time.monotonic()
+                job["status"] = "paused"
+        return self.get_job(job_id)
+    
+    def resume_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """继续已暂停的任务"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job and job["status"] == "paused":
+                job["_paused_total"] += time.monotonic() - job["_paused_at"]
+                job["_paused_at"] = None
+                job["status"] = "running"
+                job["_running"].set()
+        return self.get_job(job_id)
+    
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """获取任务进度"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if not job:
+                return None
+            self._update_rate(job)
+            return {k: (list(v) if k == "errors" else v) for k, v in job.items() if not k.startswith("_")}
+    
+    def _run(self, job: Dict[str, Any], ai_service: AIService) -> None:
+        filters = job["_filters"]
+        overwrite = not filters["unclassified_only"]
+        
+        def classify(note: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[Tuple[str, List[str]]], Optional[str]]:
+            job["_running"].wait()
+            job["_limiter"].acquire()
+            try:
+                return note, ai_service.classify_content(note["content"] or note["title"]), None
+            except Exception as e:
+                return note, None, str(e)
+        
+        try:
+            after_id = 0
+            with ThreadPoolExecutor(max_workers=job["_concurrency"]) as pool:
+                while True:
+                    job["_running"].wait()
+                    notes = self.repository.get_notes_for_classification(
+                        after_id, job["_batch_size"], **filters
+                    )
+                    if not notes:
+                        break
+                    results = list(pool.map(classify, notes))
+                    self._write_back(job, results, overwrite)
+                    after_id = notes[-1]["id"]
+            
+            with self._lock:
+                self._update_rate(job)
+                job["status"] = "completed"
+        except Exception as e:
+            with self._lock:
+                self._update_rate(job)
+                job["status"] = "failed"
+                self._record_error(job, None, str(e))
+    
+    def _write_back(self, job: Dict[str, Any], results, overwrite: bool) -> None:
+        """把一批分类结果在单个事务中写回，并登记笔记文件移动
+        
+        结果基于批次开始时读取的笔记，写回时检查 updated_at，期间被用户修改的笔记跳过。
+        """
+        updates = []
+        failed = []
+        for note, result, error in results:
+            if error:
+                failed.append((note["id"], error))
+                continue
+            category, tags = result
+            old_tags = [t.strip() for t in note["tags"].split(",") if t.strip()]
+            if not overwrite:
+                # 补全模式只替换缺失或默认的字段
+                if (note["category"] or "") not in PLACEHOLDER_CATEGORIES:
+                    category = note["category"]
+                if ",".join(old_tags) not in PLACEHOLDER_TAGS:
+                    tags = old_tags
+            if category == note["category"] and tags == old_tags:
+                continue
+            updates.append({
+                "id": note["id"],
+                "title": note["title"],
+                "category": category,
+                "tags": ",".join(tags),
+                "tags_list": tags,
+                "old_filename": note["filename"],
+                "filename": self.file_service.allocate_filename(note["title"], category, current=note["filename"]),
+                "expected_updated_at": note["updated_at"]
+            })
+        
+        try:
+            updated_ids = set(self.repository.bulk_update_metadata(updates))
+        except Exception:
+            for update in updates:
+                self.file_service.release_filename(update["filename"])
+            raise
+        
+        skipped = [update for update in updates if update["id"] not in updated_ids]
+        for update in skipped:
+            self.file_service.release_filename(update["filename"])
+        updates = [update for update in updates if update["id"] in updated_ids]
+        
+        # 正文不变，只重写头部并移动到新分类目录
+        for update in updates:
+            self.file_service.enqueue_write(
+                update["id"], update["filename"], update["title"], None, update["category"],
+                update["tags_list"], previous_path=update["old_filename"]
+            )
+        
+        with self._lock:
+            job["processed"] += len(results)
+            job["updated"] += len(updates)
+            job["skipped"] += len(skipped)
+            for note_id, error in failed:
+                self._record_error(job, note_id, error)
+    
+    def _record_error(self, job: Dict[str, Any], note_id: Optional[int], error: str) -> None:
+        job["failed"] += 1
+        # 只保留前若干条错误明细
+        if len(job["errors"]) < 100:
+            job["errors"].append({"note_id": note_id, "error": error})
+    
+    def _update_rate(self, job: Dict[str, Any]) -> None:
+        """更新耗时与吞吐（不含暂停时间，需持有锁）"""
+        if job["status"] in ("running", "paused"):
+            now = job["_paused_at"] or time.monotonic()
+            job["elapsed"] = round(now - job["_started"] - job["_paused_total"], 2)
+        elapsed = job["elapsed"]
+        job["rate"] = round(job["processed"] / elapsed, 2) if elapsed > 0 else 0.0
+
+
+# 全局批量分类服务实例
+classify_service = ClassifyService()
@@ -0,0 +1,133 @@
+"""
+后台 AI 分类服务
+
+延迟分类模式下，新建笔记先以默认分类和标签写入并标记为 pending，保存请求立即返回；
+分类在 AI 线程池中进行，完成后更新笔记（统计表随之更新），并把笔记文件移到新分类目录。
+"""
+import threading
+from typing import Any, Dict
+from ..config.settings import settings
+from ..core import ai_executor
+from ..repositories.note_repository import note_repository
+from .ai_service import AIService, ai_client_cache
+from .classify_service import PLACEHOLDER_CATEGORIES, PLACEHOLDER_TAGS
+from .file_service import file_service
+from .local_classifier import local_classifier
+
+# 分类期间笔记被修改时，按新内容重试的最多次数
+MAX_ATTEMPTS = 3
+
+
+class DeferredClassifier:
+    """后台 AI 分类服务类"""
+    
+    def __init__(self):
+        self.repository = note_repository
+        self.file_service = file_service
+        self._lock = threading.Lock()
+        self._stats = {"queued": 0, "completed": 0, "failed": 0, "discarded": 0}
+    
+    def enqueue(self, note_id: int, ai_service: AIService) -> None:
+        """登记 pending 笔记的后台分类"""
+        self._count("queued")
+        ai_executor.submit(self._classify, note_id, ai_service, 1)
+    
+    def resume_pending(self) -> int:
+        """重新登记上次运行未完成的 pending 笔记，返回笔记数
+        
+        请求中的 AI 配置不会保存，只能使用服务端配置（OPENAI_BASE_URL/OPENAI_API_KEY）；
+        未配置时标记为分类失败，可通过批量分类任务补全。
+        """
+        note_ids = self.repository.get_pending_classification_ids()
+        if not note_ids:
+            return 0
+        
+        ai_service = None
+        if settings.openai_base_url and settings.openai_api_key:
+            try:
+                ai_service = ai_client_cache.get(
+                    settings.openai_base_url, settings.openai_api_key, settings.default_model
+                )
+            except Exception as e:
+                print(f"创建后台分类 AI 客户端失败: {e}")
+        
+        for note_id in note_ids:
+            if ai_service:
+                self.enqueue(note_id, ai_service)
+            else:
+                self.repository.mark_classification_failed(note_id)
+        return len(note_ids)
+    
+    def get_status(self) -> Dict[str, Any]:
+        """各状态笔记数量与本次运行的处理统计"""
+        counts = self.repository.count_classify_status()
+        with self._lock:
+            return {
+                "pending": counts.get("pending", 0),
+                "failed": counts.get("failed", 0),
+                "processed": dict(self._stats)
+            }
+    
+    def _classify(self, note_id: int, ai_service: AIService, attempt: int) -> None:
+        try:
+            note = self.repository.get_note_by_id(note_id)
+            if not note or note["classify_status"] != "pending":
+                self._count("discarded")
+                return
+            
+            try:
+                category, tags = ai_service.classify_content(note["content"])
+            except Exception as e:
+                print(f"笔记 {note_id} 后台分类失败: {e}")
+                self._fail(note_id)
+                return
+            
+            # 只填写创建时留空（仍为默认值）的字段
+            old_tags = [t.strip() for t in (note["tags"] or "").split(",") if t.strip()]
+            if (note["category"] or "") not in PLACEHOLDER_CATEGORIES:
+                category = note["category"]
+            if ",".join(old_tags) not in PLACEHOLDER_TAGS:
+                tags = old_tags
+            
+            new_path = self.file_service.allocate_filename(note["title"], category, current=note["filename"])
+            try:
+                applied = self.repository.finish_classification(
+                    note_id, note["title"], note["content_hash"], category, ",".join(tags), new_path
+                )
+            except Exception:
+                self.file_service.release_filename(new_path)
+                raise
+            
+            if not applied:
+                self.file_service.release_filename(new_path)
+                # 分类期间笔记被修改：仍为 pending 时按新内容重新分类
+                if attempt < MAX_ATTEMPTS:
+                    ai_executor.submit(self._classify, note_id, ai_service, attempt + 1)
+                else:
+                    self._fail(note_id)
+                return
+            
+            # 正文不变，只重写头部并移动到新分类目录
+            self.file_service.enqueue_write(
+                note_id, new_path, note["title"], None, category, tags, previous_path=note["filename"]
+            )
+            local_classifier.learn(note["content"], category, tags)
+            self._count("completed")
+        except Exception as e:
+            print(f"笔记 {note_id} 后台分类失败: {e}")
+            self._fail(note_id)
+    
+    def _fail(self, note_id: int) -> None:
+        try:
+            self.repository.mark_classification_failed(note_id)
+        except Exception as e:
+            print(f"标记笔记 {note_id} 分类失败时出错: {e}")
+        self._count("failed")
+    
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+
+# 全局后台分类服务实例
+deferred_classifier = DeferredClassifier()
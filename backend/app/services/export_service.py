@@ -0,0 +1,110 @@
+"""
+笔记流式导出服务
+"""
+import json
+import time
+import zipfile
+from typing import Any, Dict, Iterator, Optional
+from ..config.settings import settings
+from ..repositories.note_repository import note_repository
+from .file_service import file_service
+
+
+class _ZipChunkBuffer:
+    """只追加的写缓冲区，供 zipfile 以不可 seek 的流模式写入
+    
+    zipfile 检测到没有 seek 时会改用数据描述符，不再回写本地文件头，
+    因此写出的字节可以在每个文件完成后直接发送给客户端。
+    """
+    
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+    
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+    
+    def tell(self) -> int:
+        return self._position
+    
+    def flush(self) -> None:
+        pass
+    
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ExportService:
+    """笔记流式导出服务类"""
+    
+    def __init__(self):
+        self.repository = note_repository
+        self.file_service = file_service
+    
+    def iter_ndjson(self, category: Optional[str] = None, tag: Optional[str] = None,
+                    since_ts: Optional[int] = None, until_ts: Optional[int] = None) -> Iterator[bytes]:
+        """逐行生成 NDJSON，每行一条完整笔记"""
+        for note in self._iter_notes(category, tag, since_ts, until_ts):
+            note["tags"] = self._split_tags(note["tags"])
+            yield (json.dumps(note, ensure_ascii=False) + "\n").encode("utf-8")
+    
+    def iter_zip(self, category: Optional[str] = None, tag: Optional[str] = None,
+                 since_ts: Optional[int] = None, until_ts: Optional[int] = None) -> Iterator[bytes]:
+        """生成与 notes/ 目录结构一致的 ZIP 字节流"""
+        buffer = _ZipChunkBuffer()
+        used_names = set()
+        with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            for note in self._iter_notes(category, tag, since_ts, until_ts):
+                name = self._archive_name(note, used_names)
+                info = zipfile.ZipInfo(name, date_time=self._zip_date_time(note["created_at_ts"]))
+                info.compress_type = zipfile.ZIP_DEFLATED
+                text = self.file_service.render_note(
+                    note["title"], note["content"], note["category"], self._split_tags(note["tags"])
+                )
+                archive.writestr(info, text.encode("utf-8"))
+                data = buffer.drain()
+                if data:
+                    yield data
+        # 中央目录在关闭时写出
+        data = buffer.drain()
+        if data:
+            yield data
+    
+    def _iter_notes(self, category: Optional[str], tag: Optional[str],
+                    since_ts: Optional[int], until_ts: Optional[int]) -> Iterator[Dict[str, Any]]:
+        return self.repository.iter_notes_for_export(
+            category=category,
+            tag=tag,
+            since_ts=since_ts,
+            until_ts=until_ts,
+            chunk_size=settings.export_chunk_size
+        )
+    
+    def _archive_name(self, note: Dict[str, Any], used_names: set) -> str:
+        """压缩包内路径：优先沿用笔记文件的相对路径，重名时追加笔记ID"""
+        name = (note["filename"] or "").replace("\\", "/").lstrip("/")
+        if not name or ".." in name.split("/"):
+            name = (f"{self.file_service._sanitize_dirname(note['category'])}/"
+                    f"{self.file_service._sanitize_title(note['title'])}.md")
+        if name in used_names:
+            stem, dot, ext = name.rpartition(".")
+            name = f"{stem}_{note['id']}.{ext}" if dot else f"{name}_{note['id']}"
+        used_names.add(name)
+        return name
+    
+    def _zip_date_time(self, ts_ms: Optional[int]):
+        """ZIP 时间戳不能早于 1980 年"""
+        if not ts_ms:
+            return (1980, 1, 1, 0, 0, 0)
+        return max(time.gmtime(ts_ms / 1000)[:6], (1980, 1, 1, 0, 0, 0))
+    
+    def _split_tags(self, tags: str):
+        return [t.strip() for t in (tags or "").split(",") if t.strip()]
+
+
+# 全局导出服务实例
+export_service = ExportService()
@@ -1,56 +1,244 @@
 """
 文件操作服务
 """
+import os
 import re
-from typing import List, Optional
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
 from ..config.settings import settings
+from ..repositories.note_repository import note_repository
 from ..core import FileOperationError
+from ..note_markdown import parse_note_markdown
 
 
 class FileService:
-    """文件操作服务类"""
+    """文件操作服务类
+    
+    笔记文件采用后写（write-behind）方式落盘：请求中只分配并预留文件路径，
+    实际写入由后台线程完成。同一笔记在写入前的多次修改会合并为一次写入。
+    落盘完成前以数据库为准。
+    """
     
     def __init__(self):
         self.notes_dir = settings.notes_dir
         self.notes_dir.mkdir(exist_ok=True)
+        # note_id -> 待执行的文件操作，按首次入队顺序排列
+        self._pending: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        # 已分配但尚未写入完成的相对路径
+        self._reserved = set()
+        # 分类目录 -> 已占用文件名（casefold），(目录, 标题) -> 下一个重名序号
+        self._names: Dict[str, set] = {}
+        self._next_suffix: Dict[Tuple[str, str], int] = {}
+        self._cond = threading.Condition()
+        self._writer: Optional[threading.Thread] = None
+        self._stopping = False
+        self._flushing = 0
+        self._inflight = 0
+        self._stats = {"written": 0, "deleted": 0, "coalesced": 0, "failed": 0}
     
     def save_note_to_file(self, title: str, content: str, category: str, tags: List[str]) -> str:
-        """保存笔记到文件"""
+        """保存笔记到文件（同步写入）"""
         try:
-            safe_title = self._sanitize_title(title)
-            safe_category = self._sanitize_dirname(category)
+            rel_path = self.allocate_filename(title, category)
+            try:
+                self._write_note(rel_path, title, content, category, tags)
+            finally:
+                self.release_filename(rel_path)
+            return rel_path
+        except Exception as e:
+            raise FileOperationError(f"保存文件失败: {str(e)}") from e
+    
+    def allocate_filename(self, title: str, category: str, current: Optional[str] = None) -> str:
+        """为笔记分配不冲突的相对路径并预留，直到写入完成或调用 release_filename
+        
+        current 为笔记当前的相对路径，候选路径与其相同时直接沿用。
+        冲突先查内存中的目录文件名索引，索引之外的候选再检查磁盘，
+        启动后用户在 notes 目录中新建的同名文件不会被覆盖。
+        """
+        safe_title = self._sanitize_title(title)
+        safe_category = self._sanitize_dirname(category)
+        
+        with self._cond:
+            names = self._directory_names(safe_category)
             filename = f"{safe_title}.md"
-            filepath = self.notes_dir / safe_category / filename
-            filepath.parent.mkdir(parents=True, exist_ok=True)
-            
-            # 处理文件名重复问题
-            counter = 1
-            while filepath.exists():
-                filename = f"{safe_title}_{counter}.md"
-                filepath = self.notes_dir / safe_category / filename
-                counter += 1
-                # 防止无限循环
-                if counter > 1000:
-                    import time
-                    filename = f"{safe_title}_{int(time.time())}.md"
-                    filepath = self.notes_dir / safe_category / filename
-                    break
+            if self._is_taken(safe_category, filename, names, current):
+                # 从上次分配到的序号继续，重名很多时也无需从 1 开始探测
+                key = (safe_category, safe_title.casefold())
+                counter = self._next_suffix.get(key, 1)
+                while True:
+                    filename = f"{safe_title}_{counter}.md"
+                    counter += 1
+                    if not self._is_taken(safe_category, filename, names, current):
+                        break
+                self._next_suffix[key] = counter
             
-            with open(filepath, "w", encoding="utf-8") as f:
-                f.write(f"# {safe_title}\n")
-                f.write(f"**分类：** {safe_category}\n")
-                if tags:
-                    f.write(f"**标签：** {', '.join(tags)}\n")
-                f.write("\n")
-                f.write(content)
-            
-            return str(filepath.relative_to(self.notes_dir))
+            rel_path = f"{safe_category}/{filename}"
+            names.add(filename.casefold())
+            self._reserved.add(rel_path)
+            return rel_path
+    
+    def _is_taken(self, directory: str, filename: str, names: set, current: Optional[str]) -> bool:
+        """候选文件名是否已被占用（需持有锁），磁盘上新发现的文件补入索引"""
+        if f"{directory}/{filename}" == current:
+            return False
+        if filename.casefold() in names:
+            return True
+        if (self.notes_dir / directory / filename).exists():
+            names.add(filename.casefold())
+            return True
+        return False
+    
+    def release_filename(self, rel_path: str) -> None:
+        """释放预留路径（未入队写入时使用，例如数据库写入失败）"""
+        with self._cond:
+            if not any(op["path"] == rel_path for op in self._pending.values()):
+                self._reserved.discard(rel_path)
+                if not (self.notes_dir / rel_path).exists():
+                    self._forget_name(rel_path)
+    
+    def register_filenames(self, rel_paths: List[str]) -> None:
+        """登记不经 allocate_filename 写入数据库的路径（目录监视、导入），使其计入文件名索引"""
+        with self._cond:
+            for rel_path in rel_paths:
+                directory, _, filename = rel_path.replace("\\", "/").rpartition("/")
+                names = self._names.get(directory)
+                if names is not None:
+                    names.add(filename.casefold())
+    
+    def forget_filenames(self, rel_paths: List[str]) -> None:
+        """笔记已在其他途径删除时，从文件名索引中移除未预留且已不在磁盘上的路径"""
+        with self._cond:
+            for rel_path in rel_paths:
+                if rel_path not in self._reserved and not (self.notes_dir / rel_path).exists():
+                    self._forget_name(rel_path)
+    
+    def is_reserved(self, rel_path: str) -> bool:
+        """路径是否已分配但尚未写入完成（文件内容可能落后于数据库）"""
+        with self._cond:
+            return rel_path in self._reserved
+    
+    def enqueue_write(self, note_id: int, rel_path: str, title: str, content: Optional[str],
+                      category: str, tags: List[str], previous_path: Optional[str] = None) -> None:
+        """登记笔记文件写入，previous_path 为需要在写入后删除的旧文件
+        
+        content 为 None 表示正文未变化，只重写头部，正文沿用现有文件。
+        """
+        if not settings.file_write_behind:
+            try:
+                self._write_or_rewrite_header(note_id, rel_path, title, content, category, tags,
+                                              [previous_path] if previous_path else [])
+                if previous_path and previous_path != rel_path:
+                    self.delete_note_file(previous_path)
+            finally:
+                self.release_filename(rel_path)
+            return
+        
+        with self._cond:
+            op = self._pending.get(note_id)
+            stale = self._merge_pending(op, keep=rel_path)
+            if previous_path and not (op and op["path"] == previous_path):
+                stale.add(previous_path)
+            stale.discard(rel_path)
+            self._reserved.add(rel_path)
+            if content is None and op and op.get("content") is not None:
+                # 待写的完整正文仍然有效
+                content = op["content"]
+            # 覆盖已有键不改变排队位置，保留原到期时间，频繁自动保存不会无限推迟写入
+            self._pending[note_id] = {
+                "path": rel_path,
+                "title": title,
+                "content": content,
+                "category": category,
+                "tags": list(tags),
+                "stale": stale,
+                "delete": False,
+                "due": op["due"] if op else time.monotonic() + settings.file_write_delay
+            }
+            self._ensure_writer()
+            self._cond.notify_all()
+    
+    def enqueue_delete(self, note_id: int, rel_path: Optional[str]) -> None:
+        """登记笔记文件删除，与尚未执行的写入合并"""
+        if not settings.file_write_behind:
+            self.delete_note_file(rel_path)
+            return
+        
+        with self._cond:
+            op = self._pending.get(note_id)
+            stale = self._merge_pending(op)
+            if rel_path and not (op and op["path"] == rel_path):
+                stale.add(rel_path)
+            if not stale:
+                self._pending.pop(note_id, None)
+                return
+            self._pending[note_id] = {
+                "path": None,
+                "stale": stale,
+                "delete": True,
+                "due": op["due"] if op else time.monotonic()
+            }
+            self._ensure_writer()
+            self._cond.notify_all()
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """立即写出所有待写文件并等待完成，超时返回 False"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._flushing += 1
+            self._cond.notify_all()
+            try:
+                while self._pending or self._inflight:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+                return True
+            finally:
+                self._flushing -= 1
+    
+    def shutdown(self, timeout: Optional[float] = None) -> None:
+        """写出剩余文件并停止后台写线程"""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+            writer = self._writer
+        if writer:
+            writer.join(timeout)
+        with self._cond:
+            self._writer = None
+            self._stopping = False
+    
+    def get_queue_status(self) -> Dict[str, Any]:
+        """后写队列状态"""
+        with self._cond:
+            return {
+                "enabled": settings.file_write_behind,
+                "pending": len(self._pending),
+                "inflight": self._inflight,
+                **self._stats
+            }
+    
+    def write_note_file(self, rel_path: str, title: str, content: str, category: str, tags: List[str]) -> None:
+        """立即原子写入指定路径的笔记文件（不经过后写队列）"""
+        try:
+            self._write_note(rel_path, title, content, category, tags)
         except Exception as e:
             raise FileOperationError(f"保存文件失败: {str(e)}") from e
     
+    def render_note(self, title: str, content: str, category: str, tags: List[str]) -> str:
+        """生成笔记 Markdown 文本（头部 + 正文）"""
+        header = f"# {self._sanitize_title(title)}\n**分类：** {self._sanitize_dirname(category)}\n"
+        if tags:
+            header += f"**标签：** {', '.join(tags)}\n"
+        return header + "\n" + (content or "")
+    
     def update_note_file(self, original_relative_path: Optional[str], title: str, 
                         content: str, category: str, tags: List[str]) -> str:
-        """更新笔记文件"""
+        """更新笔记文件（同步写入）"""
         try:
             new_rel_path = self.save_note_to_file(title, content, category, tags)
             
@@ -71,10 +259,150 @@ class FileService:
                 abs_path = self.notes_dir / relative_path
                 if abs_path.exists():
                     abs_path.unlink(missing_ok=True)
+                with self._cond:
+                    if relative_path not in self._reserved:
+                        self._forget_name(relative_path)
         except Exception as e:
             # 文件删除失败不影响主流程
             print(f"删除文件失败: {e}")
     
+    def _write_note(self, rel_path: str, title: str, content: str, category: str, tags: List[str]) -> None:
+        """原子写入：先写同目录临时文件并 fsync，再重命名覆盖目标文件"""
+        filepath = self.notes_dir / rel_path
+        filepath.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = filepath.with_name(f".{filepath.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(self.render_note(title, content, category, tags))
+                if settings.file_fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+            os.replace(tmp_path, filepath)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        if settings.file_fsync:
+            self._fsync_directory(filepath.parent)
+    
+    def _write_or_rewrite_header(self, note_id: int, rel_path: str, title: str, content: Optional[str],
+                                 category: str, tags: List[str], sources) -> None:
+        """写入笔记文件；content 为 None 时从现有文件（或其旧路径）取正文，只替换头部"""
+        if content is None:
+            for source in [rel_path, *sources]:
+                source_path = self.notes_dir / source
+                if source_path.is_file():
+                    content = parse_note_markdown(source_path.read_text(encoding="utf-8"))["content"]
+                    break
+            else:
+                # 文件缺失时以数据库正文为准
+                note = note_repository.get_note_by_id(note_id)
+                content = note["content"] if note else ""
+        self._write_note(rel_path, title, content, category, tags)
+    
+    def _fsync_directory(self, directory: Path) -> None:
+        """持久化目录项（重命名），不支持的平台忽略"""
+        try:
+            fd = os.open(directory, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            os.fsync(fd)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+    
+    def _directory_names(self, directory: str) -> set:
+        """分类目录的已占用文件名索引（需持有锁），首次访问时从磁盘和数据库加载
+        
+        数据库中已登记但文件尚未写出的路径同样视为占用，避免违反 filename 唯一约束。
+        文件名按 casefold 比较，兼容大小写不敏感的文件系统。
+        """
+        names = self._names.get(directory)
+        if names is None:
+            names = set()
+            dir_path = self.notes_dir / directory
+            if dir_path.is_dir():
+                with os.scandir(dir_path) as entries:
+                    names.update(entry.name.casefold() for entry in entries if not entry.name.startswith("."))
+            prefix = f"{directory}/"
+            names.update(
+                filename[len(prefix):].casefold()
+                for filename in note_repository.get_filenames_in_directory(directory)
+            )
+            self._names[directory] = names
+        return names
+    
+    def _forget_name(self, rel_path: str) -> None:
+        """从文件名索引中移除（需持有锁）"""
+        directory, _, filename = rel_path.replace("\\", "/").rpartition("/")
+        names = self._names.get(directory)
+        if names is not None:
+            names.discard(filename.casefold())
+    
+    def _merge_pending(self, op: Optional[Dict[str, Any]], keep: Optional[str] = None) -> set:
+        """合并笔记尚未执行的操作，返回仍需删除的旧文件集合（需持有锁）
+        
+        被合并掉的目标路径若从未写入磁盘，只释放预留而不删除，
+        以免误删之后被其他笔记分配到的同名文件。
+        """
+        if not op:
+            return set()
+        self._stats["coalesced"] += 1
+        stale = set(op["stale"])
+        if op["path"]:
+            self._reserved.discard(op["path"])
+            if (self.notes_dir / op["path"]).exists():
+                stale.add(op["path"])
+            elif op["path"] != keep:
+                self._forget_name(op["path"])
+        return stale
+    
+    def _ensure_writer(self) -> None:
+        if self._writer is None or not self._writer.is_alive():
+            self._writer = threading.Thread(target=self._run_writer, name="note-file-writer", daemon=True)
+            self._writer.start()
+    
+    def _run_writer(self) -> None:
+        """后台写线程：按入队顺序执行到期的文件操作"""
+        while True:
+            with self._cond:
+                while True:
+                    if self._pending:
+                        note_id, op = next(iter(self._pending.items()))
+                        wait = op["due"] - time.monotonic()
+                        if wait <= 0 or self._stopping or self._flushing:
+                            del self._pending[note_id]
+                            self._inflight += 1
+                            break
+                        self._cond.wait(wait)
+                    elif self._stopping:
+                        return
+                    else:
+                        self._cond.wait()
+            
+            try:
+                if not op["delete"]:
+                    self._write_or_rewrite_header(note_id, op["path"], op["title"], op["content"],
+                                                  op["category"], op["tags"], op["stale"])
+                    self._stats["written"] += 1
+                for path in op["stale"]:
+                    # 路径已被其他待写笔记占用时不能删除
+                    with self._cond:
+                        if path in self._reserved and path != op["path"]:
+                            continue
+                    self.delete_note_file(path)
+                    self._stats["deleted"] += 1
+            except Exception as e:
+                self._stats["failed"] += 1
+                print(f"写入笔记文件失败: {op.get('path')}: {e}")
+            finally:
+                with self._cond:
+                    if op["path"]:
+                        self._reserved.discard(op["path"])
+                    self._inflight -= 1
+                    self._cond.notify_all()
+    
     def _sanitize_title(self, raw_title: str) -> str:
         """规范化标题"""
         txt = (raw_title or "").strip()
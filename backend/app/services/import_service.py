@@ -0,0 +1,219 @@
+"""
+Markdown 批量导入服务
+"""
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from ..core import FileOperationError
+from ..core.compression import content_hash
+from ..note_markdown import parse_note_files
+from ..repositories.note_repository import note_repository
+from .file_service import file_service
+
+
+class ImportService:
+    """Markdown 批量导入服务类"""
+    
+    # 每个解析任务包含的文件数，以及每个工作进程最多排队的任务数
+    PARSE_CHUNK_SIZE = 64
+    PARSE_TASKS_PER_WORKER = 2
+    
+    def __init__(self):
+        self.repository = note_repository
+        self.file_service = file_service
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+    
+    def import_directory(self, root: str, batch_size: int = 500, workers: Optional[int] = None,
+                         progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """导入目录下的所有 Markdown 文件
+        
+        文件在进程池中并行读取解析（同时在途的解析任务有上限，结果不会整体堆积在内存中），
+        按 batch_size 分批在单个事务中写入数据库。
+        导入 notes 目录本身时直接引用原文件；导入外部目录时文件在该批写入数据库后保存到 notes 目录，
+        标题与正文都与已有笔记相同的文件视为已导入并跳过，重复导入同一目录不会产生副本。
+        """
+        root_path = Path(root).expanduser().resolve()
+        if not root_path.is_dir():
+            raise FileOperationError(f"导入目录不存在: {root}")
+        
+        notes_root = self.file_service.notes_dir.resolve()
+        in_notes_tree = root_path == notes_root or notes_root in root_path.parents
+        
+        report = self._new_report(str(root_path))
+        paths = [str(p) for p in sorted(root_path.rglob("*.md")) if p.is_file()]
+        report["total"] = len(paths)
+        self._notify(report, progress)
+        
+        batch: List[Dict[str, Any]] = []
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for parsed in self._parse_files(pool, paths, str(root_path), workers):
+                if "error" in parsed:
+                    report["processed"] += 1
+                    self._record_error(report, parsed["path"], parsed["error"])
+                else:
+                    batch.append(parsed)
+                if len(batch) >= batch_size:
+                    self._flush_batch(batch, report, notes_root, in_notes_tree)
+                    batch = []
+                    self._notify(report, progress)
+            
+            if batch:
+                self._flush_batch(batch, report, notes_root, in_notes_tree)
+        
+        report["status"] = "completed"
+        self._notify(report, progress)
+        return self._public(report)
+    
+    def _parse_files(self, pool: ProcessPoolExecutor, paths: List[str], root: str,
+                     workers: int) -> Iterator[Dict[str, Any]]:
+        """按原顺序产出解析结果，在途任务数不超过 workers * PARSE_TASKS_PER_WORKER"""
+        chunks = (paths[i:i + self.PARSE_CHUNK_SIZE] for i in range(0, len(paths), self.PARSE_CHUNK_SIZE))
+        inflight = deque()
+        for chunk in chunks:
+            inflight.append(pool.submit(parse_note_files, chunk, root))
+            if len(inflight) >= workers * self.PARSE_TASKS_PER_WORKER:
+                yield from inflight.popleft().result()
+        while inflight:
+            yield from inflight.popleft().result()
+    
+    def start_import(self, root: str, batch_size: int = 500) -> Dict[str, Any]:
+        """在后台线程中启动导入任务，返回任务进度"""
+        root_path = Path(root).expanduser()
+        if not root_path.is_dir():
+            raise FileOperationError(f"导入目录不存在: {root}")
+        
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._jobs[job_id] = {**self._public(self._new_report(str(root_path))), "job_id": job_id}
+        
+        def progress(report: Dict[str, Any]) -> None:
+            with self._lock:
+                self._jobs[job_id].update(report)
+        
+        def run() -> None:
+            try:
+                self.import_directory(str(root_path), batch_size, progress=progress)
+            except Exception as e:
+                with self._lock:
+                    self._jobs[job_id]["status"] = "failed"
+                    self._jobs[job_id]["errors"].append({"path": str(root_path), "error": str(e)})
+        
+        threading.Thread(target=run, name=f"note-import-{job_id[:8]}", daemon=True).start()
+        return self.get_job(job_id)
+    
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """获取导入任务进度"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job, errors=list(job["errors"])) if job else None
+    
+    def _flush_batch(self, batch: List[Dict[str, Any]], report: Dict[str, Any],
+                     notes_root: Path, in_notes_tree: bool) -> None:
+        """写入一批解析结果"""
+        existing = set()
+        if not in_notes_tree:
+            existing = self.repository.find_existing_contents(
+                list({content_hash(parsed["content"]) for parsed in batch})
+            )
+        
+        rows = []
+        duplicates = 0
+        for parsed in batch:
+            category = parsed["category"] or "未分类"
+            tags = parsed["tags"] or ["无标签"]
+            try:
+                if in_notes_tree:
+                    filename = Path(parsed["path"]).relative_to(notes_root).as_posix()
+                else:
+                    key = (parsed["title"], content_hash(parsed["content"]))
+                    if key in existing:
+                        duplicates += 1
+                        continue
+                    existing.add(key)
+                    # 先预留路径，文件在数据库写入成功后再保存，目录监视跳过预留中的路径
+                    filename = self.file_service.allocate_filename(parsed["title"], category)
+            except Exception as e:
+                self._record_error(report, parsed["path"], str(e))
+                continue
+            rows.append({
+                "title": parsed["title"],
+                "content": parsed["content"],
+                "category": category,
+                "tags": ",".join(tags),
+                "filename": filename,
+                "created_at_ts": parsed["created_at_ts"],
+                "_path": parsed["path"],
+                "_tags": tags
+            })
+        
+        try:
+            created = self.repository.bulk_create_notes(rows)
+            if in_notes_tree:
+                self.file_service.register_filenames([row["filename"] for row in rows])
+            else:
+                self._save_files(rows, created, report)
+        finally:
+            if not in_notes_tree:
+                for row in rows:
+                    self.file_service.release_filename(row["filename"])
+        report["processed"] += len(batch)
+        report["imported"] += len(created)
+        report["skipped"] += len(rows) - len(created) + duplicates
+        elapsed = time.monotonic() - report["_started"]
+        report["elapsed"] = round(elapsed, 2)
+        report["rate"] = round(report["processed"] / elapsed, 1) if elapsed > 0 else 0.0
+    
+    def _save_files(self, rows: List[Dict[str, Any]], created: List[int], report: Dict[str, Any]) -> None:
+        """保存已写入数据库的外部笔记文件（created 为本批新建的笔记ID）"""
+        created_ids = set(created)
+        notes = self.repository.get_notes_by_filenames([row["filename"] for row in rows]) if created else {}
+        for row in rows:
+            note = notes.get(row["filename"])
+            if not note or note["id"] not in created_ids:
+                continue
+            try:
+                self.file_service.write_note_file(
+                    row["filename"], row["title"], row["content"], row["category"], row["_tags"]
+                )
+            except Exception as e:
+                self._record_error(report, row["_path"], str(e))
+    
+    def _new_report(self, root: str) -> Dict[str, Any]:
+        return {
+            "root": root,
+            "status": "running",
+            "total": 0,
+            "processed": 0,
+            "imported": 0,
+            "skipped": 0,
+            "failed": 0,
+            "elapsed": 0.0,
+            "rate": 0.0,
+            "errors": [],
+            "_started": time.monotonic()
+        }
+    
+    def _record_error(self, report: Dict[str, Any], path: str, error: str) -> None:
+        report["failed"] += 1
+        # 只保留前若干条错误明细
+        if len(report["errors"]) < 100:
+            report["errors"].append({"path": path, "error": error})
+    
+    def _notify(self, report: Dict[str, Any], progress: Optional[Callable[[Dict[str, Any]], None]]) -> None:
+        if progress:
+            progress(self._public(report))
+    
+    def _public(self, report: Dict[str, Any]) -> Dict[str, Any]:
+        """去掉内部字段"""
+        return {k: v for k, v in report.items() if not k.startswith("_")}
+
+
+# 全局导入服务实例
+import_service = ImportService()
@@ -0,0 +1,256 @@
+"""
+本地分类器
+
+在 notes 表上训练的多项式朴素贝叶斯分类器（字符 n-gram 特征），在调用 AI 之前预测分类和标签：
+置信度达到阈值时直接采用，否则再请求 AI；未配置 AI 时也可用它代替默认分类。
+计数可加减，笔记增删改时增量更新；其他途径（导入、目录监视、批量分类）的修改由定期全量重训覆盖。
+"""
+import math
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+from ..config.settings import settings
+from ..repositories.note_repository import note_repository
+from .taxonomy_service import char_ngrams
+
+# 不参与训练的默认分类与标签
+IGNORED_CATEGORIES = ("", "未分类")
+IGNORED_TAGS = ("", "无标签", "未分类")
+
+# 朴素贝叶斯的独立性假设会让长文本的概率趋近 0 或 1，对数似然按最多这么多个有效观测缩放
+EVIDENCE_CAP = 30
+
+# 训练语料覆盖的 n-gram 比例达到该值即视为熟悉的内容，低于时按比例折减置信度
+FULL_COVERAGE = 0.5
+
+# 每篇笔记最多预测的标签数
+MAX_TAGS = 3
+
+
+class _LabelCounts:
+    """一组标签的 n-gram 计数（多项式朴素贝叶斯的充分统计量）"""
+    
+    def __init__(self):
+        self.docs: Counter = Counter()
+        self.grams: Dict[str, Counter] = {}
+        self.totals: Counter = Counter()
+        # 全部标签合计，用于补集（不属于某标签）的似然
+        self.all_grams: Counter = Counter()
+        self.all_total = 0
+        self.all_docs = 0
+    
+    def add(self, grams: Counter, labels: Iterable[str], sign: int = 1) -> None:
+        """加入（sign=1）或移除（sign=-1）一篇文档"""
+        size = sum(grams.values())
+        self.all_docs += sign
+        for g, c in grams.items():
+            self.all_grams[g] += sign * c
+            if self.all_grams[g] <= 0:
+                del self.all_grams[g]
+        self.all_total += sign * size
+        
+        for label in labels:
+            self.docs[label] += sign
+            counts = self.grams.setdefault(label, Counter())
+            for g, c in grams.items():
+                counts[g] += sign * c
+                if counts[g] <= 0:
+                    del counts[g]
+            self.totals[label] += sign * size
+            if self.docs[label] <= 0:
+                del self.docs[label], self.grams[label], self.totals[label]
+    
+    def log_likelihood(self, grams: Counter, size: int, label: str, complement: bool = False) -> float:
+        """文档在标签（或其补集）下的对数似然（拉普拉斯平滑，省略与标签无关的多项式系数）"""
+        counts = self.grams.get(label, {})
+        total = self.totals[label]
+        if complement:
+            total = self.all_total - total
+        # 未出现的 n-gram 平滑后计数为 1，对数为 0，只需累加出现过的
+        score = -size * math.log(total + len(self.all_grams) + 1)
+        for g, c in grams.items():
+            n = counts.get(g, 0)
+            if complement:
+                n = self.all_grams.get(g, 0) - n
+            if n:
+                score += c * math.log(n + 1)
+        return score
+
+
+class LocalClassifier:
+    """本地分类器类"""
+    
+    def __init__(self):
+        self.repository = note_repository
+        self._lock = threading.Lock()
+        self._categories = _LabelCounts()
+        self._tags = _LabelCounts()
+        # 分类 -> 该分类下各标签出现次数，用于限定候选标签
+        self._category_tags: Dict[str, Counter] = {}
+        self._trained_at: Optional[float] = None
+        self._training = False
+        self._stats = {"predictions": 0, "confident": 0, "notes": 0, "last_train_seconds": None}
+    
+    def predict(self, text: str) -> Optional[Dict[str, Any]]:
+        """预测分类和标签，返回 {"category", "tags", "confidence"}；模型未就绪或无可用分类时返回 None"""
+        if not settings.local_classifier_enabled:
+            return None
+        self._maybe_retrain()
+        
+        grams = self._features(text)
+        if not grams:
+            return None
+        
+        with self._lock:
+            categories = [c for c, n in self._categories.docs.items() if n >= settings.local_classifier_min_samples]
+            if not categories:
+                return None
+            size = sum(grams.values())
+            scale = min(1.0, EVIDENCE_CAP / size)
+            
+            # 分类：多类别后验
+            scores = {
+                c: math.log(self._categories.docs[c] / self._categories.all_docs)
+                + scale * self._categories.log_likelihood(grams, size, c)
+                for c in categories
+            }
+            posteriors = self._softmax(scores)
+            category = max(posteriors, key=posteriors.get)
+            confidence = posteriors[category]
+            
+            # 标签：只在该分类出现过的标签中，逐个做“有/无”二分类
+            tag_scores = []
+            total_docs = self._tags.all_docs
+            for tag in self._category_tags.get(category, {}):
+                docs = self._tags.docs.get(tag, 0)
+                if docs < settings.local_classifier_min_samples or docs >= total_docs:
+                    continue
+                log_odds = (
+                    math.log(docs / (total_docs - docs))
+                    + scale * (self._tags.log_likelihood(grams, size, tag)
+                               - self._tags.log_likelihood(grams, size, tag, complement=True))
+                )
+                tag_scores.append((1 / (1 + math.exp(-max(min(log_odds, 50), -50))), tag))
+            tag_scores.sort(reverse=True)
+            tags = [tag for p, tag in tag_scores[:MAX_TAGS] if p >= 0.5]
+            if not tags:
+                return None
+            
+            # 后验只在已知分类间比较，按训练语料覆盖的 n-gram 比例折减，避免陌生内容得到高置信度
+            coverage = sum(c for g, c in grams.items() if g in self._categories.all_grams) / size
+            confidence = min(confidence, tag_scores[0][0]) * min(1.0, coverage / FULL_COVERAGE)
+            self._stats["predictions"] += 1
+            if confidence >= settings.local_classifier_threshold:
+                self._stats["confident"] += 1
+        return {"category": category, "tags": tags, "confidence": round(confidence, 4)}
+    
+    def learn(self, text: str, category: str, tags: List[str]) -> None:
+        """加入一篇笔记（增量训练）"""
+        self._update(text, category, tags, 1)
+    
+    def forget(self, text: str, category: str, tags: List[str]) -> None:
+        """移除一篇笔记之前加入的计数"""
+        self._update(text, category, tags, -1)
+    
+    def train(self) -> None:
+        """从 notes 表全量重训，训练期间继续使用旧模型"""
+        started = time.monotonic()
+        categories = _LabelCounts()
+        tags = _LabelCounts()
+        category_tags: Dict[str, Counter] = {}
+        notes = 0
+        for note in self.repository.iter_notes_for_export():
+            category, tag_list = self._labels(note["category"], note["tags"].split(","))
+            if not category and not tag_list:
+                continue
+            grams = self._features(note["content"])
+            self._add(categories, tags, category_tags, grams, category, tag_list, 1)
+            notes += 1
+        
+        with self._lock:
+            self._categories = categories
+            self._tags = tags
+            self._category_tags = category_tags
+            self._trained_at = time.monotonic()
+            self._stats["notes"] = notes
+            self._stats["last_train_seconds"] = round(self._trained_at - started, 3)
+    
+    def start_training(self) -> None:
+        """在后台线程中全量重训（已有训练进行中时忽略）"""
+        with self._lock:
+            if self._training:
+                return
+            self._training = True
+        
+        def run() -> None:
+            try:
+                self.train()
+            except Exception as e:
+                print(f"本地分类器训练失败: {e}")
+            finally:
+                with self._lock:
+                    self._training = False
+        
+        threading.Thread(target=run, name="note-classifier-train", daemon=True).start()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """模型规模与预测统计"""
+        with self._lock:
+            return {
+                **self._stats,
+                "trained": self._trained_at is not None,
+                "training": self._training,
+                "categories": len(self._categories.docs),
+                "tags": len(self._tags.docs)
+            }
+    
+    def _maybe_retrain(self) -> None:
+        """超过重训间隔时在后台全量重训"""
+        trained_at = self._trained_at
+        if trained_at is None or time.monotonic() - trained_at >= settings.local_classifier_retrain_interval:
+            self.start_training()
+    
+    def _update(self, text: str, category: str, tags: List[str], sign: int) -> None:
+        category, tags = self._labels(category, tags)
+        if not category and not tags:
+            return
+        grams = self._features(text)
+        with self._lock:
+            self._add(self._categories, self._tags, self._category_tags, grams, category, tags, sign)
+    
+    def _add(self, categories: _LabelCounts, tags: _LabelCounts, category_tags: Dict[str, Counter],
+             grams: Counter, category: str, tag_list: List[str], sign: int) -> None:
+        if category:
+            categories.add(grams, [category], sign)
+        if tag_list:
+            tags.add(grams, tag_list, sign)
+        if category:
+            co = category_tags.setdefault(category, Counter())
+            for tag in tag_list:
+                co[tag] += sign
+                if co[tag] <= 0:
+                    del co[tag]
+            if not co:
+                del category_tags[category]
+    
+    def _labels(self, category: Optional[str], tags: Iterable[str]):
+        category = (category or "").strip()
+        if category in IGNORED_CATEGORIES:
+            category = ""
+        tag_list = list(dict.fromkeys(t.strip() for t in tags if t.strip() not in IGNORED_TAGS))
+        return category, tag_list
+    
+    def _features(self, text: str) -> Counter:
+        # 与 AI 分类使用相同长度的正文
+        return char_ngrams((text or "")[:1000])
+    
+    def _softmax(self, scores: Dict[str, float]) -> Dict[str, float]:
+        top = max(scores.values())
+        exps = {k: math.exp(v - top) for k, v in scores.items()}
+        total = sum(exps.values())
+        return {k: v / total for k, v in exps.items()}
+
+
+# 全局本地分类器实例
+local_classifier = LocalClassifier()
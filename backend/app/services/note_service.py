@@ -1,12 +1,20 @@
 """
 笔记业务服务
 """
-from typing import List, Optional, Dict, Any
-from ..schemas import NoteCreate, NoteUpdate, NoteResponse, NoteListResponse
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from ..config.settings import settings
+from ..schemas import NoteCreate, NoteUpdate, NoteResponse, NoteListResponse, NotePageResponse
 from ..repositories.note_repository import note_repository
 from ..services.file_service import file_service
-from ..services.ai_service import ai_service
-from ..core import NoteNotFoundError
+from ..services.ai_service import AIService, ai_client_cache
+from ..services.local_classifier import local_classifier
+from ..services.classify_service import PLACEHOLDER_CATEGORIES, PLACEHOLDER_TAGS
+from ..services.deferred_classify_service import deferred_classifier
+from ..core import (
+    NoteNotFoundError, AsyncProxy, BlockingExecutor, ReadPriorityGate, io_executor, db_read_executor,
+    db_write_executor, db_gate, ai_executor, encode_cursor, decode_cursor, parse_api_config
+)
+from ..core.compression import content_hash
 
 
 class NoteService:
@@ -15,48 +23,62 @@ class NoteService:
     def __init__(self):
         self.repository = note_repository
         self.file_service = file_service
-        self.ai_service = ai_service
+        self.ai_client_cache = ai_client_cache
     
-    def create_note(self, note_data: NoteCreate, request_cookies: Optional[Dict[str, str]] = None) -> NoteResponse:
-        """创建笔记"""
+    def create_note(self, note_data: NoteCreate, request_cookies: Optional[Dict[str, str]] = None,
+                    ai_result: Optional[Tuple[str, List[str]]] = None) -> NoteResponse:
+        """创建笔记
+        
+        ai_result 为已在 AI 线程池中得到的分类结果（见 AsyncNoteService），给出时不再调用 AI。
+        """
         # 尝试获取AI客户端进行自动分类
-        ai_client = None
-        if request_cookies and request_cookies.get("api_config"):
-            try:
-                url, key = request_cookies["api_config"].split("|", 1)
-                ai_client = self._get_ai_client(url.strip(), key.strip())
-            except Exception:
-                pass
+        ai_client = self._get_ai_client(request_cookies)
         
         # 处理分类和标签
         user_category = (note_data.category or '').strip()
         user_tags_list = self._parse_tags(note_data.tags or '')
         
+        classify_status = None
         if not user_category or not user_tags_list:
-            if ai_client:
+            if ai_client and settings.ai_deferred_classification:
+                # 延迟分类：本地分类器有把握时直接采用，否则先以默认值保存，由后台 AI 填写
+                result = self._predict_locally(note_data.content, settings.local_classifier_threshold)
+                if not result:
+                    result = ("未分类", ["无标签"])
+                    classify_status = "pending"
+            elif ai_client:
                 # 有AI客户端，进行自动分析
-                category, tags = self.ai_service.extract_category_and_tags(note_data.content)
-                if not user_category:
-                    user_category = category
-                if not user_tags_list:
-                    user_tags_list = tags
+                result = ai_result or ai_client.extract_category_and_tags(note_data.content)
             else:
-                # 没有AI客户端，使用默认值
-                if not user_category:
-                    user_category = "未分类"
-                if not user_tags_list:
-                    user_tags_list = ["无标签"]
+                # 没有AI客户端，使用本地分类器的预测，置信度不足时使用默认值
+                result = (self._predict_locally(note_data.content, settings.local_classifier_min_confidence)
+                          or ("未分类", ["无标签"]))
+            category, tags = result
+            if not user_category:
+                user_category = category
+            if not user_tags_list:
+                user_tags_list = tags
         
-        # 保存到文件
-        filename = self.file_service.save_note_to_file(
-            note_data.title, note_data.content, user_category, user_tags_list
-        )
+        # 分配文件路径
+        filename = self.file_service.allocate_filename(note_data.title, user_category)
         
         # 保存到数据库
-        note_id = self.repository.create_note(
-            note_data.title, note_data.content, user_category, 
-            ",".join(user_tags_list), filename
+        try:
+            note_id = self.repository.create_note(
+                note_data.title, note_data.content, user_category, 
+                ",".join(user_tags_list), filename, classify_status
+            )
+        except Exception:
+            self.file_service.release_filename(filename)
+            raise
+        
+        # 文件由后台写入
+        self.file_service.enqueue_write(
+            note_id, filename, note_data.title, note_data.content, user_category, user_tags_list
         )
+        local_classifier.learn(note_data.content, user_category, user_tags_list)
+        if classify_status == "pending":
+            deferred_classifier.enqueue(note_id, ai_client)
         
         # 将tags数组转换为字符串格式
         tags_str = ",".join(user_tags_list) if user_tags_list else ""
@@ -68,7 +90,8 @@ class NoteService:
             category=user_category,
             tags=tags_str,
             filename=filename,
-            created_at=None  # 数据库会自动设置
+            created_at=None,  # 数据库会自动设置
+            classification_status=classify_status
         )
     
     def get_note(self, note_id: int) -> NoteResponse:
@@ -88,29 +111,29 @@ class NoteService:
             category=note_data["category"],
             tags=tags_str,
             filename=note_data["filename"],
-            created_at=note_data["created_at"]
+            created_at=note_data["created_at"],
+            classification_status=note_data["classify_status"]
         )
     
     def update_note(self, note_id: int, note_data: NoteUpdate, 
-                   request_cookies: Optional[Dict[str, str]] = None) -> NoteResponse:
-        """更新笔记"""
+                   request_cookies: Optional[Dict[str, str]] = None,
+                   ai_result: Optional[Tuple[str, List[str]]] = None) -> NoteResponse:
+        """更新笔记
+        
+        ai_result 含义同 create_note，只在正文变化时使用。
+        """
         # 获取现有笔记
         existing_note = self.repository.get_note_by_id(note_id)
         if not existing_note:
             raise NoteNotFoundError(note_id)
         
-        # 尝试获取AI客户端
-        ai_client = None
-        if request_cookies and request_cookies.get("api_config"):
-            try:
-                url, key = request_cookies["api_config"].split("|", 1)
-                ai_client = self._get_ai_client(url.strip(), key.strip())
-            except Exception:
-                pass
-        
         # 确定新值
         new_title = note_data.title if note_data.title is not None else existing_note["title"]
         new_content = note_data.content if note_data.content is not None else existing_note["content"]
+        content_changed = content_hash(new_content) != existing_note["content_hash"]
+        
+        # 正文变化时才尝试获取AI客户端
+        ai_client = self._get_ai_client(request_cookies) if content_changed else None
         
         # 处理分类和标签
         user_category = (note_data.category or '').strip()
@@ -119,34 +142,67 @@ class NoteService:
         if not user_category or not user_tags_list:
             if ai_client:
                 # 有AI客户端，进行自动分析
-                category, tags_list = self.ai_service.extract_category_and_tags(new_content)
+                category, tags_list = ai_result or ai_client.extract_category_and_tags(new_content)
                 if not user_category:
                     user_category = category
                 if not user_tags_list:
                     user_tags_list = tags_list
             else:
-                # 没有AI客户端，保持原有分类和标签
+                # 没有AI客户端或正文未变化，保持原有分类和标签
                 if not user_category:
                     user_category = existing_note["category"]
                 if not user_tags_list:
                     user_tags_list = self._parse_tags(existing_note["tags"])
         
-        # 更新文件
-        new_rel_path = self.file_service.update_note_file(
-            existing_note["filename"], new_title, new_content, user_category, user_tags_list
-        )
+        # 将tags数组转换为字符串格式
+        tags_str = ",".join(user_tags_list) if user_tags_list else ""
         
-        # 更新数据库
-        success = self.repository.update_note(
-            note_id, new_title, new_content, user_category, 
-            ",".join(user_tags_list), new_rel_path
-        )
+        # 未经 AI 分析且分类或标签仍是默认值时保留后台分类状态（pending/failed），否则清除
+        classify_status = None
+        if not ai_client and (user_category in PLACEHOLDER_CATEGORIES or tags_str in PLACEHOLDER_TAGS):
+            classify_status = existing_note["classify_status"]
         
-        if not success:
-            raise NoteNotFoundError(note_id)
+        metadata_changed = (
+            new_title != existing_note["title"]
+            or user_category != existing_note["category"]
+            or user_tags_list != self._parse_tags(existing_note["tags"])
+        )
         
-        # 将tags数组转换为字符串格式
-        tags_str = ",".join(user_tags_list) if user_tags_list else ""
+        new_rel_path = existing_note["filename"]
+        if content_changed or metadata_changed:
+            # 分配文件路径（标题和分类未变时沿用原路径）
+            new_rel_path = self.file_service.allocate_filename(
+                new_title, user_category, current=existing_note["filename"]
+            )
+            
+            # 更新数据库，正文未变化时不重写正文
+            try:
+                if content_changed:
+                    success = self.repository.update_note(
+                        note_id, new_title, new_content, user_category, tags_str, new_rel_path, classify_status
+                    )
+                else:
+                    success = self.repository.update_note_metadata(
+                        note_id, new_title, user_category, tags_str, new_rel_path, classify_status
+                    )
+            except Exception:
+                self.file_service.release_filename(new_rel_path)
+                raise
+            
+            if not success:
+                self.file_service.release_filename(new_rel_path)
+                raise NoteNotFoundError(note_id)
+            
+            # 文件由后台写入，路径变化时删除旧文件；正文未变化时只重写头部
+            self.file_service.enqueue_write(
+                note_id, new_rel_path, new_title, new_content if content_changed else None,
+                user_category, user_tags_list, previous_path=existing_note["filename"]
+            )
+            
+            local_classifier.forget(
+                existing_note["content"], existing_note["category"], self._parse_tags(existing_note["tags"])
+            )
+            local_classifier.learn(new_content, user_category, user_tags_list)
         
         return NoteResponse(
             id=note_id,
@@ -155,7 +211,9 @@ class NoteService:
             category=user_category,
             tags=tags_str,
             filename=new_rel_path,
-            created_at=existing_note["created_at"]
+            created_at=existing_note["created_at"],
+            classification_status=classify_status if content_changed or metadata_changed
+            else existing_note["classify_status"]
         )
     
     def delete_note(self, note_id: int) -> bool:
@@ -170,59 +228,67 @@ class NoteService:
         if not success:
             return False
         
-        # 删除文件
-        self.file_service.delete_note_file(note_data["filename"])
+        # 删除文件（与尚未写入的修改合并）
+        self.file_service.enqueue_delete(note_id, note_data["filename"])
+        local_classifier.forget(note_data["content"], note_data["category"], self._parse_tags(note_data["tags"]))
         
         return True
     
-    def get_all_notes(self) -> List[NoteListResponse]:
-        """获取所有笔记列表"""
-        notes = self.repository.get_all_notes()
-        return [
-            NoteListResponse(
-                id=note["id"],
-                title=note["title"],
-                category=note["category"],
-                tags=note["tags"],
-                filename=note["filename"],
-                created_at=note["created_at"]
-            )
-            for note in notes
-        ]
+    def get_all_notes(self, limit: Optional[int] = None,
+                      cursor: Optional[str] = None) -> Union[List[NoteListResponse], NotePageResponse]:
+        """获取所有笔记列表
+        
+        未指定 limit 与 cursor 时返回完整列表（兼容旧接口），否则返回分页结果。
+        """
+        if limit is None and cursor is None:
+            return self._to_list_responses(self.repository.get_all_notes())
+        return self._paginate(self.repository.get_all_notes, limit, cursor)
     
-    def search_notes(self, query: str) -> List[NoteListResponse]:
+    def search_notes(self, query: str, order_by: str = "created_at", limit: Optional[int] = None,
+                     cursor: Optional[str] = None) -> Union[List[NoteListResponse], NotePageResponse]:
         """搜索笔记"""
-        notes = self.repository.search_notes(query)
-        return [
-            NoteListResponse(
-                id=note["id"],
-                title=note["title"],
-                category=note["category"],
-                tags=note["tags"],
-                filename=note["filename"],
-                created_at=note["created_at"]
-            )
-            for note in notes
-        ]
+        if limit is None and cursor is None:
+            return self._to_list_responses(self.repository.search_notes(query, order_by))
+        if order_by == "relevance":
+            return self._paginate(self.repository.search_notes, limit, cursor,
+                                  order="relevance", key_fields=("rank", "id"),
+                                  query=query, order_by=order_by)
+        return self._paginate(self.repository.search_notes, limit, cursor,
+                              query=query, order_by=order_by)
     
-    def get_notes_by_category(self, category: str) -> List[NoteListResponse]:
+    def get_notes_by_category(self, category: str, limit: Optional[int] = None,
+                              cursor: Optional[str] = None) -> Union[List[NoteListResponse], NotePageResponse]:
         """根据分类获取笔记"""
-        notes = self.repository.get_notes_by_category(category)
-        return [
-            NoteListResponse(
-                id=note["id"],
-                title=note["title"],
-                category=note["category"],
-                tags=note["tags"],
-                filename=note["filename"],
-                created_at=note["created_at"]
-            )
-            for note in notes
-        ]
+        if limit is None and cursor is None:
+            return self._to_list_responses(self.repository.get_notes_by_category(category))
+        return self._paginate(self.repository.get_notes_by_category, limit, cursor, category=category)
     
-    def get_notes_by_tag(self, tag: str) -> List[NoteListResponse]:
+    def get_notes_by_tag(self, tag: str, limit: Optional[int] = None,
+                         cursor: Optional[str] = None) -> Union[List[NoteListResponse], NotePageResponse]:
         """根据标签获取笔记"""
-        notes = self.repository.get_notes_by_tag(tag)
+        if limit is None and cursor is None:
+            return self._to_list_responses(self.repository.get_notes_by_tag(tag))
+        return self._paginate(self.repository.get_notes_by_tag, limit, cursor, tag=tag)
+    
+    def _paginate(self, fetch: Callable[..., List[Dict[str, Any]]], limit: Optional[int],
+                  cursor: Optional[str], order: str = "created_at",
+                  key_fields: Tuple[str, str] = ("created_at_ts", "id"), **kwargs: Any) -> NotePageResponse:
+        """按键集分页获取一页笔记，多取一条用于判断是否还有下一页"""
+        page_size = min(limit or settings.default_page_size, settings.max_page_size)
+        after = decode_cursor(cursor, order) if cursor else None
+        
+        rows = fetch(limit=page_size + 1, after=after, **kwargs)
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        
+        next_cursor = None
+        if has_more and rows:
+            next_cursor = encode_cursor(order, [rows[-1][field] for field in key_fields])
+        
+        return NotePageResponse(items=self._to_list_responses(rows), next_cursor=next_cursor)
+    
+    def _to_list_responses(self, notes: List[Dict[str, Any]]) -> List[NoteListResponse]:
+        """将仓库查询结果转换为列表响应"""
         return [
             NoteListResponse(
                 id=note["id"],
@@ -237,18 +303,59 @@ class NoteService:
     
     def get_stats(self) -> Dict[str, Any]:
         """获取统计数据"""
-        categories = self.repository.get_categories_stats()
-        tags = self.repository.get_tags_stats()
-        
-        # 排序并限制数量
-        categories.sort(key=lambda x: x["count"], reverse=True)
-        tags.sort(key=lambda x: x["count"], reverse=True)
+        # 统计表已按数量倒序索引，直接取前 N 项
+        return {
+            "categories": self.repository.get_categories_stats(limit=100),
+            "tags": self.repository.get_tags_stats(limit=200)
+        }
+    
+    def needs_ai_classification(self, note_data: Union[NoteCreate, NoteUpdate],
+                                request_cookies: Optional[Dict[str, str]] = None,
+                                note_id: Optional[int] = None) -> bool:
+        """保存前是否需要同步调用 AI 分析分类和标签
         
+        未填写分类或标签、已配置 AI 且未启用延迟分类时需要；更新时还要求正文有变化。
+        """
+        if (note_data.category or '').strip() and self._parse_tags(note_data.tags or ''):
+            return False
+        if note_id is None:
+            if settings.ai_deferred_classification:
+                return False
+        else:
+            existing_note = self.repository.get_note_by_id(note_id)
+            if (not existing_note or note_data.content is None
+                    or content_hash(note_data.content) == existing_note["content_hash"]):
+                return False
+        return self._get_ai_client(request_cookies) is not None
+    
+    def classify_with_ai(self, content: str,
+                         request_cookies: Optional[Dict[str, str]] = None) -> Optional[Tuple[str, List[str]]]:
+        """调用 AI 提取分类和标签，未配置 AI 时返回 None"""
+        ai_client = self._get_ai_client(request_cookies)
+        if not ai_client:
+            return None
+        return ai_client.extract_category_and_tags(content)
+    
+    def get_classification_status(self, note_id: int) -> Dict[str, Any]:
+        """获取笔记的后台分类状态"""
+        note_data = self.repository.get_note_by_id(note_id)
+        if not note_data:
+            raise NoteNotFoundError(note_id)
         return {
-            "categories": categories[:100],
-            "tags": tags[:200]
+            "id": note_id,
+            "status": note_data["classify_status"] or "done",
+            "category": note_data["category"],
+            "tags": ",".join(self._parse_tags(note_data["tags"]))
         }
     
+    def get_deferred_classification_status(self) -> Dict[str, Any]:
+        """获取后台分类队列状态"""
+        return deferred_classifier.get_status()
+    
+    def get_file_queue_status(self) -> Dict[str, Any]:
+        """获取笔记文件后写队列状态"""
+        return self.file_service.get_queue_status()
+    
     def get_categories(self) -> List[str]:
         """获取分类列表"""
         return self.repository.get_categories_list()
@@ -275,15 +382,76 @@ class NoteService:
         
         return [t.strip() for t in txt.split(',') if t.strip()]
     
-    def _get_ai_client(self, api_url: str, api_key: str):
-        """获取AI客户端"""
+    def _predict_locally(self, content: str, min_confidence: float) -> Optional[Tuple[str, List[str]]]:
+        """用本地分类器预测分类和标签，置信度低于 min_confidence 时返回 None"""
+        try:
+            prediction = local_classifier.predict(content)
+        except Exception as e:
+            print(f"本地分类失败: {e}")
+            return None
+        if prediction and prediction["confidence"] >= min_confidence:
+            return prediction["category"], prediction["tags"]
+        return None
+    
+    def _get_ai_client(self, request_cookies: Optional[Dict[str, str]]) -> Optional[AIService]:
+        """按请求 Cookie 中的 API 配置获取AI服务，未配置或创建失败时返回 None"""
+        config = parse_api_config((request_cookies or {}).get("api_config"))
+        if not config:
+            return None
         try:
-            # 初始化AI服务客户端
-            self.ai_service.initialize_client(api_url, api_key, "Qwen3-Next-80B-A3B-Instruct")
-            return self.ai_service
+            return self.ai_client_cache.get(*config)
         except Exception:
             return None
 
 
+class AsyncNoteService(AsyncProxy):
+    """异步笔记服务
+    
+    只读方法在只读查询线程池中执行；创建、更新、删除在单线程写入线程池中串行执行，
+    并在开始前经读写闸门让开进行中的读查询；其他方法在数据库/文件线程池中执行。
+    创建、更新时耗时的 AI 分析改在 AI 线程池中进行，不占用读写线程。
+    """
+    
+    READ_METHODS = frozenset({
+        "get_note", "get_all_notes", "search_notes", "get_notes_by_category", "get_notes_by_tag",
+        "get_stats", "get_classification_status", "get_deferred_classification_status",
+        "get_file_queue_status", "get_categories", "get_tags"
+    })
+    WRITE_METHODS = frozenset({"create_note", "update_note", "delete_note"})
+    
+    def __init__(self, target: Any, executor: BlockingExecutor, read_executor: BlockingExecutor,
+                 write_executor: BlockingExecutor, gate: ReadPriorityGate):
+        super().__init__(target, executor)
+        self._read_executor = read_executor
+        self._write_executor = write_executor
+        self._gate = gate
+    
+    def _bind(self, name: str, func: Callable[..., Any]) -> Tuple[BlockingExecutor, Callable[..., Any]]:
+        if name in self.READ_METHODS:
+            return self._read_executor, self._gate.read(func)
+        if name in self.WRITE_METHODS:
+            return self._write_executor, self._gate.write(func)
+        return self._executor, func
+    
+    async def create_note(self, note_data: NoteCreate,
+                          request_cookies: Optional[Dict[str, str]] = None) -> NoteResponse:
+        ai_result = None
+        if await self._executor.run(self._target.needs_ai_classification, note_data, request_cookies):
+            ai_result = await ai_executor.run(self._target.classify_with_ai, note_data.content, request_cookies)
+        executor, create = self._bind("create_note", self._target.create_note)
+        return await executor.run(create, note_data, request_cookies, ai_result)
+    
+    async def update_note(self, note_id: int, note_data: NoteUpdate,
+                          request_cookies: Optional[Dict[str, str]] = None) -> NoteResponse:
+        ai_result = None
+        if await self._executor.run(self._target.needs_ai_classification, note_data, request_cookies, note_id):
+            ai_result = await ai_executor.run(self._target.classify_with_ai, note_data.content, request_cookies)
+        executor, update = self._bind("update_note", self._target.update_note)
+        return await executor.run(update, note_id, note_data, request_cookies, ai_result)
+
+
 # 全局笔记服务实例
 note_service = NoteService()
+
+# 异步笔记服务：方法在专用线程池中执行，供异步路由使用
+async_note_service = AsyncNoteService(note_service, io_executor, db_read_executor, db_write_executor, db_gate)
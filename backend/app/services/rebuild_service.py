@@ -0,0 +1,229 @@
+"""
+数据库与笔记文件目录的双向重建服务
+
+- 文件 -> 数据库：在进程池中并行解析 notes 目录，按批写入数据库并更新目录快照
+- 数据库 -> 文件：按 id 分块读取笔记，由多个写线程并行原子写出 Markdown 文件
+
+两种模式都在 data 目录下保存断点文件，中断后使用 resume 可从上次提交的批次继续。
+"""
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from ..config.settings import settings
+from ..core import FileOperationError
+from ..note_markdown import parse_note_file
+from ..repositories.note_repository import note_repository
+from .file_service import file_service
+from .watch_service import notes_watcher
+
+ProgressCallback = Optional[Callable[[Dict[str, Any]], None]]
+
+
+class RebuildService:
+    """重建服务类"""
+    
+    def __init__(self):
+        self.repository = note_repository
+        self.file_service = file_service
+        self.watcher = notes_watcher
+    
+    def rebuild_database(self, batch_size: int = 500, workers: Optional[int] = None, resume: bool = False,
+                         prune: bool = False, progress: ProgressCallback = None) -> Dict[str, Any]:
+        """由 notes 目录重建数据库：新增文件建笔记，有变化的文件更新笔记
+        
+        prune 为 True 时删除文件已不存在的笔记。断点记录最后提交的文件路径（按路径排序）。
+        """
+        if not self.file_service.notes_dir.is_dir():
+            raise FileOperationError(f"notes 目录不存在: {self.file_service.notes_dir}")
+        
+        checkpoint = self._load_checkpoint("database") if resume else None
+        current = self.watcher.stat_tree()
+        paths = sorted(current)
+        report = self._new_report("database", len(paths))
+        
+        if checkpoint:
+            done = [p for p in paths if p <= checkpoint["position"]]
+            paths = paths[len(done):]
+            report["processed"] = len(done)
+            report["resumed_from"] = checkpoint["position"]
+        self._notify(report, progress)
+        
+        root = str(self.file_service.notes_dir)
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            for start in range(0, len(paths), batch_size):
+                batch = paths[start:start + batch_size]
+                parsed_items = []
+                abs_paths = [str(Path(root) / p) for p in batch]
+                for path, parsed in zip(batch, pool.map(parse_note_file, abs_paths, [root] * len(batch),
+                                                         chunksize=32)):
+                    if "error" in parsed:
+                        self._record_error(report, path, parsed["error"])
+                    else:
+                        parsed_items.append(dict(parsed, filename=path))
+                
+                created, updated, conflicts = self.watcher.sync_parsed(
+                    parsed_items, [(p, *current[p]) for p in batch]
+                )
+                report["created"] += created
+                report["updated"] += updated
+                report["conflicts"] += conflicts
+                report["processed"] += len(batch)
+                self._save_checkpoint("database", batch[-1], report)
+                self._notify(report, progress)
+        
+        if prune:
+            missing = [(note_id, filename) for note_id, filename in self.repository.get_note_filenames()
+                       if filename and filename not in current]
+            for start in range(0, len(missing), batch_size):
+                chunk = missing[start:start + batch_size]
+                removed = [filename for _, filename in chunk if filename]
+                self.repository.apply_file_sync([], [], [note_id for note_id, _ in chunk], [], removed)
+                self.file_service.forget_filenames(removed)
+                report["deleted"] += len(chunk)
+        
+        return self._finish("database", report, progress)
+    
+    def rebuild_files(self, batch_size: int = 500, workers: Optional[int] = None, resume: bool = False,
+                      prune: bool = False, progress: ProgressCallback = None) -> Dict[str, Any]:
+        """由数据库重建 notes 目录：按数据库内容重写每条笔记的文件
+        
+        没有文件路径的笔记会分配新路径并写回数据库。prune 为 True 时删除数据库中
+        没有对应笔记的 Markdown 文件。断点记录最后写完的笔记ID。
+        """
+        checkpoint = self._load_checkpoint("files") if resume else None
+        after_id = int(checkpoint["position"]) if checkpoint else 0
+        report = self._new_report("files", self.repository.count_notes())
+        if checkpoint:
+            report["processed"] = self.repository.count_notes(max_id=after_id)
+            report["resumed_from"] = after_id
+        self._notify(report, progress)
+        
+        batch: List[Dict[str, Any]] = []
+        with ThreadPoolExecutor(max_workers=workers or min(32, (os.cpu_count() or 1) * 4)) as pool:
+            for note in self.repository.iter_notes_for_export(after_id=after_id, chunk_size=batch_size):
+                batch.append(note)
+                if len(batch) >= batch_size:
+                    self._write_batch(batch, pool, report, progress)
+                    batch = []
+            if batch:
+                self._write_batch(batch, pool, report, progress)
+        
+        if prune:
+            referenced = {filename for _, filename in self.repository.get_note_filenames()}
+            for path in self.watcher.stat_tree():
+                if path not in referenced and not self.file_service.is_reserved(path):
+                    self.file_service.delete_note_file(path)
+                    report["deleted"] += 1
+        
+        return self._finish("files", report, progress)
+    
+    def _write_batch(self, batch: List[Dict[str, Any]], pool: ThreadPoolExecutor,
+                     report: Dict[str, Any], progress: ProgressCallback) -> None:
+        """并行写出一批笔记文件，全部完成后再推进断点"""
+        for note in batch:
+            if not note["filename"]:
+                note["filename"] = self.file_service.allocate_filename(note["title"], note["category"])
+                self.repository.set_note_filename(note["id"], note["filename"])
+        
+        def write(note: Dict[str, Any]) -> Optional[str]:
+            try:
+                tags = [t.strip() for t in (note["tags"] or "").split(",") if t.strip()]
+                self.file_service.write_note_file(
+                    note["filename"], note["title"], note["content"], note["category"], tags
+                )
+                return None
+            except Exception as e:
+                return str(e)
+            finally:
+                self.file_service.release_filename(note["filename"])
+        
+        snapshots = []
+        for note, error in zip(batch, pool.map(write, batch)):
+            if error:
+                self._record_error(report, note["filename"], error)
+                continue
+            report["written"] += 1
+            st = (self.file_service.notes_dir / note["filename"]).stat()
+            snapshots.append((note["filename"], st.st_mtime_ns, st.st_size))
+        # 同步更新目录快照，目录监视不必重新解析刚写出的文件
+        self.repository.apply_file_sync([], [], [], snapshots, [])
+        report["processed"] += len(batch)
+        self._save_checkpoint("files", str(batch[-1]["id"]), report)
+        self._notify(report, progress)
+    
+    def _checkpoint_path(self, mode: str) -> Path:
+        return settings.data_dir / f"rebuild-{mode}.checkpoint.json"
+    
+    def _load_checkpoint(self, mode: str) -> Optional[Dict[str, Any]]:
+        path = self._checkpoint_path(mode)
+        if not path.exists():
+            return None
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+    
+    def _save_checkpoint(self, mode: str, position: str, report: Dict[str, Any]) -> None:
+        """先写临时文件再替换，中断时断点文件不会损坏"""
+        path = self._checkpoint_path(mode)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(
+            json.dumps({"mode": mode, "position": position, "processed": report["processed"],
+                        "saved_at": int(time.time() * 1000)}),
+            encoding="utf-8"
+        )
+        os.replace(tmp_path, path)
+    
+    def _finish(self, mode: str, report: Dict[str, Any], progress: ProgressCallback) -> Dict[str, Any]:
+        self._checkpoint_path(mode).unlink(missing_ok=True)
+        report["status"] = "completed"
+        self._notify(report, progress)
+        return self._public(report)
+    
+    def _new_report(self, mode: str, total: int) -> Dict[str, Any]:
+        return {
+            "mode": mode,
+            "status": "running",
+            "total": total,
+            "processed": 0,
+            "created": 0,
+            "updated": 0,
+            "conflicts": 0,
+            "written": 0,
+            "deleted": 0,
+            "failed": 0,
+            "elapsed": 0.0,
+            "rate": 0.0,
+            "resumed_from": None,
+            "errors": [],
+            "_started": time.monotonic(),
+            "_start_processed": None
+        }
+    
+    def _record_error(self, report: Dict[str, Any], path: str, error: str) -> None:
+        report["failed"] += 1
+        # 只保留前若干条错误明细
+        if len(report["errors"]) < 100:
+            report["errors"].append({"path": path, "error": error})
+    
+    def _notify(self, report: Dict[str, Any], progress: ProgressCallback) -> None:
+        """更新耗时与吞吐（只统计本次运行处理的数量，不含断点之前的部分）"""
+        if report["_start_processed"] is None:
+            report["_start_processed"] = report["processed"]
+        elapsed = time.monotonic() - report["_started"]
+        report["elapsed"] = round(elapsed, 2)
+        done = report["processed"] - report["_start_processed"]
+        report["rate"] = round(done / elapsed, 1) if elapsed > 0 else 0.0
+        if progress:
+            progress(self._public(report))
+    
+    def _public(self, report: Dict[str, Any]) -> Dict[str, Any]:
+        """去掉内部字段"""
+        return {k: v for k, v in report.items() if not k.startswith("_")}
+
+
+# 全局重建服务实例
+rebuild_service = RebuildService()
@@ -0,0 +1,149 @@
+"""
+分类体系候选检索
+
+按字符 n-gram TF-IDF 相似度，从现有分类和标签中为笔记挑出最相关的前 K 个，
+代替在 AI 提示词中罗列全部分类和标签。每个分类/标签的文档由名称与最近若干篇笔记标题组成，
+分类或标签数量变化、或超过刷新间隔后重建索引。
+"""
+import math
+import re
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from ..config.settings import settings
+from ..repositories.note_repository import note_repository
+
+_SEPARATORS = re.compile(r"[\W_]+")
+_CJK = re.compile(r"[\u2e80-\u9fff\uac00-\ud7af\uf900-\ufaff\uff00-\uffef]")
+
+# 名称相似度在得分中的占比，其余来自最近笔记标题
+NAME_SHARE = 0.7
+
+
+def char_ngrams(text: str, sizes: Tuple[int, ...] = (2, 3)) -> Counter:
+    """文本的字符 n-gram 计数（忽略大小写，按标点和空白切分后取 n-gram）"""
+    grams: Counter = Counter()
+    for word in _SEPARATORS.split(text.lower()):
+        if not word:
+            continue
+        if len(word) < sizes[0]:
+            grams[word] += 1
+            continue
+        for n in sizes:
+            for i in range(len(word) - n + 1):
+                grams[word[i:i + n]] += 1
+    return grams
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token 数：中日韩字符各计 1 个，其余字符约 4 个计 1 个"""
+    cjk = len(_CJK.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+class _LabelIndex:
+    """一组标签（分类或标签）的 TF-IDF 倒排索引，构建后只读"""
+    
+    def __init__(self, names: List[str], titles: Dict[str, List[str]]):
+        # names 按笔记数量倒序，相似度相同或不足 K 个时按此顺序补齐
+        self.names = names
+        self.list_tokens = estimate_tokens(", ".join(names))
+        
+        documents = []
+        df: Counter = Counter()
+        for name in names:
+            name_grams = char_ngrams(name)
+            title_grams: Counter = Counter()
+            for title in titles.get(name, ()):
+                title_grams.update(char_ngrams(title))
+            documents.append((name_grams, title_grams))
+            df.update(set(name_grams) | set(title_grams))
+        
+        total = len(names)
+        self.idf = {g: math.log((1 + total) / (1 + n)) + 1 for g, n in df.items()}
+        self.postings: Dict[str, List[Tuple[int, float]]] = {}
+        for i, (name_grams, title_grams) in enumerate(documents):
+            # 名称与标题分别归一化，避免样本多的标签被标题稀释
+            weights: Dict[str, float] = {}
+            for grams, share in ((name_grams, NAME_SHARE), (title_grams, 1 - NAME_SHARE)):
+                vector = {g: (1 + math.log(c)) * self.idf[g] for g, c in grams.items()}
+                norm = math.sqrt(sum(w * w for w in vector.values())) or 1.0
+                for g, w in vector.items():
+                    weights[g] = weights.get(g, 0.0) + share * w / norm
+            for g, w in weights.items():
+                self.postings.setdefault(g, []).append((i, w))
+    
+    def top(self, query: Counter, k: int) -> List[str]:
+        """与查询最相似的前 k 个名称，k <= 0 时返回全部"""
+        if k <= 0 or k >= len(self.names):
+            return list(self.names)
+        
+        scores: Dict[int, float] = {}
+        for g, c in query.items():
+            postings = self.postings.get(g)
+            if not postings:
+                continue
+            q = (1 + math.log(c)) * self.idf[g]
+            for i, w in postings:
+                scores[i] = scores.get(i, 0.0) + q * w
+        
+        ranked = sorted(scores, key=lambda i: (-scores[i], i))[:k]
+        if len(ranked) < k:
+            chosen = set(ranked)
+            ranked.extend(i for i in range(len(self.names)) if i not in chosen)
+            ranked = ranked[:k]
+        return [self.names[i] for i in ranked]
+
+
+class TaxonomyIndex:
+    """现有分类/标签的相关性检索"""
+    
+    def __init__(self):
+        self.repository = note_repository
+        self._lock = threading.Lock()
+        self._categories: Optional[_LabelIndex] = None
+        self._tags: Optional[_LabelIndex] = None
+        self._signature: Optional[Tuple[int, int]] = None
+        self._built_at = 0.0
+    
+    def select(self, text: str, top_categories: Optional[int] = None,
+               top_tags: Optional[int] = None) -> Dict[str, object]:
+        """为文本挑选候选分类和标签
+        
+        返回 categories/tags 以及全部与候选列表的估算 token 数（full_tokens/selected_tokens）。
+        """
+        categories, tags = self._current()
+        query = char_ngrams(text)
+        selected_categories = categories.top(
+            query, settings.ai_prompt_top_categories if top_categories is None else top_categories
+        )
+        selected_tags = tags.top(query, settings.ai_prompt_top_tags if top_tags is None else top_tags)
+        return {
+            "categories": selected_categories,
+            "tags": selected_tags,
+            "total_categories": len(categories.names),
+            "total_tags": len(tags.names),
+            "full_tokens": categories.list_tokens + tags.list_tokens,
+            "selected_tokens": estimate_tokens(", ".join(selected_categories))
+                               + estimate_tokens(", ".join(selected_tags))
+        }
+    
+    def _current(self) -> Tuple[_LabelIndex, _LabelIndex]:
+        signature = self.repository.get_taxonomy_signature()
+        with self._lock:
+            fresh = (
+                self._signature == signature
+                and time.monotonic() - self._built_at < settings.ai_taxonomy_refresh
+            )
+            if not fresh:
+                category_titles, tag_titles = self.repository.get_taxonomy_samples(settings.ai_taxonomy_samples)
+                self._categories = _LabelIndex(self.repository.get_categories_list(), category_titles)
+                self._tags = _LabelIndex(self.repository.get_tags_list(), tag_titles)
+                self._signature = signature
+                self._built_at = time.monotonic()
+            return self._categories, self._tags
+
+
+# 全局分类体系索引实例
+taxonomy_index = TaxonomyIndex()
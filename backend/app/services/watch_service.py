@@ -0,0 +1,243 @@
+"""
+notes 目录监视服务
+
+按 mtime/size 快照轮询 notes 目录，只重新解析发生变化的文件，
+把编辑器中直接修改的笔记分批同步到数据库（全文索引由触发器同步更新）。
+快照保存在 file_snapshots 表中，重启后的首次扫描只需 stat，不必重读全部文件。
+"""
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from ..config.settings import settings
+from ..core.compression import content_hash
+from ..note_markdown import parse_note_file
+from ..repositories.note_repository import note_repository
+from .file_service import file_service
+
+
+class NotesWatcher:
+    """notes 目录监视服务类"""
+    
+    def __init__(self):
+        self.repository = note_repository
+        self.file_service = file_service
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._scan_lock = threading.Lock()
+        self._stats = {
+            "scans": 0,
+            "created": 0,
+            "updated": 0,
+            "deleted": 0,
+            "failed": 0,
+            "conflicts": 0,
+            "skipped_deletes": 0,
+            "last_scan_at": None,
+            "last_scan_seconds": None
+        }
+    
+    def start(self) -> None:
+        """启动后台监视线程（先做一次启动扫描）"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="notes-watcher", daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """停止后台监视线程"""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+    
+    def status(self) -> Dict[str, Any]:
+        """监视状态与累计同步数量"""
+        return {
+            "enabled": settings.notes_watch,
+            "running": bool(self._thread and self._thread.is_alive()),
+            **self._stats
+        }
+    
+    def scan(self) -> Dict[str, int]:
+        """扫描一次 notes 目录，把变化同步到数据库，返回本次新建/更新/删除数量
+        
+        notes 目录不存在时不做任何同步；疑似目录被卸载或替换时跳过删除，见 _guard_removed。
+        """
+        with self._scan_lock:
+            started = time.monotonic()
+            result = {"created": 0, "updated": 0, "deleted": 0, "failed": 0, "conflicts": 0, "skipped_deletes": 0}
+            
+            if not self.file_service.notes_dir.is_dir():
+                print(f"notes 目录不存在或不可访问，跳过同步: {self.file_service.notes_dir}")
+                return result
+            
+            snapshots = self.repository.get_file_snapshots()
+            current = self.stat_tree()
+            
+            # 已分配但尚未写完的路径内容落后于数据库，留到下一轮再比较
+            changed = [
+                path for path, signature in current.items()
+                if snapshots.get(path) != signature and not self.file_service.is_reserved(path)
+            ]
+            removed = [
+                path for path in snapshots
+                if path not in current and not self.file_service.is_reserved(path)
+            ]
+            if not self._guard_removed(removed, current):
+                result["skipped_deletes"] = len(removed)
+                removed = []
+            
+            batch_size = max(1, settings.notes_watch_batch_size)
+            for start in range(0, len(changed), batch_size):
+                self._sync_changed(changed[start:start + batch_size], current, result)
+            for start in range(0, len(removed), batch_size):
+                self._sync_removed(removed[start:start + batch_size], result)
+            
+            for key, value in result.items():
+                self._stats[key] += value
+            self._stats["scans"] += 1
+            self._stats["last_scan_at"] = int(time.time() * 1000)
+            self._stats["last_scan_seconds"] = round(time.monotonic() - started, 3)
+            return result
+    
+    def _run(self) -> None:
+        while True:
+            try:
+                self.scan()
+            except Exception as e:
+                print(f"notes 目录同步失败: {e}")
+            if self._stop.wait(settings.notes_watch_interval):
+                return
+    
+    def _guard_removed(self, removed: List[str], current: Dict[str, Tuple[int, int]]) -> bool:
+        """判断本轮是否可以删除消失文件对应的笔记
+        
+        目录整体为空（快照非空）或删除数超过 notes_watch_max_deletes 时，
+        更可能是目录被卸载、改名或替换，而不是用户逐个删除了文件，此时本轮不删除。
+        """
+        if not removed:
+            return True
+        if not current:
+            print(f"notes 目录为空但快照中有 {len(removed)} 个文件，疑似目录被卸载或替换，跳过删除")
+            return False
+        if len(removed) > settings.notes_watch_max_deletes:
+            print(f"本轮有 {len(removed)} 个文件消失，超过上限 {settings.notes_watch_max_deletes}，跳过删除；"
+                  f"确认删除请运行 rebuild db --prune")
+            return False
+        return True
+    
+    def stat_tree(self) -> Dict[str, Tuple[int, int]]:
+        """notes 目录下所有 Markdown 文件的 (mtime_ns, size)，跳过隐藏文件与临时文件"""
+        root = self.file_service.notes_dir
+        result = {}
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+            for name in filenames:
+                if name.startswith(".") or not name.endswith(".md"):
+                    continue
+                abs_path = Path(dirpath) / name
+                try:
+                    st = abs_path.stat()
+                except OSError:
+                    continue
+                result[abs_path.relative_to(root).as_posix()] = (st.st_mtime_ns, st.st_size)
+        return result
+    
+    def _sync_changed(self, paths: List[str], current: Dict[str, Tuple[int, int]],
+                      result: Dict[str, int]) -> None:
+        """解析一批变化的文件并在单个事务中写入"""
+        root = self.file_service.notes_dir
+        parsed_items, snapshots = [], []
+        for path in paths:
+            parsed = parse_note_file(str(root / path), str(root))
+            # 无论解析成功与否都记录快照，避免损坏的文件每轮重复读取
+            snapshots.append((path, *current[path]))
+            if "error" in parsed:
+                result["failed"] += 1
+                print(f"解析笔记文件失败: {path}: {parsed['error']}")
+                continue
+            parsed_items.append(dict(parsed, filename=path))
+        
+        created, updated, conflicts = self.sync_parsed(parsed_items, snapshots)
+        result["created"] += created
+        result["updated"] += updated
+        result["conflicts"] += conflicts
+    
+    def sync_parsed(self, parsed_items: List[Dict[str, Any]],
+                    snapshots: List[Tuple[str, int, int]]) -> Tuple[int, int, int]:
+        """把一批已解析的文件写入数据库并更新快照，返回 (新建数, 更新数, 冲突数)
+        
+        parsed_items 为 parse_note_file 的结果，另含 notes 目录下的相对路径 filename。
+        比较之后笔记又经接口保存的，跳过该文件并计为冲突，不用较旧的文件内容覆盖。
+        """
+        existing = self.repository.get_notes_by_filenames([p["filename"] for p in parsed_items])
+        created, updated = [], []
+        for parsed in parsed_items:
+            note = existing.get(parsed["filename"])
+            if note is None:
+                created.append({
+                    "title": parsed["title"],
+                    "content": parsed["content"],
+                    "category": parsed["category"] or "未分类",
+                    "tags": ",".join(parsed["tags"] or ["无标签"]),
+                    "filename": parsed["filename"],
+                    "created_at_ts": parsed["created_at_ts"]
+                })
+                continue
+            
+            change = self._diff_note(note, parsed)
+            if change:
+                updated.append(change)
+        
+        created_ids, conflict_ids = self.repository.apply_file_sync(created, updated, [], snapshots, [])
+        self.file_service.register_filenames([note["filename"] for note in created])
+        for change in updated:
+            if change["id"] in conflict_ids:
+                print(f"笔记文件与接口保存冲突，已跳过: {change['filename']}")
+        return len(created_ids), len(updated) - len(conflict_ids), len(conflict_ids)
+    
+    def _sync_removed(self, paths: List[str], result: Dict[str, int]) -> None:
+        """文件被外部删除时删除对应笔记；路径已不属于任何笔记时只清理快照"""
+        existing = self.repository.get_notes_by_filenames(paths)
+        deleted_ids = [note["id"] for note in existing.values()]
+        self.repository.apply_file_sync([], [], deleted_ids, [], paths)
+        self.file_service.forget_filenames(paths)
+        result["deleted"] += len(deleted_ids)
+    
+    def _diff_note(self, note: Dict[str, Any], parsed: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """比较文件与数据库中的笔记，返回需要写入的字段；无变化返回 None
+        
+        文件头部中的标题与分类是规范化后的值，与数据库原值规范化后一致时视为未变化，
+        因此本服务自己写出的文件不会反向改写数据库。
+        """
+        content_changed = content_hash(parsed["content"]) != note["content_hash"]
+        
+        title = note["title"]
+        if parsed["title"] and parsed["title"] != self.file_service._sanitize_title(note["title"]):
+            title = parsed["title"]
+        
+        category = note["category"]
+        if parsed["category"] and parsed["category"] != self.file_service._sanitize_dirname(note["category"]):
+            category = parsed["category"]
+        
+        old_tags = [t.strip() for t in note["tags"].split(",") if t.strip()]
+        tags = parsed["tags"] if parsed["tags"] is not None else old_tags
+        
+        if not content_changed and (title, category, tags) == (note["title"], note["category"], old_tags):
+            return None
+        return {
+            "id": note["id"],
+            "title": title,
+            "content": parsed["content"] if content_changed else None,
+            "category": category,
+            "tags": ",".join(tags),
+            "filename": note["filename"],
+            "expected_updated_at": note["updated_at"]
+        }
+
+
+# 全局目录监视服务实例
+notes_watcher = NotesWatcher()
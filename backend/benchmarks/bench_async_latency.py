@@ -0,0 +1,135 @@
+"""
+并发负载下的笔记接口延迟基准
+
+在临时目录中创建独立的数据库与笔记目录，模拟持续写入（创建/更新笔记）的
+同时测量列表查询的延迟与事件循环阻塞时间，对比：
+
+- inline：在事件循环中直接调用同步服务（旧实现）
+- executor：通过 async_note_service 在专用线程池中执行（当前实现）
+
+--ai-delay 大于 0 时写入不指定分类和标签，并以固定耗时的假 AI 客户端模拟自动分类，
+用于观察 AI 调用对列表查询的影响。
+每个场景结束后删除本场景写入的笔记，各场景都从同样的预置数据开始；
+列表延迟随场景中写入的笔记数增长，因此同时输出写入数。
+
+用法：python backend/benchmarks/bench_async_latency.py [--notes 2000] [--writers 8] [--ai-delay 0.2]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+
+
+class SlowAIClient:
+    """固定耗时的假 AI 客户端"""
+    
+    def __init__(self, delay):
+        self.delay = delay
+    
+    def extract_category_and_tags(self, content):
+        time.sleep(self.delay)
+        return "压测分类", ["压测"]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    k = min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))
+    return values[k]
+
+
+async def run_scenario(mode, note_service, async_note_service, NoteCreate, writers, duration, with_ai):
+    """运行一个场景，返回列表查询延迟、事件循环阻塞时间（毫秒）与写入的笔记ID"""
+    stop = asyncio.Event()
+    latencies = []
+    loop_lags = []
+    created = []
+    counter = 0
+    
+    async def call(name, *args):
+        if mode == "inline":
+            return getattr(note_service, name)(*args)
+        return await getattr(async_note_service, name)(*args)
+    
+    async def writer(idx):
+        nonlocal counter
+        while not stop.is_set():
+            counter += 1
+            note = NoteCreate(
+                title=f"{mode}-{idx}-{counter}",
+                content="负载测试内容 " * 400,
+                category="" if with_ai else f"分类{counter % 20}",
+                tags="" if with_ai else f"标签{counter % 50},压测"
+            )
+            created.append((await call("create_note", note)).id)
+            await asyncio.sleep(0)
+    
+    async def reader():
+        while not stop.is_set():
+            start = time.perf_counter()
+            await call("get_all_notes")
+            latencies.append((time.perf_counter() - start) * 1000)
+            await asyncio.sleep(0.01)
+    
+    async def heartbeat():
+        interval = 0.005
+        while not stop.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(interval)
+            loop_lags.append((time.perf_counter() - start - interval) * 1000)
+    
+    tasks = [asyncio.create_task(writer(i)) for i in range(writers)]
+    tasks += [asyncio.create_task(reader()), asyncio.create_task(heartbeat())]
+    await asyncio.sleep(duration)
+    stop.set()
+    await asyncio.gather(*tasks)
+    return latencies, loop_lags, created
+
+
+def main():
+    parser = argparse.ArgumentParser(description="笔记接口并发延迟基准")
+    parser.add_argument("--notes", type=int, default=2000, help="预置笔记数量")
+    parser.add_argument("--writers", type=int, default=8, help="并发写入协程数")
+    parser.add_argument("--duration", type=float, default=5.0, help="每个场景持续秒数")
+    parser.add_argument("--ai-delay", type=float, default=0.0, help="模拟 AI 分类耗时（秒），0 表示不调用 AI")
+    args = parser.parse_args()
+    
+    workdir = tempfile.mkdtemp(prefix="supernote-bench-")
+    os.chdir(workdir)
+    sys.path.insert(0, str(ROOT))
+    
+    from backend.app.schemas import NoteCreate
+    from backend.app.services.note_service import note_service, async_note_service
+    from backend.app.repositories.note_repository import note_repository
+    from backend.app.config.settings import settings
+    
+    if args.ai_delay > 0:
+        settings.ai_deferred_classification = False
+        slow_client = SlowAIClient(args.ai_delay)
+        note_service._get_ai_client = lambda request_cookies: slow_client
+    
+    for i in range(args.notes):
+        note_repository.create_note(f"预置{i}", "预置内容 " * 200, f"分类{i % 20}", f"标签{i % 50}", f"seed/{i}.md")
+    
+    print(f"工作目录: {workdir}，预置笔记 {args.notes} 篇，写入并发 {args.writers}，模拟 AI 耗时 {args.ai_delay}s")
+    print(f"{'模式':<10}{'写入数':>8}{'列表p50(ms)':>14}{'列表p95(ms)':>14}"
+          f"{'循环阻塞p95(ms)':>18}{'循环阻塞max(ms)':>18}")
+    for mode in ("inline", "executor"):
+        latencies, lags, created = asyncio.run(run_scenario(
+            mode, note_service, async_note_service, NoteCreate, args.writers, args.duration, args.ai_delay > 0
+        ))
+        print(f"{mode:<10}{len(created):>8}{statistics.median(latencies):>14.1f}{percentile(latencies, 95):>14.1f}"
+              f"{percentile(lags, 95):>18.1f}{max(lags):>18.1f}")
+        for note_id in created:
+            note_repository.delete_note(note_id)
+
+
+if __name__ == "__main__":
+    main()
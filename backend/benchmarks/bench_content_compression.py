@@ -0,0 +1,119 @@
+"""
+正文压缩存储基准
+
+分别在关闭/开启正文压缩的独立临时数据库中写入同一批笔记，报告：
+
+- 数据库文件大小与正文压缩率
+- 列表查询（全量 / 首页 50 条）延迟
+- get_note_by_id（需要解压正文）延迟
+
+用法：python backend/benchmarks/bench_content_compression.py [--notes 5000] [--size 20000]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+
+PARAGRAPHS = [
+    "## 背景\n\n在处理大规模数据时，索引结构的选择直接影响查询延迟与写入放大。",
+    "- 要点：B 树适合范围查询，LSM 树适合写多读少的场景。",
+    "```python\nfor item in items:\n    process(item)\n```",
+    "知识图谱中的节点与边需要保持一致的命名规范，以便后续检索与合并。",
+    "The quick brown fox jumps over the lazy dog while the cache warms up.",
+    "> 引用：过早优化是万恶之源，但明显的性能问题应当尽早解决。",
+]
+
+
+def make_body(rng: random.Random, size: int) -> str:
+    parts = []
+    length = 0
+    while length < size:
+        p = rng.choice(PARAGRAPHS) + f"\n\n（第 {rng.randint(1, 10000)} 条记录）\n\n"
+        parts.append(p)
+        length += len(p)
+    return "".join(parts)[:size]
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def run_worker(args):
+    """在当前工作目录中建库并测量，结果以 JSON 输出"""
+    sys.path.insert(0, str(ROOT))
+    from backend.app.config.settings import settings
+    settings.content_compression = args.mode == "compressed"
+    settings.content_compression_codec = args.codec
+    
+    from backend.app.repositories.note_repository import note_repository
+    from backend.app.config.database import db_manager
+    
+    rng = random.Random(42)
+    raw_bytes = 0
+    start = time.perf_counter()
+    for i in range(args.notes):
+        body = make_body(rng, rng.randint(args.size // 4, args.size))
+        raw_bytes += len(body.encode("utf-8"))
+        note_repository.create_note(f"笔记{i}", body, f"分类{i % 20}", f"标签{i % 50}", f"bench/{i}.md")
+    write_s = time.perf_counter() - start
+    
+    with db_manager.read() as cursor:
+        stored_bytes = cursor.execute("SELECT SUM(length(CAST(content AS BLOB))) FROM notes").fetchone()[0]
+    with db_manager.connection() as conn:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    db_size = os.path.getsize(db_manager.db_path)
+    
+    ids = [rng.randint(1, args.notes) for _ in range(200)]
+    result = {
+        "mode": args.mode,
+        "db_mb": db_size / 1024 / 1024,
+        "ratio": raw_bytes / stored_bytes,
+        "write_s": write_s,
+        "list_all_ms": timed(note_repository.get_all_notes, 20),
+        "list_page_ms": timed(lambda: note_repository.get_all_notes(limit=50), 200),
+        "get_ms": timed(lambda: note_repository.get_note_by_id(rng.choice(ids)), 500),
+    }
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="正文压缩存储基准")
+    parser.add_argument("--notes", type=int, default=5000, help="笔记数量")
+    parser.add_argument("--size", type=int, default=20000, help="正文最大字符数")
+    parser.add_argument("--codec", default="zlib", choices=["zlib", "zstd"], help="压缩算法")
+    parser.add_argument("--mode", choices=["plain", "compressed"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.mode:
+        run_worker(args)
+        return
+    
+    print(f"笔记 {args.notes} 篇，正文 {args.size // 4}-{args.size} 字符，算法 {args.codec}")
+    print(f"{'模式':<12}{'库大小(MB)':>12}{'压缩率':>8}{'写入(s)':>10}{'全量列表(ms)':>14}{'首页(ms)':>10}{'详情(ms)':>10}")
+    for mode in ("plain", "compressed"):
+        workdir = tempfile.mkdtemp(prefix=f"supernote-bench-{mode}-")
+        out = subprocess.run(
+            [sys.executable, "-W", "ignore", __file__, "--mode", mode, "--notes", str(args.notes),
+             "--size", str(args.size), "--codec", args.codec],
+            cwd=workdir, capture_output=True, text=True, check=True
+        ).stdout.strip().splitlines()[-1]
+        r = json.loads(out)
+        print(f"{r['mode']:<12}{r['db_mb']:>12.1f}{r['ratio']:>8.2f}{r['write_s']:>10.1f}"
+              f"{r['list_all_ms']:>14.1f}{r['list_page_ms']:>10.2f}{r['get_ms']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+短关键词搜索基准
+
+trigram 全文索引无法检索 1~2 个字符的关键词（中文常见情况），这类搜索退回 LIKE 逐行扫描。
+在开启正文压缩的临时数据库中对比两种扫描方式：
+
+- decode：扫描 notes 表，逐条用 note_text() 解压正文后匹配（全文索引不可用时的路径）
+- fts-text：扫描 notes_fts 自存的解码文本，不解压正文（全文索引可用时的路径）
+
+并给出 3 字符关键词走 FTS5 MATCH 的耗时作为参照。
+
+用法：python backend/benchmarks/bench_short_query.py [--notes 5000] [--size 8000]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+
+PARAGRAPHS = [
+    "## 背景\n\n在处理大规模数据时，索引结构的选择直接影响查询延迟与写入放大。",
+    "- 要点：B 树适合范围查询，LSM 树适合写多读少的场景。",
+    "知识图谱中的节点与边需要保持一致的命名规范，以便后续检索与合并。",
+    "The quick brown fox jumps over the lazy dog while the cache warms up.",
+    "> 引用：过早优化是万恶之源，但明显的性能问题应当尽早解决。",
+]
+
+QUERIES = [("的", "常见单字"), ("索引", "双字"), ("鲸", "罕见单字"), ("知识图谱", "4 字（MATCH）")]
+
+
+def make_body(rng: random.Random, size: int) -> str:
+    parts = []
+    length = 0
+    while length < size:
+        p = rng.choice(PARAGRAPHS) + f"\n\n（第 {rng.randint(1, 10000)} 条记录）\n\n"
+        parts.append(p)
+        length += len(p)
+    return "".join(parts)[:size]
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="短关键词搜索基准")
+    parser.add_argument("--notes", type=int, default=5000, help="笔记数量")
+    parser.add_argument("--size", type=int, default=8000, help="正文最大字符数")
+    parser.add_argument("--repeat", type=int, default=5, help="每项重复次数（取中位数）")
+    args = parser.parse_args()
+    
+    workdir = tempfile.mkdtemp(prefix="supernote-bench-")
+    os.chdir(workdir)
+    sys.path.insert(0, str(ROOT))
+    
+    from backend.app.config.settings import settings
+    settings.content_compression = True
+    from backend.app.config.database import db_manager
+    from backend.app.repositories.note_repository import note_repository
+    
+    rng = random.Random(42)
+    for i in range(args.notes):
+        body = make_body(rng, rng.randint(args.size // 2, args.size))
+        note_repository.create_note(f"笔记{i}", body, f"分类{i % 20}", f"标签{i % 50}", f"bench/{i}.md")
+    
+    fts_enabled = db_manager.fts_enabled
+    print(f"工作目录: {workdir}，笔记 {args.notes} 篇，正文 {args.size // 2}-{args.size} 字符（压缩存储）")
+    print(f"{'关键词':<14}{'方式':<10}{'首页50(ms)':>12}{'全部(ms)':>12}{'相关度首页(ms)':>16}{'命中数':>8}")
+    for query, label in QUERIES:
+        modes = ["decode", "fts-text"] if len(query) < note_repository.FTS_MIN_QUERY_LENGTH else ["match"]
+        for mode in modes:
+            db_manager.fts_enabled = fts_enabled and mode != "decode"
+            hits = len(note_repository.search_notes(query))
+            page = timed(lambda: note_repository.search_notes(query, limit=50), args.repeat)
+            full = timed(lambda: note_repository.search_notes(query), args.repeat)
+            relevance = timed(lambda: note_repository.search_notes(query, "relevance", limit=50), args.repeat)
+            print(f"{query + ' ' + label:<14}{mode:<10}{page:>12.1f}{full:>12.1f}{relevance:>16.1f}{hits:>8}")
+    db_manager.fts_enabled = fts_enabled
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+"""测试公共夹具"""
+import os
+
+import pytest
+
+
+@pytest.fixture(scope="session", autouse=True)
+def workdir(tmp_path_factory):
+    """在临时目录中运行全部测试
+    
+    应用模块导入时按当前目录创建数据库与 notes 目录，因此必须在导入前切换目录，
+    并在整个测试会话中保持。
+    """
+    path = tmp_path_factory.mktemp("supernote")
+    cwd = os.getcwd()
+    os.chdir(path)
+    yield path
+    os.chdir(cwd)
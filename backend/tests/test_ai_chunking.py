@@ -0,0 +1,32 @@
+"""长文本分块测试"""
+import importlib
+
+import pytest
+
+
+@pytest.fixture(scope="module")
+def split_markdown():
+    return importlib.import_module("backend.app.services.ai_service")._split_markdown
+
+
+def compact(text):
+    return "".join(text.split())
+
+
+@pytest.mark.parametrize("max_chars", [1000, 2000, 4000, 6000])
+def test_chunk_count_is_bounded(split_markdown, max_chars):
+    """合并后的块数不超过 max_chunks，且不丢失内容"""
+    text = "\n\n".join(f"{i:03d}" + "字" * 1597 for i in range(100))
+    chunks = split_markdown(text, max_chars, 32)
+    assert 1 < len(chunks) <= 32
+    assert compact("".join(chunks)) == compact(text)
+
+
+def test_oversized_fence_kept_whole(split_markdown):
+    """超过块大小的代码块整体成块，不按行切开"""
+    fence = "```python\n" + "".join(f"line_{i} = {i}\n\n" for i in range(200)) + "```\n"
+    text = "# 标题\n\n" + "前文。\n" * 50 + "\n" + fence + "\n后文。\n" * 50
+    chunks = split_markdown(text, 500, 32)
+    assert len(chunks) <= 32
+    assert any(fence.strip() in chunk for chunk in chunks)
+    assert compact("".join(chunks)) == compact(text)
@@ -0,0 +1,50 @@
+"""并发执行工具测试"""
+import importlib
+import threading
+import time
+
+import pytest
+
+
+@pytest.fixture(scope="module")
+def concurrency():
+    return importlib.import_module("backend.app.core.concurrency")
+
+
+def test_write_waits_for_running_read(concurrency):
+    """写操作在进行中的读操作结束后才开始"""
+    gate = concurrency.ReadPriorityGate(max_wait=5.0)
+    events = []
+    reading = threading.Event()
+    
+    def read():
+        reading.set()
+        time.sleep(0.1)
+        events.append("read")
+    
+    reader = threading.Thread(target=gate.read(read))
+    reader.start()
+    reading.wait()
+    gate.write(lambda: events.append("write"))()
+    reader.join()
+    assert events == ["read", "write"]
+
+
+def test_write_wait_is_bounded(concurrency):
+    """读操作持续进行时，写操作最多等待 max_wait 秒"""
+    gate = concurrency.ReadPriorityGate(max_wait=0.05)
+    release = threading.Event()
+    reading = threading.Event()
+    
+    def read():
+        reading.set()
+        release.wait(5)
+    
+    reader = threading.Thread(target=gate.read(read))
+    reader.start()
+    reading.wait()
+    start = time.monotonic()
+    assert gate.write(lambda: "written")() == "written"
+    assert time.monotonic() - start < 1
+    release.set()
+    reader.join()
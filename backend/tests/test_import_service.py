@@ -0,0 +1,63 @@
+"""Markdown 批量导入测试"""
+import importlib
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+
+def write_note(path, title, body, category):
+    """按 save_note_to_file 的格式写出笔记文件"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(f"# {title}\n**分类：** {category}\n**标签：** i\n\n{body}", encoding="utf-8")
+
+
+@pytest.fixture(scope="module")
+def import_service():
+    return importlib.import_module("backend.app.services.import_service").import_service
+
+
+@pytest.fixture
+def notes_dir(import_service):
+    return import_service.file_service.notes_dir
+
+
+def test_parser_import_has_no_side_effects(tmp_path):
+    """解析子进程只导入 note_markdown，不应初始化数据库"""
+    root = Path(__file__).resolve().parents[2]
+    code = ("import sys, backend.app.note_markdown; "
+            "assert 'backend.app.config.database' not in sys.modules, sorted(sys.modules)")
+    env = dict(os.environ, PYTHONPATH=str(root))
+    subprocess.run([sys.executable, "-c", code], cwd=tmp_path, env=env, check=True)
+    assert not (tmp_path / "data").exists()
+
+
+def test_import_external_directory(import_service, notes_dir, tmp_path):
+    """外部目录的文件保存到 notes 目录，重复导入时跳过"""
+    source = tmp_path / "外部"
+    for i in range(5):
+        write_note(source / f"导入{i}.md", f"导入{i}", f"正文{i}", category="导入")
+    
+    report = import_service.import_directory(str(source), batch_size=2, workers=1)
+    assert (report["imported"], report["failed"]) == (5, 0)
+    assert sorted(p.name for p in (notes_dir / "导入").iterdir()) == [f"导入{i}.md" for i in range(5)]
+    
+    report = import_service.import_directory(str(source), batch_size=2, workers=1)
+    assert (report["imported"], report["skipped"]) == (0, 5)
+
+
+def test_failed_batch_leaves_no_files(import_service, notes_dir, tmp_path, monkeypatch):
+    """数据库写入失败时不留下孤立的笔记文件"""
+    source = tmp_path / "失败"
+    write_note(source / "失败.md", "失败", "正文", category="导入失败")
+    
+    def fail(rows):
+        raise RuntimeError("数据库写入失败")
+    
+    monkeypatch.setattr(import_service.repository, "bulk_create_notes", fail)
+    with pytest.raises(RuntimeError):
+        import_service.import_directory(str(source), workers=1)
+    assert not (notes_dir / "导入失败").exists()
+    assert not import_service.file_service.is_reserved("导入失败/失败.md")
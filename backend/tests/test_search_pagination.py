@@ -0,0 +1,42 @@
+"""搜索分页测试"""
+import importlib
+
+import pytest
+
+
+@pytest.fixture(scope="module")
+def note_service():
+    """创建若干标题或正文含单字关键词的笔记"""
+    services = importlib.import_module("backend.app.services")
+    schemas = importlib.import_module("backend.app.schemas")
+    for i in range(5):
+        services.note_service.create_note(schemas.NoteCreate(
+            title=f"的笔记{i}" if i % 2 else f"笔记{i}",
+            content="这是一段的正文",
+            category="测试",
+            tags="t"
+        ))
+    yield services.note_service
+    services.file_service.flush()
+
+
+@pytest.mark.parametrize("order_by", ["relevance", "created_at"])
+def test_short_query_paginates(note_service, order_by):
+    """短关键词走 LIKE 回退时分页游标可用，且各页不重不漏"""
+    seen = []
+    cursor = None
+    while True:
+        page = note_service.search_notes("的", order_by, limit=2, cursor=cursor)
+        seen.extend(item.id for item in page.items)
+        cursor = page.next_cursor
+        if not cursor:
+            break
+    
+    assert len(seen) == 5
+    assert len(set(seen)) == 5
+
+
+def test_short_query_relevance_prefers_title(note_service):
+    """相关度排序时标题命中的笔记排在仅正文命中的笔记之前"""
+    page = note_service.search_notes("的", "relevance", limit=2)
+    assert all(item.title.startswith("的") for item in page.items)
@@ -0,0 +1,153 @@
+"""notes 目录监视与重建测试"""
+import importlib
+import os
+import time
+
+import pytest
+
+
+def write_note(path, title, body, category="监视", tags="w"):
+    """按 save_note_to_file 的格式写出笔记文件，并确保 mtime 与上次不同"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    previous = path.stat().st_mtime_ns if path.exists() else 0
+    path.write_text(f"# {title}\n**分类：** {category}\n**标签：** {tags}\n\n{body}", encoding="utf-8")
+    if path.stat().st_mtime_ns == previous:
+        os.utime(path, ns=(previous + 1_000_000, previous + 1_000_000))
+
+
+@pytest.fixture(scope="module")
+def services():
+    return importlib.import_module("backend.app.services")
+
+
+@pytest.fixture
+def watcher(services):
+    """每个用例开始前先同步一次，使快照与当前目录一致"""
+    services.file_service.flush()
+    services.notes_watcher.scan()
+    return services.notes_watcher
+
+
+@pytest.fixture
+def repository():
+    return importlib.import_module("backend.app.repositories.note_repository").note_repository
+
+
+@pytest.fixture
+def notes_dir(services):
+    return services.file_service.notes_dir
+
+
+def test_scan_creates_updates_and_deletes(watcher, repository, notes_dir):
+    """新建、修改、删除文件分别新建、更新、删除对应笔记"""
+    # 目录中保留另一个文件，否则删除后目录为空，会被当作目录被替换而跳过删除
+    write_note(notes_dir / "监视" / "保留.md", "保留", "正文")
+    watcher.scan()
+    path = notes_dir / "监视" / "甲.md"
+    write_note(path, "甲", "初版正文")
+    assert watcher.scan()["created"] == 1
+    note = repository.get_notes_by_filenames(["监视/甲.md"])["监视/甲.md"]
+    assert repository.get_note_by_id(note["id"])["content"] == "初版正文"
+    
+    write_note(path, "甲", "修改后的正文")
+    assert watcher.scan()["updated"] == 1
+    assert repository.get_note_by_id(note["id"])["content"] == "修改后的正文"
+    
+    path.unlink()
+    assert watcher.scan()["deleted"] == 1
+    assert repository.get_note_by_id(note["id"]) is None
+
+
+def test_scan_skips_missing_or_empty_root(watcher, repository, notes_dir):
+    """notes 目录消失或被替换为空目录时不删除任何笔记"""
+    write_note(notes_dir / "监视" / "乙.md", "乙", "正文")
+    watcher.scan()
+    before = repository.count_notes()
+    
+    moved = notes_dir.with_name(notes_dir.name + "-moved")
+    notes_dir.rename(moved)
+    try:
+        result = watcher.scan()
+        assert result["deleted"] == 0
+        assert repository.count_notes() == before
+        
+        notes_dir.mkdir()
+        result = watcher.scan()
+        assert result["deleted"] == 0
+        assert result["skipped_deletes"] > 0
+        assert repository.count_notes() == before
+        notes_dir.rmdir()
+    finally:
+        moved.rename(notes_dir)
+    
+    assert watcher.scan()["deleted"] == 0
+
+
+def test_scan_caps_deletions(watcher, repository, notes_dir, monkeypatch):
+    """一次消失的文件数超过上限时本轮不删除"""
+    paths = [notes_dir / "监视" / f"丙{i}.md" for i in range(3)]
+    for i, path in enumerate(paths):
+        write_note(path, f"丙{i}", "正文")
+    watcher.scan()
+    before = repository.count_notes()
+    
+    monkeypatch.setattr(importlib.import_module("backend.app.config.settings").settings,
+                        "notes_watch_max_deletes", 2)
+    for path in paths:
+        path.unlink()
+    result = watcher.scan()
+    assert result["deleted"] == 0
+    assert result["skipped_deletes"] == 3
+    assert repository.count_notes() == before
+
+
+def test_scan_does_not_overwrite_concurrent_api_update(services, watcher, repository, notes_dir, monkeypatch):
+    """比较文件之后经接口保存的修改不被较旧的文件内容覆盖"""
+    schemas = importlib.import_module("backend.app.schemas")
+    note = services.note_service.create_note(schemas.NoteCreate(title="丁", content="v1", category="监视", tags="w"))
+    services.file_service.flush()
+    watcher.scan()
+    
+    time.sleep(0.01)
+    write_note(notes_dir / note.filename, "丁", "v2-file")
+    
+    original = repository.get_notes_by_filenames
+    
+    def read_then_save(filenames):
+        rows = original(filenames)
+        time.sleep(0.002)
+        services.note_service.update_note(note.id, schemas.NoteUpdate(id=note.id, content="v3-api"))
+        return rows
+    
+    monkeypatch.setattr(repository, "get_notes_by_filenames", read_then_save)
+    result = watcher.scan()
+    monkeypatch.setattr(repository, "get_notes_by_filenames", original)
+    
+    assert result["conflicts"] == 1
+    assert result["updated"] == 0
+    assert services.note_service.get_note(note.id).content == "v3-api"
+    
+    # 后写队列写出接口版本后再次扫描，文件与数据库一致
+    services.file_service.flush()
+    assert watcher.scan()["conflicts"] == 0
+    assert services.note_service.get_note(note.id).content == "v3-api"
+
+
+def test_rebuild_database(services, watcher, repository, notes_dir):
+    """rebuild db 为新文件建笔记；notes 目录不存在时报错而不是清空数据库"""
+    rebuild_service = importlib.import_module("backend.app.services.rebuild_service").rebuild_service
+    write_note(notes_dir / "重建" / "戊.md", "戊", "正文", category="重建")
+    
+    report = rebuild_service.rebuild_database(workers=1)
+    assert report["created"] == 1
+    assert "重建/戊.md" in repository.get_notes_by_filenames(["重建/戊.md"])
+    
+    before = repository.count_notes()
+    moved = notes_dir.with_name(notes_dir.name + "-moved")
+    notes_dir.rename(moved)
+    try:
+        with pytest.raises(importlib.import_module("backend.app.core").FileOperationError):
+            rebuild_service.rebuild_database(workers=1, prune=True)
+    finally:
+        moved.rename(notes_dir)
+    assert repository.count_notes() == before